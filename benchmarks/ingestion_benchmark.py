@@ -0,0 +1,312 @@
+"""
+离线摄入吞吐量基准测试
+
+生成可配置规模的合成语料（Markdown / DOCX / JSON），用桩LLM和桩嵌入模型替换真实的模型提供商，
+依次运行 读取 → 基础管道(create_pipeline) → 智能切分 → 嵌入 四个阶段，
+报告每个阶段的 docs/sec、chunks/sec 和峰值内存（tracemalloc统计的Python堆内存）。
+
+用法:
+    python benchmarks/ingestion_benchmark.py --docs 200 --paragraphs 40 --formats md,docx,json
+    python benchmarks/ingestion_benchmark.py --docs 500 --json report.json
+"""
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from unittest.mock import patch
+from xml.sax.saxutils import escape
+
+from llama_index.core import MockEmbedding, Settings
+from llama_index.core.llms.mock import MockLLM
+from llama_index.core.schema import MetadataMode
+
+from config.config_rag import INGESTION_CACHE_CONFIG, SUMMARY_CACHE_CONFIG
+from src.models import EmbeddingFactory, EmbeddingProviderType, LLMFactory, LLMProviderType
+from src.models.embedding_factory import EmbeddingProvider
+from src.models.llm_factory import LLMProvider
+
+FORMATS = ("md", "docx", "json")
+CATEGORIES = ("产品", "规格", "政策", "手册")
+
+_WORDS = ("系统", "接口", "参数", "电压", "温度", "模块", "配置", "性能", "数据", "网络",
+          "存储", "协议", "设备", "功耗", "版本", "安全", "测试", "标准", "输出", "信号",
+          "controller", "firmware", "latency", "bandwidth", "sensor")
+
+
+# ---------------------------------------------------------------------------
+# 合成语料
+# ---------------------------------------------------------------------------
+
+def _sentence(rng: random.Random) -> str:
+    return "".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 18))) + rng.choice("。！？；")
+
+
+def _paragraph(rng: random.Random) -> str:
+    return "".join(_sentence(rng) for _ in range(rng.randint(2, 6)))
+
+
+def _write_markdown(path: str, rng: random.Random, paragraphs: int) -> None:
+    lines = [f"# {rng.choice(_WORDS)}说明"]
+    for i in range(paragraphs):
+        if i % 5 == 0:
+            lines.append(f"\n## 第{i // 5 + 1}节 {rng.choice(_WORDS)}")
+        lines.append(_paragraph(rng))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(lines))
+
+
+def _write_docx(path: str, rng: random.Random, paragraphs: int) -> None:
+    """写出只包含正文段落的最小DOCX文件（不依赖python-docx）"""
+    body = "".join(f"<w:p><w:r><w:t>{escape(_paragraph(rng))}</w:t></w:r></w:p>" for _ in range(paragraphs))
+    document = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}</w:body></w:document>')
+    content_types = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                     '<Default Extension="xml" ContentType="application/xml"/>'
+                     '<Override PartName="/word/document.xml" ContentType="application/'
+                     'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+    rels = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", content_types)
+        zf.writestr("_rels/.rels", rels)
+        zf.writestr("word/document.xml", document)
+
+
+def _write_json(path: str, rng: random.Random, paragraphs: int) -> None:
+    data = {
+        "title": f"{rng.choice(_WORDS)}数据表",
+        "sections": [{"name": rng.choice(_WORDS), "content": _paragraph(rng)} for _ in range(paragraphs)],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+_WRITERS = {"md": _write_markdown, "docx": _write_docx, "json": _write_json}
+
+
+def generate_corpus(output_dir: str,
+                    num_docs: int = 100,
+                    paragraphs: int = 20,
+                    formats: Sequence[str] = FORMATS,
+                    seed: int = 42) -> List[str]:
+    """
+    生成合成语料，文件名符合"类别_文件名.扩展名"格式，各格式轮流生成
+
+    Args:
+        output_dir: 输出目录
+        num_docs: 文档数量
+        paragraphs: 每个文档的段落数
+        formats: 生成的文件格式
+        seed: 随机种子，相同参数生成相同语料
+    Returns:
+        生成的文件路径列表
+    """
+    unknown = set(formats) - set(_WRITERS)
+    if unknown:
+        raise ValueError(f"不支持的语料格式: {sorted(unknown)}")
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for i in range(num_docs):
+        fmt = formats[i % len(formats)]
+        path = os.path.join(output_dir, f"{CATEGORIES[i % len(CATEGORIES)]}_bench_{i:05d}.{fmt}")
+        _WRITERS[fmt](path, rng, paragraphs)
+        paths.append(path)
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# 桩模型
+# ---------------------------------------------------------------------------
+
+class StubLLMProvider(LLMProvider):
+    """返回MockLLM的提供商，不发起网络请求"""
+
+    def get_llm(self, **kwargs) -> Any:
+        return MockLLM(max_tokens=kwargs.get("max_tokens"))
+
+
+class StubEmbeddingProvider(EmbeddingProvider):
+    """返回MockEmbedding的提供商，不发起网络请求"""
+
+    embed_dim = 1536
+
+    def get_embedding(self, **kwargs) -> Any:
+        return MockEmbedding(embed_dim=kwargs.get("embed_dim", self.embed_dim))
+
+
+@contextlib.contextmanager
+def stub_model_providers() -> Iterator[None]:
+    """临时把所有LLM和嵌入提供商替换为桩实现，并关闭持久化转换缓存和摘要缓存，退出时恢复"""
+    llm_providers = {provider_type: StubLLMProvider for provider_type in LLMProviderType}
+    embedding_providers = {EmbeddingProviderType.DASHSCOPE: StubEmbeddingProvider}
+    with patch.dict(LLMFactory._providers, llm_providers), \
+            patch.dict(EmbeddingFactory._providers, embedding_providers), \
+            patch.dict(INGESTION_CACHE_CONFIG, {"enabled": False}), \
+            patch.dict(SUMMARY_CACHE_CONFIG, {"enabled": False}), \
+            patch.object(Settings, "_llm", StubLLMProvider().get_llm()), \
+            patch.object(Settings, "_embed_model", StubEmbeddingProvider().get_embedding()):
+        yield
+
+
+# ---------------------------------------------------------------------------
+# 阶段统计
+# ---------------------------------------------------------------------------
+
+class StageResult:
+    """单个阶段的统计结果"""
+
+    def __init__(self, name: str, docs: int, chunks: int, seconds: float, peak_bytes: int):
+        self.name = name
+        self.docs = docs
+        self.chunks = chunks
+        self.seconds = seconds
+        self.peak_bytes = peak_bytes
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak_bytes / (1024 * 1024)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "seconds": round(self.seconds, 4),
+            "docs_per_sec": round(self.docs_per_sec, 2),
+            "chunks_per_sec": round(self.chunks_per_sec, 2),
+            "peak_mb": round(self.peak_mb, 2),
+        }
+
+
+@contextlib.contextmanager
+def _measure(quiet: bool) -> Iterator[Dict[str, float]]:
+    """统计代码块的耗时和峰值内存，quiet时屏蔽转换中的print输出"""
+    stats: Dict[str, float] = {}
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    redirect = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    start = time.perf_counter()
+    with redirect:
+        yield stats
+    stats["seconds"] = time.perf_counter() - start
+    stats["peak_bytes"] = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+
+
+def run_benchmark(corpus_dir: str,
+                  quiet: bool = True,
+                  embed_batch_size: int = 100,
+                  summary_mode: Optional[str] = None) -> List[StageResult]:
+    """
+    在给定语料上运行各摄入阶段
+
+    Args:
+        corpus_dir: 语料目录
+        quiet: 是否屏蔽转换过程中的输出
+        embed_batch_size: 嵌入阶段每批的节点数
+        summary_mode: 摘要方式（"llm" 使用桩LLM，"extractive" 使用本地抽取式摘要），默认使用配置
+    Returns:
+        各阶段的统计结果
+    """
+    from src.data_ingestion.ingestion_pipeline import chunk_documents, create_pipeline
+    from src.data_ingestion.reader import iter_documents
+
+    results = []
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    try:
+        with stub_model_providers():
+            with _measure(quiet) as stats:
+                documents = list(iter_documents(input_dir=corpus_dir, num_workers=1))
+            results.append(StageResult("read", len(documents), 0, stats["seconds"], stats["peak_bytes"]))
+
+            with _measure(quiet) as stats:
+                transformed = create_pipeline(summary_mode).run(documents=documents)
+            results.append(StageResult("transform", len(transformed), 0, stats["seconds"], stats["peak_bytes"]))
+
+            with _measure(quiet) as stats:
+                chunks = chunk_documents(transformed)
+            results.append(StageResult("chunk", len(transformed), len(chunks),
+                                       stats["seconds"], stats["peak_bytes"]))
+
+            embed_model = EmbeddingFactory.create_embedding(EmbeddingProviderType.DASHSCOPE)
+            with _measure(quiet) as stats:
+                for i in range(0, len(chunks), embed_batch_size):
+                    batch = chunks[i:i + embed_batch_size]
+                    embed_model.get_text_embedding_batch(
+                        [chunk.get_content(metadata_mode=MetadataMode.EMBED) for chunk in batch])
+            results.append(StageResult("embed", len(transformed), len(chunks),
+                                       stats["seconds"], stats["peak_bytes"]))
+    finally:
+        if not started:
+            tracemalloc.stop()
+    return results
+
+
+def format_report(results: Sequence[StageResult]) -> str:
+    """格式化为文本表格"""
+    header = f"{'阶段':<10}{'文档':>8}{'节点':>8}{'耗时(s)':>10}{'docs/s':>12}{'chunks/s':>12}{'峰值(MB)':>10}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(f"{r.name:<10}{r.docs:>8}{r.chunks:>8}{r.seconds:>10.3f}"
+                     f"{r.docs_per_sec:>12.1f}{r.chunks_per_sec:>12.1f}{r.peak_mb:>10.2f}")
+    total = sum(r.seconds for r in results)
+    docs = results[0].docs if results else 0
+    lines.append(f"总耗时 {total:.3f}s，端到端 {docs / total if total else 0:.1f} docs/s")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> List[StageResult]:
+    parser = argparse.ArgumentParser(description="离线摄入吞吐量基准测试")
+    parser.add_argument("--docs", type=int, default=100, help="合成文档数量")
+    parser.add_argument("--paragraphs", type=int, default=20, help="每个文档的段落数")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="语料格式，逗号分隔")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--corpus-dir", default=None, help="语料目录，默认使用临时目录")
+    parser.add_argument("--json", dest="json_path", default=None, help="把结果写入JSON文件")
+    parser.add_argument("--summary-mode", choices=["llm", "extractive"], default=None, help="摘要方式")
+    parser.add_argument("--verbose", action="store_true", help="显示转换过程中的输出")
+    args = parser.parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        corpus_dir = args.corpus_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+        generate_corpus(corpus_dir, args.docs, args.paragraphs, formats, args.seed)
+        results = run_benchmark(corpus_dir, quiet=not args.verbose, summary_mode=args.summary_mode)
+
+    print(format_report(results))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"params": vars(args), "stages": [r.to_dict() for r in results]},
+                      f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
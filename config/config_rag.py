@@ -12,6 +12,214 @@ DOCUMENT_CONFIG = {
     
     # 支持的文件类型
     "supported_file_types": [".md", ".mdx", ".docx"],
+    
+    # 摄入管道每批处理的文档数（惰性读取，内存占用与批次大小相关）
+    "ingestion_batch_size": 64,
+    
+    # 并行读取文件的进程数，1表示串行读取
+    "num_workers": 1,
+    
+    # 并行切分文档的进程数，1表示在当前进程中切分
+    "chunking_workers": 1,
+    
+    # 每次提交给解析器批量切分的文档数
+    "chunking_batch_size": 16,
+    
+    # 单个文档的切分超时（秒），仅在并行切分时生效：一个批次的时限为 超时 × 文档数，
+    # 批次超时后重建进程池并逐个文档重新切分，单个文档仍超时则保留原文档
+    "chunking_timeout": 120,
+    
+    # 智能切分管道的检查点目录，中途退出后重新运行会从这里继续，None表示不使用检查点
+    "checkpoint_dir": "store/checkpoints/smart_chunking",
+}
+
+# 摄入管道转换缓存配置
+INGESTION_CACHE_CONFIG = {
+    # 是否启用持久化转换缓存
+    "enabled": True,
+    
+    # SQLite缓存文件路径
+    "path": "store/cache/ingestion_cache.db",
+    
+    # 缓存集合名称
+    "collection": "ingestion",
+    
+    # 容量上限，超出后按最近访问时间淘汰
+    "max_entries": 10000,
+    "max_size_mb": 1024,
+}
+
+# 数据清洗配置
+CLEANING_CONFIG = {
+    # 启用的规则集：
+    #   control_chars   控制字符、零宽字符和BOM
+    #   whitespace         统一换行、合并空行
+    #   inline_whitespace  去掉行尾空白、合并行内连续空白（会去掉Markdown硬换行和对齐空格）
+    #   page_artifacts     单独成行的页码（第3页、- 3 -、Page 3 of 10）
+    #   legal_notices      包含版权声明关键词的整行
+    #   repeated_lines     在分页位置（换页符、页码行前后）重复出现的短行（页眉、页脚），只保留第一次出现；
+    #                      标题、分隔线、列表项、短的键值行不受影响，默认不启用
+    # Markdown围栏代码块内只应用 control_chars
+    "rule_sets": ["control_chars", "whitespace", "page_artifacts"],
+    
+    # 结构化文件（JSON、代码等）的扩展名，这些文件只应用 control_chars
+    "structured_file_types": [".json", ".jsonl", ".yaml", ".yml", ".toml", ".xml", ".csv",
+                              ".py", ".js", ".ts", ".java", ".c", ".cpp", ".h", ".go", ".sh", ".sql"],
+    
+    # 自定义规则，格式为 [正则, 替换内容]
+    "custom_rules": [],
+    
+    # 重复行规则：出现至少多少次、长度不超过多少字符的行视为页眉页脚
+    "repeated_line_min_count": 3,
+    "repeated_line_max_length": 80,
+    
+    # 重复行规则：分页标记前后各多少个非空行视为页眉页脚位置
+    "repeated_line_window": 1,
+}
+
+# 近似重复检测配置（MinHash + LSH，在摘要之前去掉同一份资料的多个版本）
+DEDUP_CONFIG = {
+    # 是否启用文档级检测（在摘要之前）
+    "enabled": True,
+    
+    # 是否在智能切分之后再做一次节点级检测（在嵌入之前）。
+    # 索引按原始文档分别构建，节点被丢弃后该文档的索引就缺少这部分内容，默认不启用
+    "chunk_level": False,
+    
+    # 节点级检测的范围：document 只在同一原始文档的节点之间检测，
+    # global 在所有节点之间检测（不同文档共有的章节只保留在第一个文档中）
+    "chunk_scope": "document",
+    
+    # 重复的处理方式：drop 丢弃，link 保留并在 metadata["duplicate_of"] 中记录代表节点ID
+    "action": "drop",
+    
+    # 估计的Jaccard相似度达到该值视为重复
+    "threshold": 0.8,
+    
+    # MinHash签名长度和LSH分段数（每段 num_perm / bands 行）
+    "num_perm": 128,
+    "bands": 16,
+    
+    # 字符分片长度
+    "shingle_size": 5,
+    
+    # 短于该长度的文本不参与检测
+    "min_chars": 50,
+    
+    # 重复簇报告（JSON）路径，{level} 替换为 document 或 chunk，设为None只写日志
+    "report_path": "store/dedup/{level}_duplicates.json",
+}
+
+# 元数据策略配置（控制每个元数据键是否进入嵌入文本和LLM上下文）
+METADATA_CONFIG = {
+    # 是否启用元数据策略
+    "enabled": True,
+    
+    # 元数据键 → all（嵌入和LLM） / embed（只嵌入） / llm（只给LLM） / none（都不进入），未列出的键保持不变
+    "policy": {
+        # 同一文档的所有节点相同，文档摘要已经用于分类agent的工具描述
+        "summary": "none",
+        "category": "all",
+        "file_path": "llm",
+        "file_name": "llm",
+        "parser_type": "none",
+        "duplicate_of": "none",
+        "file_type": "none",
+        "file_size": "none",
+        "creation_date": "none",
+        "last_modified_date": "none",
+    },
+}
+
+# 摘要缓存配置（按 文本+提示词+模型+max_tokens 的哈希复用摘要，跨运行、跨进程共享）
+SUMMARY_CACHE_CONFIG = {
+    # 是否启用摘要缓存
+    "enabled": True,
+    
+    # SQLite缓存文件路径
+    "path": "store/cache/summary_cache.db",
+    
+    # 缓存集合名称
+    "collection": "summaries",
+    
+    # 容量上限，超出后按最近访问时间淘汰
+    "max_entries": 200000,
+    "max_size_mb": 512,
+}
+
+# 流式摄入管道配置
+STREAMING_INGESTION_CONFIG = {
+    # 阶段之间队列的容量（决定内存上限）
+    "queue_size": 32,
+    
+    # 转换阶段每批最多处理的文档数
+    "transform_batch_size": 8,
+    
+    # 嵌入阶段每次请求最少凑齐的节点数
+    "embed_batch_size": 100,
+    
+    # 定期输出队列深度的间隔（秒），0表示不输出
+    "report_interval": 10,
+}
+
+# 文档摘要配置
+SUMMARY_CONFIG = {
+    # 摘要方式: "llm" 调用大模型生成摘要；"extractive" 本地抽取式摘要（TextRank，不调用大模型，可离线运行）
+    "mode": "llm",
+    
+    # 抽取式摘要的最大字符数
+    "extractive_max_chars": 100,
+    
+    # 摘要的最大生成token数
+    "max_tokens": 100,
+    
+    # 生成温度
+    "temperature": 0.5,
+    
+    # 同时进行的摘要请求数上限
+    "max_concurrency": 8,
+    
+    # 每分钟最多发起的请求数，None表示不限制
+    "requests_per_minute": 300,
+    
+    # 每分钟最多消耗的token数（按输入+输出估算），None表示不限制
+    "tokens_per_minute": 200000,
+    
+    # 限流（429）或服务端错误（5xx）、超时时的最大重试次数
+    "max_retries": 4,
+    
+    # 指数退避的基础等待时间和上限（秒），实际等待时间在[0, 上限]内随机抖动
+    "backoff_base": 1.0,
+    "backoff_max": 30.0,
+    
+    # 重试后仍有摘要失败时，摄入入口重新运行该批次的次数（已成功的摘要从摘要缓存读取）；
+    # 仍失败时保留没有摘要的节点但不写入管道缓存，下次运行重新摘要
+    "batch_retries": 2,
+    
+    # 单个节点摘要请求的超时（秒）
+    "timeout": 60,
+    
+    # 单次请求的输入token上限，None表示按LLM上下文窗口推算；超出时按 map-reduce 分段摘要
+    "max_input_tokens": None,
+    
+    # 是否把多篇短文档打包到一次请求中（回复为按节点ID组织的JSON，解析失败的文档改为逐个请求）
+    "pack_documents": False,
+    
+    # 一次打包请求的输入token上限和最多文档数
+    "pack_max_tokens": 2000,
+    "pack_max_docs": 10,
+    
+    # 参与打包的单篇文档token上限，更长的文档单独请求
+    "pack_doc_max_tokens": 500,
+}
+
+# 监听模式配置
+WATCH_CONFIG = {
+    # 轮询输入目录的间隔（秒）
+    "poll_interval": 5,
+    
+    # 目录在该时长内没有新变化才触发同步（秒），合并批量复制等突发修改
+    "debounce_seconds": 10,
 }
 
 # 检索配置
@@ -27,6 +235,11 @@ RETRIEVAL_CONFIG = {
     # 混合检索配置
     "enable_hybrid_search": True,
     "alpha": 0.6,  # 调整向量检索权重，增加关键词匹配权重
+    
+    # 章节扩展配置（按Markdown章节锚点索引，把命中节点所在章节的其他节点一起交给LLM）
+    "expand_sections": False,
+    "section_expansion_max_nodes": 5,  # 每个命中节点最多补充的节点数
+    "section_expansion_include_subsections": False,  # 是否同时补充子章节
 }
 
 # 文档分块配置
@@ -52,14 +265,46 @@ CHUNKING_CONFIG = {
         "separator": ",",
     },
     
-    # 默认配置
+    # 默认配置：semantic_mode 为 "sentence" 时使用 SemanticNodeParser，
+    # 为 "embedding" 时使用 EmbeddingSemanticNodeParser（见 SEMANTIC_CHUNKING_CONFIG）。
+    # SemanticNodeParser 按中英文句末标点和换行切分句子，
+    # separator 只用于切分没有标点的超长子句，中文文本之后按字符切分
     "default": {
         "chunk_size": 1024,
         "chunk_overlap": 200,
         "separator": " ",
+        "semantic_mode": "sentence",
     }
 }
 
+# 基于嵌入的语义切分配置：相邻句子的嵌入距离超过百分位阈值处断开
+SEMANTIC_CHUNKING_CONFIG = {
+    # 每个句子与前后各几个句子拼接后计算嵌入，减少单句噪声
+    "buffer_size": 1,
+    
+    # 相邻距离超过该百分位数的位置作为断点
+    "breakpoint_percentile": 95,
+    
+    # 每次嵌入请求的文本数（DashScope text-embedding-v2 单次最多25条）
+    "embed_batch_size": 25,
+}
+
+# 句子嵌入缓存配置（按 模型+文本 的哈希复用语义切分的句子嵌入）
+EMBEDDING_CACHE_CONFIG = {
+    # 是否启用嵌入缓存
+    "enabled": True,
+    
+    # SQLite缓存文件路径
+    "path": "store/cache/embedding_cache.db",
+    
+    # 缓存集合名称
+    "collection": "sentence_embeddings",
+    
+    # 容量上限，超出后按最近访问时间淘汰
+    "max_entries": 500000,
+    "max_size_mb": 4096,
+}
+
 # Embedding配置
 EMBEDDING_CONFIG = {
     "model_name": "text-embedding-v2",
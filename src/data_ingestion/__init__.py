@@ -2,7 +2,7 @@
 数据导入模块
 """
 
-from .reader import default_reader
-from .ingestion_pipeline import run_ingestion_pipeline
+from .reader import iter_documents, iter_batches
+from .ingestion_pipeline import run_ingestion_pipeline, arun_ingestion_pipeline
 
-__all__ = ["default_reader","run_ingestion_pipeline"] 
\ No newline at end of file
+__all__ = ["iter_documents", "iter_batches", "run_ingestion_pipeline", "arun_ingestion_pipeline"] 
@@ -0,0 +1,445 @@
+"""
+摄入管道转换缓存
+
+基于SQLite的本地持久化键值存储，按最近访问时间（LRU）淘汰，
+用作 IngestionPipeline 的转换缓存：键为节点内容 + 转换配置的哈希，值为转换后的节点。
+
+SummaryCache 使用同样的存储（独立的数据库文件），按 文本 + 提示词 + 模型 + max_tokens 的哈希缓存文档摘要。
+EmbeddingCache 按 模型 + 文本 的哈希缓存语义切分用到的句子嵌入。
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from llama_index.core.ingestion import IngestionCache
+from llama_index.core.storage.kvstore.types import BaseKVStore, DEFAULT_BATCH_SIZE, DEFAULT_COLLECTION
+
+from config.config_rag import INGESTION_CACHE_CONFIG, SUMMARY_CACHE_CONFIG, EMBEDDING_CACHE_CONFIG
+from src.utils import default_logger
+
+
+class SQLiteKVStore(BaseKVStore):
+    """
+    SQLite键值存储，总条数或总字节数超出上限时淘汰最久未访问的条目
+
+    条目数和总字节数由触发器维护在 kv_stats 单行表中，写入时只读这一行判断是否超限；
+    超限后按最久未访问的顺序一次淘汰到上限的90%，避免每次写入都扫描全表。
+    读取命中时只在内存中记录访问时间，攒够 ACCESS_FLUSH_SIZE 条、下一次写入或调用 flush 时
+    在一个事务中写回，读取不再每次提交事务；进程退出前未写回的访问时间只影响淘汰顺序。
+
+    Args:
+        db_path: 数据库文件路径
+        max_entries: 最大条目数，None表示不限制
+        max_size_bytes: 最大总字节数，None表示不限制
+    """
+
+    # 表结构版本，旧版本的缓存库直接重建
+    SCHEMA_VERSION = 1
+    # 超限时淘汰到上限的 1 - 1/EVICT_FRACTION
+    EVICT_FRACTION = 10
+    # 攒够这么多条访问时间后写回
+    ACCESS_FLUSH_SIZE = 256
+    # 批量读取时每条SELECT的键数（SQLite对绑定参数个数有限制）
+    READ_CHUNK_SIZE = 500
+
+    def __init__(self,
+                 db_path: str,
+                 max_entries: Optional[int] = None,
+                 max_size_bytes: Optional[int] = None):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_size_bytes = max_size_bytes
+        self._conn = None
+        self._lock = threading.Lock()
+        # (集合, 键) → 尚未写回的最近访问时间
+        self._pending_access: Dict[Tuple[str, str], float] = {}
+
+    def __getstate__(self):
+        # 连接和锁不能跨进程传递，子进程中按需重新打开；未写回的访问时间留在原进程
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        state["_lock"] = None
+        state["_pending_access"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            dir_name = os.path.dirname(self.db_path)
+            if dir_name:
+                os.makedirs(dir_name, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                self._create_schema(conn)
+            self._conn = conn
+        return self._conn
+
+    def _create_schema(self, conn: sqlite3.Connection) -> None:
+        """建表；旧版本的表（缓存内容可以重新生成）直接删除重建"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 其他进程可能已经完成了建表
+            if conn.execute("PRAGMA user_version").fetchone()[0] == self.SCHEMA_VERSION:
+                conn.commit()
+                return
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kv'").fetchone():
+                default_logger.info(f"缓存库 {self.db_path} 的表结构已过期，清空后重建")
+            conn.execute("DROP TABLE IF EXISTS kv")
+            conn.execute("DROP TABLE IF EXISTS kv_stats")
+            # size 和 last_access 放在 value 之前，淘汰时不必读取大字段
+            conn.execute(
+                "CREATE TABLE kv ("
+                "collection TEXT NOT NULL, key TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (collection, key))"
+            )
+            # 覆盖索引：按访问时间选取淘汰条目时只读索引
+            conn.execute("CREATE INDEX idx_kv_last_access ON kv (last_access, size)")
+            conn.execute(
+                "CREATE TABLE kv_stats ("
+                "id INTEGER PRIMARY KEY CHECK (id = 0), "
+                "entries INTEGER NOT NULL, total_size INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT INTO kv_stats (id, entries, total_size) VALUES (0, 0, 0)")
+            conn.execute(
+                "CREATE TRIGGER kv_stats_insert AFTER INSERT ON kv BEGIN "
+                "UPDATE kv_stats SET entries = entries + 1, total_size = total_size + NEW.size WHERE id = 0; "
+                "END"
+            )
+            conn.execute(
+                "CREATE TRIGGER kv_stats_delete AFTER DELETE ON kv BEGIN "
+                "UPDATE kv_stats SET entries = entries - 1, total_size = total_size - OLD.size WHERE id = 0; "
+                "END"
+            )
+            conn.execute(
+                "CREATE TRIGGER kv_stats_update AFTER UPDATE OF size ON kv BEGIN "
+                "UPDATE kv_stats SET total_size = total_size - OLD.size + NEW.size WHERE id = 0; "
+                "END"
+            )
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def stats(self) -> Tuple[int, int]:
+        """返回 (条目数, 总字节数)"""
+        with self._lock:
+            return self._read_stats(self._get_conn())
+
+    @staticmethod
+    def _read_stats(conn: sqlite3.Connection) -> Tuple[int, int]:
+        entries, total_size = conn.execute("SELECT entries, total_size FROM kv_stats WHERE id = 0").fetchone()
+        return entries, total_size
+
+    def _low_water(self, limit: int) -> int:
+        return limit - limit // self.EVICT_FRACTION
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """超出条数或大小上限时，按最久未访问的顺序批量淘汰到上限的90%"""
+        if self.max_entries is None and self.max_size_bytes is None:
+            return
+        count, total_size = self._read_stats(conn)
+        over_count = over_size = 0
+        if self.max_entries is not None and count > self.max_entries:
+            over_count = count - self._low_water(self.max_entries)
+        if self.max_size_bytes is not None and total_size > self.max_size_bytes:
+            over_size = total_size - self._low_water(self.max_size_bytes)
+        if not over_count and not over_size:
+            return
+
+        victims = []
+        freed_size = 0
+        cursor = conn.execute("SELECT rowid, size FROM kv ORDER BY last_access ASC")
+        for rowid, size in cursor:
+            if len(victims) >= over_count and freed_size >= over_size:
+                break
+            victims.append((rowid,))
+            freed_size += size
+        cursor.close()
+        conn.executemany("DELETE FROM kv WHERE rowid = ?", victims)
+        default_logger.debug(f"转换缓存淘汰了 {len(victims)} 个条目，释放 {freed_size} 字节")
+
+    def _flush_access(self, conn: sqlite3.Connection) -> None:
+        """把攒下的访问时间写入当前事务（由调用方提交）"""
+        if not self._pending_access:
+            return
+        conn.executemany(
+            "UPDATE kv SET last_access = ? WHERE collection = ? AND key = ?",
+            [(accessed, collection, key) for (collection, key), accessed in self._pending_access.items()],
+        )
+        self._pending_access.clear()
+
+    def _record_access(self, conn: sqlite3.Connection, collection: str, keys: Iterable[str]) -> None:
+        now = time.time()
+        for key in keys:
+            self._pending_access[(collection, key)] = now
+        if len(self._pending_access) >= self.ACCESS_FLUSH_SIZE:
+            self._flush_access(conn)
+            conn.commit()
+
+    def flush(self) -> None:
+        """立即写回尚未保存的访问时间"""
+        with self._lock:
+            if self._pending_access:
+                conn = self._get_conn()
+                self._flush_access(conn)
+                conn.commit()
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put_all([(key, val)], collection=collection)
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        await asyncio.to_thread(self.put, key, val, collection=collection)
+
+    def put_all(self,
+                kv_pairs: List[Tuple[str, dict]],
+                collection: str = DEFAULT_COLLECTION,
+                batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        """在一个事务中写入多个条目（batch_size 只为兼容 BaseKVStore 接口，不影响写入方式）"""
+        now = time.time()
+        rows = []
+        for key, val in kv_pairs:
+            value = json.dumps(val, ensure_ascii=False)
+            rows.append((collection, key, len(value.encode("utf-8")), now, value))
+        if not rows:
+            return
+        with self._lock:
+            conn = self._get_conn()
+            # 先写回访问时间，淘汰时按最新的访问顺序
+            self._flush_access(conn)
+            # 用UPSERT而不是INSERT OR REPLACE：后者替换时不触发DELETE触发器，统计会偏大
+            conn.executemany(
+                "INSERT INTO kv (collection, key, size, last_access, value) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (collection, key) DO UPDATE SET "
+                "size = excluded.size, last_access = excluded.last_access, value = excluded.value",
+                rows,
+            )
+            self._evict(conn)
+            conn.commit()
+
+    async def aput_all(self,
+                       kv_pairs: List[Tuple[str, dict]],
+                       collection: str = DEFAULT_COLLECTION,
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        await asyncio.to_thread(self.put_all, kv_pairs, collection=collection)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get_many([key], collection=collection).get(key)
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return await asyncio.to_thread(self.get, key, collection=collection)
+
+    def get_many(self, keys: Iterable[str], collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        """批量读取，只返回命中的键"""
+        keys = list(dict.fromkeys(keys))
+        rows = []
+        with self._lock:
+            conn = self._get_conn()
+            for start in range(0, len(keys), self.READ_CHUNK_SIZE):
+                chunk = keys[start:start + self.READ_CHUNK_SIZE]
+                placeholders = ", ".join("?" * len(chunk))
+                rows.extend(conn.execute(
+                    f"SELECT key, value FROM kv WHERE collection = ? AND key IN ({placeholders})",
+                    (collection, *chunk),
+                ).fetchall())
+            self._record_access(conn, collection, [key for key, _ in rows])
+        return {key: json.loads(value) for key, value in rows}
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._get_conn().execute(
+                "SELECT key, value FROM kv WHERE collection = ?", (collection,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return await asyncio.to_thread(self.get_all, collection=collection)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self._lock:
+            conn = self._get_conn()
+            cursor = conn.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+            conn.commit()
+        return cursor.rowcount > 0
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return await asyncio.to_thread(self.delete, key, collection=collection)
+
+
+def create_ingestion_cache() -> Optional[IngestionCache]:
+    """
+    根据INGESTION_CACHE_CONFIG创建持久化的转换缓存
+
+    Returns:
+        IngestionCache实例，缓存被禁用时返回None
+    """
+    if not INGESTION_CACHE_CONFIG.get("enabled", True):
+        return None
+
+    max_size_mb = INGESTION_CACHE_CONFIG.get("max_size_mb")
+    kv_store = SQLiteKVStore(
+        db_path=INGESTION_CACHE_CONFIG.get("path", "store/cache/ingestion_cache.db"),
+        max_entries=INGESTION_CACHE_CONFIG.get("max_entries"),
+        max_size_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+    )
+    return IngestionCache(cache=kv_store, collection=INGESTION_CACHE_CONFIG.get("collection", "ingestion"))
+
+
+class SummaryCache:
+    """
+    内容寻址的摘要缓存，统计命中和未命中次数
+
+    Args:
+        kv_store: 底层键值存储
+        collection: 集合名称
+    """
+
+    def __init__(self, kv_store: BaseKVStore, collection: str = "summaries"):
+        self.kv_store = kv_store
+        self.collection = collection
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, prompt: str, model: Optional[str], max_tokens: Optional[int]) -> str:
+        payload = json.dumps([text, prompt, model, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.kv_store.get(key, collection=self.collection)
+        except Exception as e:
+            # 缓存不可用时当作未命中，不影响摘要生成
+            default_logger.warning(f"读取摘要缓存失败: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value["summary"]
+
+    def put(self, key: str, summary: str) -> None:
+        try:
+            self.kv_store.put(key, {"summary": summary}, collection=self.collection)
+        except Exception as e:
+            default_logger.warning(f"写入摘要缓存失败: {e}")
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+def create_summary_cache() -> Optional[SummaryCache]:
+    """
+    根据SUMMARY_CACHE_CONFIG创建持久化的摘要缓存
+
+    Returns:
+        SummaryCache实例，缓存被禁用时返回None
+    """
+    if not SUMMARY_CACHE_CONFIG.get("enabled", True):
+        return None
+
+    max_size_mb = SUMMARY_CACHE_CONFIG.get("max_size_mb")
+    kv_store = SQLiteKVStore(
+        db_path=SUMMARY_CACHE_CONFIG.get("path", "store/cache/summary_cache.db"),
+        max_entries=SUMMARY_CACHE_CONFIG.get("max_entries"),
+        max_size_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+    )
+    return SummaryCache(kv_store, collection=SUMMARY_CACHE_CONFIG.get("collection", "summaries"))
+
+
+class EmbeddingCache:
+    """
+    内容寻址的嵌入缓存，向量以float32字节的base64保存，统计命中和未命中次数
+
+    Args:
+        kv_store: 底层键值存储
+        collection: 集合名称
+    """
+
+    def __init__(self, kv_store: BaseKVStore, collection: str = "embeddings"):
+        self.kv_store = kv_store
+        self.collection = collection
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, model: Optional[str]) -> str:
+        payload = json.dumps([text, model], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _read_many(self, keys: List[str]) -> Dict[str, dict]:
+        if isinstance(self.kv_store, SQLiteKVStore):
+            return self.kv_store.get_many(keys, collection=self.collection)
+        values = {}
+        for key in keys:
+            value = self.kv_store.get(key, collection=self.collection)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """批量读取，只返回命中的键"""
+        keys = list(keys)
+        try:
+            values = self._read_many(keys)
+        except Exception as e:
+            # 缓存不可用时当作未命中，不影响切分
+            default_logger.warning(f"读取嵌入缓存失败: {e}")
+            values = {}
+        found = {}
+        for key in keys:
+            value = values.get(key)
+            if value is None:
+                self.misses += 1
+                continue
+            self.hits += 1
+            found[key] = np.frombuffer(base64.b64decode(value["embedding"]), dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, embeddings: Dict[str, List[float]]) -> None:
+        """批量写入（SQLiteKVStore在一个事务中写入）"""
+        kv_pairs = [
+            (key, {"embedding": base64.b64encode(np.asarray(embedding, dtype=np.float32).tobytes()).decode("ascii")})
+            for key, embedding in embeddings.items()
+        ]
+        try:
+            self.kv_store.put_all(kv_pairs, collection=self.collection)
+        except Exception as e:
+            default_logger.warning(f"写入嵌入缓存失败: {e}")
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    根据EMBEDDING_CACHE_CONFIG创建持久化的嵌入缓存
+
+    Returns:
+        EmbeddingCache实例，缓存被禁用时返回None
+    """
+    if not EMBEDDING_CACHE_CONFIG.get("enabled", True):
+        return None
+
+    max_size_mb = EMBEDDING_CACHE_CONFIG.get("max_size_mb")
+    kv_store = SQLiteKVStore(
+        db_path=EMBEDDING_CACHE_CONFIG.get("path", "store/cache/embedding_cache.db"),
+        max_entries=EMBEDDING_CACHE_CONFIG.get("max_entries"),
+        max_size_bytes=int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+    )
+    return EmbeddingCache(kv_store, collection=EMBEDDING_CACHE_CONFIG.get("collection", "embeddings"))
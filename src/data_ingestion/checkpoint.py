@@ -0,0 +1,138 @@
+"""
+摄入检查点
+
+长时间运行的摄入任务在每个阶段完成后把结果追加写入检查点目录：
+    transformed.jsonl  基础管道（清洗、分类、摘要）处理后的文档
+    chunked.jsonl      每个文档切分后的节点（作为该文档的完成标记）
+进程中途退出后重新运行时，已完成切分的文档直接复用节点，已完成转换的文档只需重新切分。
+检查点以文档ID为键，需要文档ID在多次读取之间保持稳定（reader已按路径和内容生成确定性ID）。
+"""
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Sequence
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+from src.utils import default_logger
+
+TRANSFORMED_FILE = "transformed.jsonl"
+CHUNKED_FILE = "chunked.jsonl"
+
+
+class IngestionCheckpoint:
+    """
+    摄入检查点
+
+    Args:
+        checkpoint_dir: 检查点目录
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = checkpoint_dir
+        self._transformed: Dict[str, BaseNode] = {}
+        self._chunked: Dict[str, List[BaseNode]] = {}
+        self._load()
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.checkpoint_dir, file_name)
+
+    @staticmethod
+    def _truncate_partial_line(path: str) -> None:
+        """截掉进程在写入过程中退出留下的不完整最后一行，避免下一条记录接在它后面"""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            # 从文件末尾向前查找最后一个换行符
+            while pos > 0:
+                size = min(4096, pos)
+                f.seek(pos - size)
+                block = f.read(size)
+                idx = block.rfind(b"\n")
+                if idx >= 0:
+                    pos = pos - size + idx + 1
+                    break
+                pos -= size
+            if pos < end:
+                default_logger.warning(f"检查点 {path} 最后一行不完整（{end - pos} 字节），已截断")
+                f.truncate(pos)
+
+    @staticmethod
+    def _read_lines(path: str):
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程在写入过程中退出会留下不完整的最后一行，忽略即可
+                    default_logger.warning(f"检查点 {path} 第 {line_no} 行不完整，已忽略")
+
+    def _load(self) -> None:
+        for file_name in (TRANSFORMED_FILE, CHUNKED_FILE):
+            self._truncate_partial_line(self._path(file_name))
+        for record in self._read_lines(self._path(TRANSFORMED_FILE)):
+            self._transformed[record["doc_id"]] = json_to_doc(record["node"])
+        for record in self._read_lines(self._path(CHUNKED_FILE)):
+            self._chunked[record["doc_id"]] = [json_to_doc(node) for node in record["nodes"]]
+        if self._transformed or self._chunked:
+            default_logger.info(f"从检查点 {self.checkpoint_dir} 恢复: "
+                                f"{len(self._chunked)} 个文档已完成切分，"
+                                f"{len(self._transformed)} 个文档已完成转换")
+
+    def _append(self, file_name: str, records: List[dict]) -> None:
+        if not records:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+        # 不使用缓冲，截断后不会再有残留的缓冲数据被写回文件
+        with open(self._path(file_name), "ab", buffering=0) as f:
+            start = f.seek(0, os.SEEK_END)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[f.write(view):]
+                os.fsync(f.fileno())
+            except BaseException:
+                # 写入失败（如磁盘已满）时回退到写入前的位置，不留下不完整的行
+                f.truncate(start)
+                raise
+
+    def is_chunked(self, doc_id: str) -> bool:
+        return doc_id in self._chunked
+
+    def get_chunks(self, doc_id: str) -> Optional[List[BaseNode]]:
+        return self._chunked.get(doc_id)
+
+    def get_transformed(self, doc_id: str) -> Optional[BaseNode]:
+        return self._transformed.get(doc_id)
+
+    def save_transformed(self, docs: Sequence[BaseNode]) -> None:
+        """记录基础管道处理后的文档"""
+        self._append(TRANSFORMED_FILE, [{"doc_id": doc.id_, "node": doc_to_json(doc)} for doc in docs])
+        for doc in docs:
+            self._transformed[doc.id_] = doc
+
+    def save_chunks(self, chunks_by_doc: Dict[str, List[BaseNode]]) -> None:
+        """记录文档的切分结果，同时标记这些文档已完成"""
+        self._append(CHUNKED_FILE, [
+            {"doc_id": doc_id, "nodes": [doc_to_json(node) for node in nodes]}
+            for doc_id, nodes in chunks_by_doc.items()
+        ])
+        for doc_id, nodes in chunks_by_doc.items():
+            self._chunked[doc_id] = nodes
+            # 已完成切分的文档不再需要转换结果
+            self._transformed.pop(doc_id, None)
+
+    def clear(self) -> None:
+        """删除检查点（整个运行成功完成后调用）"""
+        self._transformed.clear()
+        self._chunked.clear()
+        if os.path.isdir(self.checkpoint_dir):
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
@@ -1,20 +1,115 @@
 from llama_index.core import Document
 from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.ingestion.pipeline import get_transformation_hash
 from llama_index.core.node_parser import TokenTextSplitter
 from llama_index.core.extractors import KeywordExtractor
 from llama_index.embeddings.openai import OpenAIEmbedding
-from src.transformations import (DataCleanerTransform, DocsSummarizerTransform, DocumentURLNormalizerTransform,CategoryExtract)
+from src.transformations import (DataCleanerTransform, DocsSummarizerTransform, DocumentURLNormalizerTransform,CategoryExtract,
+                                 ExtractiveSummarizerTransform, NearDuplicateTransform,
+                                 MetadataPolicyTransform, SummaryError)
 from src.models import EmbeddingFactory, EmbeddingProviderType
 from llama_index.core.node_parser import SentenceSplitter
-from src.data_ingestion.reader import default_reader
-from typing import List, Optional, Tuple
-from llama_index.core.schema import BaseNode
+from src.data_ingestion.reader import iter_documents, iter_batches
+from src.data_ingestion.cache import create_ingestion_cache
+from src.data_ingestion.checkpoint import IngestionCheckpoint
+from typing import Dict, List, Optional, Tuple
+from llama_index.core.schema import BaseNode, TransformComponent
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import contextlib
+import multiprocessing
 import os
-from config.config_rag import DOCUMENT_CONFIG, CHUNKING_CONFIG
-from src.node_parser.node_parser_tool import get_parser_for_document
+import time
+from config.config_rag import DOCUMENT_CONFIG, CHUNKING_CONFIG, SUMMARY_CONFIG, DEDUP_CONFIG, METADATA_CONFIG
+from src.node_parser.node_parser_tool import get_parser_for_document, get_document_type
 
-def create_pipeline_with_chunking():
-    """创建包含文档切分功能的数据摄入管道"""
+def create_summarizer(summary_mode: Optional[str] = None):
+    """
+    根据摘要方式创建摘要转换
+    
+    Args:
+        summary_mode: "llm" 或 "extractive"，默认使用SUMMARY_CONFIG["mode"]
+    """
+    summary_mode = summary_mode or SUMMARY_CONFIG.get("mode", "llm")
+    if summary_mode == "llm":
+        return DocsSummarizerTransform()
+    if summary_mode == "extractive":
+        return ExtractiveSummarizerTransform(max_chars=SUMMARY_CONFIG.get("extractive_max_chars", 100))
+    raise ValueError(f"不支持的摘要方式: {summary_mode}")
+
+def create_deduplicator(level: str = "document") -> Optional[NearDuplicateTransform]:
+    """
+    根据DEDUP_CONFIG创建近似重复检测转换
+    
+    Args:
+        level: "document"（摘要之前）或 "chunk"（切分之后），对应的检测未启用时返回None
+    """
+    enabled = DEDUP_CONFIG.get("enabled", False) if level == "document" else DEDUP_CONFIG.get("chunk_level", False)
+    if not enabled:
+        return None
+    report_path = DEDUP_CONFIG.get("report_path")
+    scope = "global" if level == "document" else DEDUP_CONFIG.get("chunk_scope", "document")
+    return NearDuplicateTransform(scope=scope, report_path=report_path.format(level=level) if report_path else None)
+
+def create_metadata_policy() -> Optional[MetadataPolicyTransform]:
+    """根据METADATA_CONFIG创建元数据策略转换，未启用时返回None"""
+    if not METADATA_CONFIG.get("enabled", False):
+        return None
+    return MetadataPolicyTransform()
+
+def drop_duplicate_documents(documents: List[BaseNode],
+                             deduplicator: Optional[NearDuplicateTransform]) -> List[BaseNode]:
+    """
+    在缓存管道之前做文档级近似重复检测
+    
+    检测器跨批次记住已处理的文档，输出取决于之前的批次，不能放进按（批次内容, 转换配置）
+    缓存结果的管道：否则重复文档被丢弃后缓存的空结果会在代表文档删除后继续命中。
+    在管道之前检测，重复的版本同样不会进入摘要。
+    """
+    return deduplicator(documents) if deduplicator is not None else documents
+
+def drop_superseded_documents(nodes: List[BaseNode],
+                              deduplicator: Optional[NearDuplicateTransform]) -> List[BaseNode]:
+    """
+    去掉已被较新版本取代的文档产生的节点
+
+    检测器保留修改时间最新的版本：较新的版本在之后的批次中出现时，之前批次保留的旧版本已经处理完，
+    在所有批次完成后统一去掉。标记模式（link）保留所有版本。
+    """
+    if deduplicator is None or deduplicator.action != "drop" or not deduplicator.superseded:
+        return nodes
+    superseded = deduplicator.superseded
+    kept = [node for node in nodes if (node.ref_doc_id or node.node_id) not in superseded]
+    if len(kept) < len(nodes):
+        print(f"去掉 {len(nodes) - len(kept)} 个已被较新版本取代的节点")
+    return kept
+
+def _base_transformations(summary_mode: Optional[str], with_metadata_policy: bool = True) -> list:
+    """
+    清洗 → URL规范化 → 分类提取 → 摘要 → 元数据策略（文档级近似重复检测在管道之前，见 drop_duplicate_documents）
+    
+    Args:
+        with_metadata_policy: 是否在末尾加入元数据策略；后面还有切分步骤时只在切分之后应用一次
+    """
+    transformations = [
+        DataCleanerTransform(),           # 数据清洗，实例化类
+        DocumentURLNormalizerTransform(), # 文档URL规范化，实例化类
+        CategoryExtract(),                # 分类提取，实例化类
+        create_summarizer(summary_mode),  # 文档摘要，实例化类
+    ]
+    metadata_policy = create_metadata_policy() if with_metadata_policy else None
+    if metadata_policy is not None:
+        transformations.append(metadata_policy)  # 元数据策略，切分出的节点继承排除键
+    return transformations
+
+def create_pipeline_with_chunking(summary_mode: Optional[str] = None):
+    """创建包含文档切分功能的数据摄入管道（启用持久化转换缓存）
+    
+    Args:
+        summary_mode: 摘要方式，"llm" 或 "extractive"，默认使用SUMMARY_CONFIG["mode"]
+    """
     
     # 获取默认配置用于切分
     default_config = CHUNKING_CONFIG.get("default", {
@@ -23,77 +118,489 @@ def create_pipeline_with_chunking():
         "separator": " "
     })
     
+    transformations = _base_transformations(summary_mode, with_metadata_policy=False) + [
+        # 添加文档切分步骤
+        SentenceSplitter(
+            chunk_size=default_config["chunk_size"],
+            chunk_overlap=default_config["chunk_overlap"],
+            separator=default_config["separator"]
+        )
+    ]
+    metadata_policy = create_metadata_policy()
+    if metadata_policy is not None:
+        transformations.append(metadata_policy)  # 只在切分之后应用一次，切分时新增的元数据也按策略处理
+    
     return IngestionPipeline(
-        transformations=[
-            DataCleanerTransform(),          # 数据清洗，实例化类
-            DocumentURLNormalizerTransform(), # 文档URL规范化，实例化类
-            CategoryExtract(),               # 分类提取，实例化类
-            DocsSummarizerTransform(),       # 文档摘要，实例化类
-            # 添加文档切分步骤
-            SentenceSplitter(
-                chunk_size=default_config["chunk_size"],
-                chunk_overlap=default_config["chunk_overlap"],
-                separator=default_config["separator"]
-            )
-        ]
+        transformations=transformations,
+        cache=create_ingestion_cache(),
     )
 
-def create_pipeline():
-    """创建并返回数据摄入管道（保持向后兼容）"""
+def create_pipeline(summary_mode: Optional[str] = None):
+    """创建并返回数据摄入管道（保持向后兼容，启用持久化转换缓存）
+    
+    Args:
+        summary_mode: 摘要方式，"llm" 或 "extractive"，默认使用SUMMARY_CONFIG["mode"]
+    """
     return IngestionPipeline(
-        transformations=[
-            DataCleanerTransform(),  # 数据清洗，实例化类
-            DocumentURLNormalizerTransform(),  # 文档URL规范化，实例化类
-            CategoryExtract(),  # 分类提取，实例化类
-            DocsSummarizerTransform()  # 文档摘要，实例化类
-        ]
+        transformations=_base_transformations(summary_mode),
+        cache=create_ingestion_cache(),
     )
 
-def run_ingestion_pipeline_with_smart_chunking(documents=None) -> List[BaseNode]:
+@contextlib.contextmanager
+def _allow_summary_failures(pipeline: IngestionPipeline):
+    """临时关闭管道缓存，并让摘要失败时照常返回节点"""
+    summarizers = [t for t in pipeline.transformations if isinstance(t, DocsSummarizerTransform)]
+    raise_on_failure = [summarizer.raise_on_failure for summarizer in summarizers]
+    disable_cache = pipeline.disable_cache
+    pipeline.disable_cache = True
+    for summarizer in summarizers:
+        summarizer.raise_on_failure = False
+    try:
+        yield
+    finally:
+        pipeline.disable_cache = disable_cache
+        for summarizer, previous in zip(summarizers, raise_on_failure):
+            summarizer.raise_on_failure = previous
+
+def _copy_documents(batch: List[BaseNode]) -> List[BaseNode]:
+    # 转换会原地修改文档（清洗、路径标准化），每次运行使用原始文档的副本
+    return [doc.model_copy(deep=True) for doc in batch]
+
+def run_pipeline_batch(pipeline: IngestionPipeline, batch: List[BaseNode]) -> List[BaseNode]:
+    """
+    运行管道处理一个批次，摘要失败时重试
+    
+    重试后仍有节点摘要失败时 DocsSummarizerTransform 抛出 SummaryError，管道不会缓存这个批次的结果；
+    这里重新运行该批次（共 SUMMARY_CONFIG["batch_retries"] 次），已成功的摘要从摘要缓存读取，
+    只有失败的节点重新请求。仍然失败时不使用管道缓存运行一次，保留没有摘要的节点，下次运行重新摘要。
+    """
+    retries = max(0, int(SUMMARY_CONFIG.get("batch_retries", 2)))
+    for attempt in range(retries + 1):
+        try:
+            return pipeline.run(documents=_copy_documents(batch))
+        except SummaryError as e:
+            print(f"第 {attempt + 1} 次运行有 {len(e.failed_nodes)} 个节点摘要失败: "
+                  f"{[node.id_ for node in e.failed_nodes]}")
+    print("摘要重试后仍然失败，保留没有摘要的节点（不写入管道缓存）")
+    with _allow_summary_failures(pipeline):
+        return pipeline.run(documents=_copy_documents(batch))
+
+async def _arun_pipeline(pipeline: IngestionPipeline, documents: List[BaseNode]) -> List[BaseNode]:
+    """
+    依次执行管道中的转换，不阻塞事件循环
+    
+    与 IngestionPipeline.arun 的区别：转换哈希和缓存读写（SQLite）放到线程中执行，
+    没有自己实现 acall 的转换（默认 acall 直接同步调用 __call__）也在线程中执行。
+    本项目的管道不配置docstore和向量存储，其余流程与 arun 相同；配置了时退回 arun。
+    """
+    if pipeline.docstore is not None or pipeline.vector_store is not None:
+        return await pipeline.arun(documents=documents)
+    
+    cache = pipeline.cache if not pipeline.disable_cache else None
+    nodes = list(documents)
+    for transform in pipeline.transformations:
+        if cache is not None:
+            key = await asyncio.to_thread(get_transformation_hash, nodes, transform)
+            cached_nodes = await asyncio.to_thread(cache.get, key)
+            if cached_nodes is not None:
+                nodes = cached_nodes
+                continue
+        if type(transform).acall is TransformComponent.acall:
+            nodes = await asyncio.to_thread(transform, nodes)
+        else:
+            nodes = await transform.acall(nodes)
+        if cache is not None:
+            await asyncio.to_thread(cache.put, key, nodes)
+    return list(nodes or [])
+
+async def arun_pipeline_batch(pipeline: IngestionPipeline, batch: List[BaseNode]) -> List[BaseNode]:
+    """run_pipeline_batch 的异步版本"""
+    retries = max(0, int(SUMMARY_CONFIG.get("batch_retries", 2)))
+    for attempt in range(retries + 1):
+        try:
+            return await _arun_pipeline(pipeline, _copy_documents(batch))
+        except SummaryError as e:
+            print(f"第 {attempt + 1} 次运行有 {len(e.failed_nodes)} 个节点摘要失败: "
+                  f"{[node.id_ for node in e.failed_nodes]}")
+    print("摘要重试后仍然失败，保留没有摘要的节点（不写入管道缓存）")
+    with _allow_summary_failures(pipeline):
+        return await _arun_pipeline(pipeline, _copy_documents(batch))
+
+def _chunk_batch(docs: List[BaseNode]) -> List[Optional[List[BaseNode]]]:
+    """
+    使用同一个解析器批量切分同类型的文档（可在子进程中执行）
+    
+    Args:
+        docs: 文档类型相同的文档列表
+    Returns:
+        与docs一一对应的切分结果，切分失败的文档对应None
+    """
+    parser = get_parser_for_document(docs[0])
+    doc_ids = [doc.id_ for doc in docs]
+    
+    if len(set(doc_ids)) == len(docs):
+        try:
+            nodes = parser.get_nodes_from_documents(docs)
+            nodes_by_doc = {doc_id: [] for doc_id in doc_ids}
+            for node in nodes:
+                nodes_by_doc[node.ref_doc_id].append(node)
+            return [nodes_by_doc[doc_id] for doc_id in doc_ids]
+        except Exception as e:
+            print(f"批量切分 {len(docs)} 个文档失败，改为逐个切分: {e}")
+    
+    # 逐个切分，隔离出错的文档
+    results = []
+    for doc in docs:
+        try:
+            results.append(parser.get_nodes_from_documents([doc]))
+        except Exception as e:
+            print(f"处理文档 {doc.metadata.get('file_name', 'Unknown')} 时出错: {e}")
+            results.append(None)
+    return results
+
+class ChunkingPool:
+    """
+    切分进程池，任务超时或子进程崩溃后可以整体重建
+
+    ProcessPoolExecutor 无法中断正在运行的任务：超时的任务会一直占用进程槽位，
+    因此超时后终止全部子进程并换一个新的进程池。
+
+    Args:
+        max_workers: 子进程数
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = self._create_executor()
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    def restart(self) -> None:
+        """终止当前子进程（包括卡住的任务）并创建新的进程池"""
+        self.shutdown()
+        self._executor = self._create_executor()
+
+    def shutdown(self) -> None:
+        """不等待正在运行的任务，直接终止子进程"""
+        processes = list((self._executor._processes or {}).values())
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+def _chunk_batches_in_pool(docs: List[BaseNode],
+                           batches: List[List[int]],
+                           pool: ChunkingPool,
+                           timeout: Optional[float]) -> List[Optional[List[BaseNode]]]:
+    """
+    在进程池中切分各批次，同时运行的批次数不超过子进程数，保证计时从批次开始运行时算起
+
+    批次的时限为 timeout × 文档数。批次超时后重建进程池，把该批次拆成单个文档重新切分，
+    只有单独切分仍超时的文档切分失败；同时在运行的其他批次重新提交。
+    """
+    results = [None] * len(docs)
+    pending = deque(batches)
+    running = {}
+    while pending or running:
+        while pending and len(running) < pool.max_workers:
+            batch = pending.popleft()
+            future = pool.submit(_chunk_batch, [docs[i] for i in batch])
+            running[future] = (batch, time.monotonic() + timeout * len(batch) if timeout else None)
+        
+        deadlines = [deadline for _, deadline in running.values() if deadline is not None]
+        wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        done, _ = wait(running, timeout=wait_time, return_when=FIRST_COMPLETED)
+        
+        broken = False
+        for future in done:
+            batch, _ = running.pop(future)
+            try:
+                batch_results = future.result()
+            except Exception as e:
+                print(f"切分 {len(batch)} 个文档时子进程出错，保留原文档: {e}")
+                broken = broken or isinstance(e, BrokenProcessPool)
+                batch_results = [None] * len(batch)
+            for idx, result in zip(batch, batch_results):
+                results[idx] = result
+        
+        now = time.monotonic()
+        expired = [future for future, (_, deadline) in running.items() if deadline is not None and deadline <= now]
+        for future in expired:
+            batch, _ = running.pop(future)
+            if len(batch) > 1:
+                print(f"切分 {len(batch)} 个文档超时，逐个重新切分")
+                pending.extend([idx] for idx in batch)
+            else:
+                print(f"文档 {docs[batch[0]].metadata.get('file_name', 'Unknown')} 切分超时，保留原文档")
+        
+        if expired or broken:
+            # 重建进程池会终止所有子进程，仍在运行的批次放回队首重新提交
+            for batch, _ in reversed(list(running.values())):
+                pending.appendleft(batch)
+            running.clear()
+            pool.restart()
+    return results
+
+def chunk_documents(docs: List[BaseNode],
+                    executor: Optional[ChunkingPool] = None,
+                    batch_size: Optional[int] = None,
+                    timeout: Optional[float] = None) -> List[BaseNode]:
+    """
+    按文档类型分组后批量切分文档，保持输入顺序
+    
+    Args:
+        docs: 经过基础管道处理的文档
+        executor: 切分进程池，为None时在当前进程中切分
+        batch_size: 每次提交给解析器的文档数，默认使用DOCUMENT_CONFIG["chunking_batch_size"]
+        timeout: 单个文档的切分超时（秒），仅在使用进程池时生效，
+                 默认使用DOCUMENT_CONFIG["chunking_timeout"]。
+                 一个批次的时限为 timeout × 文档数，超时后逐个文档重新切分，
+                 单个文档超过 timeout 时保留原文档
+    Returns:
+        切分后的节点列表（已应用元数据策略），切分失败或超时的文档保留原文档
+    """
+    if batch_size is None:
+        batch_size = DOCUMENT_CONFIG.get("chunking_batch_size", 16)
+    if timeout is None:
+        timeout = DOCUMENT_CONFIG.get("chunking_timeout")
+    batch_size = max(1, int(batch_size))
+    
+    # 按文档类型分组，同组文档共用一个解析器
+    groups = {}
+    for idx, doc in enumerate(docs):
+        groups.setdefault(get_document_type(doc), []).append(idx)
+    batches = [indices[i:i + batch_size]
+               for indices in groups.values()
+               for i in range(0, len(indices), batch_size)]
+    
+    if executor is None:
+        results = [None] * len(docs)
+        for batch in batches:
+            for idx, result in zip(batch, _chunk_batch([docs[i] for i in batch])):
+                results[idx] = result
+    else:
+        results = _chunk_batches_in_pool(docs, batches, executor, timeout)
+    
+    all_chunks = []
+    for doc, chunks in zip(docs, results):
+        if chunks is None:
+            # 如果切分失败，保留原文档
+            all_chunks.append(doc)
+        else:
+            print(f"文档 {doc.metadata.get('file_name', 'Unknown')} 切分为 {len(chunks)} 个块")
+            all_chunks.extend(chunks)
+    
+    # 解析器新增的元数据（如parser_type）也按策略处理
+    metadata_policy = create_metadata_policy()
+    if metadata_policy is not None:
+        all_chunks = metadata_policy(all_chunks)
+    return all_chunks
+
+def _docs_to_transform(batch: List[BaseNode], checkpoint: IngestionCheckpoint) -> List[BaseNode]:
+    """批次中尚未完成转换或切分的文档"""
+    to_transform = [doc for doc in batch
+                    if not checkpoint.is_chunked(doc.id_) and checkpoint.get_transformed(doc.id_) is None]
+    if len(to_transform) < len(batch):
+        print(f"从检查点恢复 {len(batch) - len(to_transform)} 个文档")
+    return to_transform
+
+def _chunk_batch_with_checkpoint(batch: List[BaseNode],
+                                 checkpoint: IngestionCheckpoint,
+                                 executor: Optional[ChunkingPool] = None) -> List[BaseNode]:
+    """切分批次中已完成转换的文档并写入检查点，返回该批次按输入顺序排列的节点"""
+    to_chunk = [checkpoint.get_transformed(doc.id_) for doc in batch if not checkpoint.is_chunked(doc.id_)]
+    to_chunk = [doc for doc in to_chunk if doc is not None]
+    if to_chunk:
+        chunks_by_doc: Dict[str, List[BaseNode]] = {doc.id_: [] for doc in to_chunk}
+        for chunk in chunk_documents(to_chunk, executor=executor):
+            chunks_by_doc.setdefault(chunk.ref_doc_id or chunk.id_, []).append(chunk)
+        checkpoint.save_chunks(chunks_by_doc)
+    
+    nodes = []
+    for doc in batch:
+        nodes.extend(checkpoint.get_chunks(doc.id_) or [])
+    return nodes
+
+def _process_batch_with_checkpoint(batch: List[BaseNode],
+                                   base_pipeline: IngestionPipeline,
+                                   checkpoint: IngestionCheckpoint,
+                                   executor: Optional[ChunkingPool] = None) -> List[BaseNode]:
+    """
+    处理一个批次并写入检查点，已在检查点中的文档跳过对应阶段
+    
+    Returns:
+        该批次文档切分后的节点，按输入顺序排列
+    """
+    to_transform = _docs_to_transform(batch, checkpoint)
+    if to_transform:
+        checkpoint.save_transformed(run_pipeline_batch(base_pipeline, to_transform))
+    return _chunk_batch_with_checkpoint(batch, checkpoint, executor)
+
+async def _aprocess_batch_with_checkpoint(batch: List[BaseNode],
+                                          base_pipeline: IngestionPipeline,
+                                          checkpoint: IngestionCheckpoint,
+                                          executor: Optional[ChunkingPool] = None) -> List[BaseNode]:
+    """_process_batch_with_checkpoint 的异步版本，检查点读写（含fsync）和切分在线程中执行，不阻塞事件循环"""
+    to_transform = await asyncio.to_thread(_docs_to_transform, batch, checkpoint)
+    if to_transform:
+        transformed = await arun_pipeline_batch(base_pipeline, to_transform)
+        await asyncio.to_thread(checkpoint.save_transformed, transformed)
+    return await asyncio.to_thread(_chunk_batch_with_checkpoint, batch, checkpoint, executor)
+
+def _resolve_documents(documents):
+    """未提供文档时从配置的输入目录惰性读取"""
+    if documents is not None:
+        return documents
+    # 从配置中获取文档目录路径
+    input_dir = DOCUMENT_CONFIG.get("input_dir", "data")
+    recursive = DOCUMENT_CONFIG.get("recursive", True)
+    
+    print(f"使用配置从 {input_dir} 读取文档，递归={recursive}")
+    return iter_documents(input_dir=input_dir, recursive=recursive)
+
+def _create_chunking_executor() -> Optional[ChunkingPool]:
+    """DOCUMENT_CONFIG["chunking_workers"] > 1 时创建切分进程池"""
+    chunking_workers = min(int(DOCUMENT_CONFIG.get("chunking_workers", 1) or 1), os.cpu_count() or 1)
+    if chunking_workers <= 1:
+        return None
+    print(f"使用 {chunking_workers} 个进程并行切分文档")
+    return ChunkingPool(chunking_workers)
+
+async def _aiter_batches(documents):
+    """在线程中读取文档批次（文件读取和解析是阻塞操作），逐批产出"""
+    batches = iter_batches(documents)
+    while True:
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            return
+        yield batch
+
+def run_ingestion_pipeline_with_smart_chunking(documents=None, checkpoint_dir: Optional[str] = None,
+                                               document_deduplicator: Optional[NearDuplicateTransform] = None
+                                               ) -> List[BaseNode]:
     """
     运行数据摄入管道处理文档，使用智能切分
     
+    文档按批次（DOCUMENT_CONFIG["ingestion_batch_size"]）流经管道，
+    未提供文档时从输入目录惰性读取，每次只读取一个文件。
+    DOCUMENT_CONFIG["chunking_workers"] > 1 时使用进程池并行切分。
+    每个批次进入管道之前先做文档级近似重复检测；
+    DEDUP_CONFIG["chunk_level"] 为True时，切分后的节点再做一次近似重复检测。
+    每个批次的转换和切分结果都会写入检查点，中途退出后重新运行会从检查点继续，
+    全部完成后删除检查点。
+    
     Args:
-        documents: 要处理的文档，默认为None
+        documents: 要处理的文档（列表或生成器），默认为None
+        checkpoint_dir: 检查点目录，默认使用DOCUMENT_CONFIG["checkpoint_dir"]，传入空字符串禁用检查点
+        document_deduplicator: 文档级近似重复检测，默认按DEDUP_CONFIG创建；
+                               传入实例可以在运行后读取重复簇报告
     Returns:
         处理后的节点列表
     """
-    # 如果没有提供文档，从配置中获取
-    if documents is None:
-        # 从配置中获取文档目录路径
-        input_dir = DOCUMENT_CONFIG.get("input_dir", "data")
-        recursive = DOCUMENT_CONFIG.get("recursive", True)
-        supported_file_types = DOCUMENT_CONFIG.get("supported_file_types", [".md", ".txt"])
-        
-        print(f"使用配置从 {input_dir} 读取文档，递归={recursive}，支持的文件类型={supported_file_types}")
-        documents = default_reader
+    documents = _resolve_documents(documents)
+    if document_deduplicator is None:
+        document_deduplicator = create_deduplicator("document")
     
-    # 首先运行基础管道（不包含切分）
-    base_pipeline = create_pipeline()
-    processed_docs = base_pipeline.run(documents=documents)
+    if checkpoint_dir is None:
+        checkpoint_dir = DOCUMENT_CONFIG.get("checkpoint_dir")
+    checkpoint = IngestionCheckpoint(checkpoint_dir) if checkpoint_dir else None
     
-    print(f"基础处理完成，处理了 {len(processed_docs)} 个文档")
+    # 基础管道（不包含切分）
+    base_pipeline = create_pipeline()
+    executor = _create_chunking_executor()
+    chunk_deduplicator = create_deduplicator("chunk")
     
-    # 然后根据文档类型进行智能切分
     all_chunks = []
+    doc_count = 0
     
-    for doc in processed_docs:
-        try:
-            # 根据文档类型选择合适的解析器
-            parser = get_parser_for_document(doc)
+    try:
+        for batch in iter_batches(documents):
+            doc_count += len(batch)
+            batch = drop_duplicate_documents(batch, document_deduplicator)
             
-            # 执行切分
-            chunks = parser.get_nodes_from_documents([doc])
+            if checkpoint is not None:
+                chunks = _process_batch_with_checkpoint(batch, base_pipeline, checkpoint, executor)
+            else:
+                # 首先运行基础管道
+                processed_docs = run_pipeline_batch(base_pipeline, batch)
+                
+                # 然后根据文档类型进行智能切分
+                chunks = chunk_documents(processed_docs, executor=executor)
             
-            print(f"文档 {doc.metadata.get('file_name', 'Unknown')} 切分为 {len(chunks)} 个块")
+            # 最后去掉近似重复的节点，不再嵌入
+            all_chunks.extend(chunk_deduplicator(chunks) if chunk_deduplicator is not None else chunks)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    if checkpoint is not None:
+        checkpoint.clear()
+    all_chunks = drop_superseded_documents(all_chunks, document_deduplicator)
+    
+    print(f"基础处理完成，处理了 {doc_count} 个文档")
+    print(f"智能切分完成，总共生成 {len(all_chunks)} 个节点")
+    return all_chunks
+
+async def arun_ingestion_pipeline_with_smart_chunking(documents=None,
+                                                      checkpoint_dir: Optional[str] = None,
+                                                      document_deduplicator: Optional[NearDuplicateTransform] = None
+                                                      ) -> List[BaseNode]:
+    """
+    run_ingestion_pipeline_with_smart_chunking 的异步版本
+    
+    摘要等转换异步执行；文件读取、近似重复检测、缓存和检查点读写、切分放到线程中执行，
+    可以在服务进程的事件循环中作为后台任务运行而不阻塞请求处理。
+    
+    Args:
+        documents: 要处理的文档（列表或生成器），默认为None
+        checkpoint_dir: 检查点目录，默认使用DOCUMENT_CONFIG["checkpoint_dir"]，传入空字符串禁用检查点
+        document_deduplicator: 文档级近似重复检测，默认按DEDUP_CONFIG创建
+    Returns:
+        处理后的节点列表
+    """
+    documents = _resolve_documents(documents)
+    if document_deduplicator is None:
+        document_deduplicator = create_deduplicator("document")
+    
+    if checkpoint_dir is None:
+        checkpoint_dir = DOCUMENT_CONFIG.get("checkpoint_dir")
+    checkpoint = IngestionCheckpoint(checkpoint_dir) if checkpoint_dir else None
+    
+    base_pipeline = create_pipeline()
+    executor = _create_chunking_executor()
+    chunk_deduplicator = create_deduplicator("chunk")
+    
+    all_chunks = []
+    doc_count = 0
+    
+    try:
+        async for batch in _aiter_batches(documents):
+            doc_count += len(batch)
+            batch = await asyncio.to_thread(drop_duplicate_documents, batch, document_deduplicator)
             
-            all_chunks.extend(chunks)
+            if checkpoint is not None:
+                chunks = await _aprocess_batch_with_checkpoint(batch, base_pipeline, checkpoint, executor)
+            else:
+                processed_docs = await arun_pipeline_batch(base_pipeline, batch)
+                chunks = await asyncio.to_thread(chunk_documents, processed_docs, executor)
             
-        except Exception as e:
-            print(f"处理文档 {doc.metadata.get('file_name', 'Unknown')} 时出错: {e}")
-            # 如果切分失败，保留原文档
-            all_chunks.append(doc)
+            if chunk_deduplicator is not None:
+                chunks = await asyncio.to_thread(chunk_deduplicator, chunks)
+            all_chunks.extend(chunks)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    if checkpoint is not None:
+        await asyncio.to_thread(checkpoint.clear)
+    all_chunks = drop_superseded_documents(all_chunks, document_deduplicator)
     
+    print(f"基础处理完成，处理了 {doc_count} 个文档")
     print(f"智能切分完成，总共生成 {len(all_chunks)} 个节点")
     return all_chunks
 
@@ -101,24 +608,45 @@ def run_ingestion_pipeline(documents=None) -> List[BaseNode]:
     """
     运行数据摄入管道处理文档
     
+    文档按批次（DOCUMENT_CONFIG["ingestion_batch_size"]）流经管道，
+    未提供文档时从输入目录惰性读取，每次只读取一个文件。
+    
     Args:
-        documents: 要处理的文档，默认为None
+        documents: 要处理的文档（列表或生成器），默认为None
     Returns:
         处理后的节点列表
     """
-    # 如果没有提供文档，从配置中获取
-    if documents is None:
-        # 从配置中获取文档目录路径
-        input_dir = DOCUMENT_CONFIG.get("input_dir", "data")
-        recursive = DOCUMENT_CONFIG.get("recursive", True)
-        supported_file_types = DOCUMENT_CONFIG.get("supported_file_types", [".md", ".txt"])
-        
-        print(f"使用配置从 {input_dir} 读取文档，递归={recursive}，支持的文件类型={supported_file_types}")
-        documents = default_reader
+    documents = _resolve_documents(documents)
         
     # 处理文档
     pipeline = create_pipeline()
-    nodes = pipeline.run(documents=documents)
+    deduplicator = create_deduplicator("document")
+    nodes = []
+    for batch in iter_batches(documents):
+        nodes.extend(run_pipeline_batch(pipeline, drop_duplicate_documents(batch, deduplicator)))
+    nodes = drop_superseded_documents(nodes, deduplicator)
+    
+    print(f"已处理文档，生成 {len(nodes)} 个节点")
+    return nodes
+
+async def arun_ingestion_pipeline(documents=None) -> List[BaseNode]:
+    """
+    run_ingestion_pipeline 的异步版本，阻塞步骤（近似重复检测、缓存读写）在线程中执行
+    
+    Args:
+        documents: 要处理的文档（列表或生成器），默认为None
+    Returns:
+        处理后的节点列表
+    """
+    documents = _resolve_documents(documents)
+    
+    pipeline = create_pipeline()
+    deduplicator = create_deduplicator("document")
+    nodes = []
+    async for batch in _aiter_batches(documents):
+        batch = await asyncio.to_thread(drop_duplicate_documents, batch, deduplicator)
+        nodes.extend(await arun_pipeline_batch(pipeline, batch))
+    nodes = drop_superseded_documents(nodes, deduplicator)
     
     print(f"已处理文档，生成 {len(nodes)} 个节点")
     return nodes
@@ -0,0 +1,219 @@
+"""
+增量摄入清单
+
+记录每个源文件的大小、修改时间、内容哈希以及它产生的节点ID，
+用于判断哪些文件需要重新摄入、哪些节点需要从文档存储中删除。
+"""
+import hashlib
+import json
+import os
+from typing import Dict, Any, List, Optional, Iterable
+
+from src.utils import default_logger
+
+# 默认清单路径
+MANIFEST_PATH = "store/ingestion_manifest.json"
+
+# 计算哈希时每次读取的字节数
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def compute_file_hash(file_path: str) -> str:
+    """流式计算文件内容的sha256哈希"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class ManifestDiff:
+    """清单与当前文件列表的差异"""
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.deleted: List[str] = []
+        self.unchanged: List[str] = []
+
+    @property
+    def to_ingest(self) -> List[str]:
+        """需要重新摄入的文件（新增 + 修改）"""
+        return self.added + self.changed
+
+    @property
+    def to_remove(self) -> List[str]:
+        """需要删除旧节点的文件（修改 + 删除）"""
+        return self.changed + self.deleted
+
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+    def __repr__(self) -> str:
+        return (f"ManifestDiff(added={len(self.added)}, changed={len(self.changed)}, "
+                f"deleted={len(self.deleted)}, unchanged={len(self.unchanged)})")
+
+
+class IngestionManifest:
+    """
+    增量摄入清单
+
+    每个文件的记录格式:
+        {
+            "size": 文件大小,
+            "mtime": 修改时间,
+            "hash": 内容sha256,
+            "doc_ids": 读取得到的原始文档ID列表,
+            "node_ids": 生成的节点ID列表,
+            "duplicate_of": 作为近似重复被丢弃时，代表文档所在的文件列表（可选）,
+            "minhash": {"params": 签名参数, "signatures": {文档ID: 编码后的MinHash签名}}（可选）,
+        }
+
+    代表文件被修改或删除时，作为它的重复被丢弃的文件也需要重新摄入。
+    保留下来的文档的MinHash签名随清单保存，增量摄入时新文件会与未变化文件中的文档比较。
+    """
+
+    def __init__(self, path: str = MANIFEST_PATH, files: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = files or {}
+        # diff过程中计算出的文件指纹，record时复用，避免重复读取文件
+        self._fingerprints: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: str = MANIFEST_PATH) -> "IngestionManifest":
+        """从磁盘加载清单，不存在或损坏时返回空清单"""
+        if not os.path.exists(path):
+            return cls(path=path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(path=path, files=data.get("files", {}))
+        except Exception as e:
+            default_logger.warning(f"加载摄入清单 {path} 失败，将视为空清单: {e}")
+            return cls(path=path)
+
+    def save(self) -> None:
+        """持久化清单（先写临时文件再替换，避免中途失败导致清单损坏）"""
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_empty(self) -> bool:
+        return not self.files
+
+    def _fingerprint(self, file_path: str) -> Dict[str, Any]:
+        """计算文件指纹（先stat再读内容，读取期间文件被修改时下次运行会重新检查）"""
+        if file_path not in self._fingerprints:
+            stat = os.stat(file_path)
+            self._fingerprints[file_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "hash": compute_file_hash(file_path),
+            }
+        return self._fingerprints[file_path]
+
+    def diff(self, file_paths: Iterable[str]) -> ManifestDiff:
+        """
+        对比当前文件列表与清单
+
+        大小和修改时间都未变化的文件直接视为未修改，只有元信息变化时才计算内容哈希。
+        """
+        result = ManifestDiff()
+        current = set()
+
+        for file_path in file_paths:
+            current.add(file_path)
+            record = self.files.get(file_path)
+            if record is None:
+                result.added.append(file_path)
+                continue
+
+            stat = os.stat(file_path)
+            if stat.st_size == record.get("size") and stat.st_mtime == record.get("mtime"):
+                result.unchanged.append(file_path)
+                continue
+
+            fingerprint = self._fingerprint(file_path)
+            if fingerprint["hash"] == record.get("hash"):
+                # 内容未变（例如只是touch），只需刷新元信息
+                record["size"] = fingerprint["size"]
+                record["mtime"] = fingerprint["mtime"]
+                result.unchanged.append(file_path)
+            else:
+                result.changed.append(file_path)
+
+        result.deleted = [file_path for file_path in self.files if file_path not in current]
+
+        # 代表文件变化后，之前作为重复被丢弃的文件重新摄入
+        to_remove = set(result.to_remove)
+        if to_remove:
+            for file_path in list(result.unchanged):
+                if to_remove.intersection(self.files[file_path].get("duplicate_of", ())):
+                    result.unchanged.remove(file_path)
+                    result.changed.append(file_path)
+        return result
+
+    def get_node_ids(self, file_path: str) -> List[str]:
+        return list(self.files.get(file_path, {}).get("node_ids", []))
+
+    def get_doc_ids(self, file_path: str) -> List[str]:
+        return list(self.files.get(file_path, {}).get("doc_ids", []))
+
+    def get_duplicate_of(self, file_path: str) -> List[str]:
+        return list(self.files.get(file_path, {}).get("duplicate_of", []))
+
+    def get_signatures(self, file_path: str, params: str) -> Dict[str, str]:
+        """文件中保留下来的文档的MinHash签名，签名参数不一致时返回空字典"""
+        minhash = self.files.get(file_path, {}).get("minhash")
+        if not minhash or minhash.get("params") != params:
+            return {}
+        return dict(minhash.get("signatures", {}))
+
+    def record(self, file_path: str, doc_ids: List[str], node_ids: List[str],
+               duplicate_of: Optional[Iterable[str]] = None,
+               signatures: Optional[Dict[str, str]] = None,
+               signature_params: Optional[str] = None) -> None:
+        """
+        记录文件摄入结果
+
+        Args:
+            duplicate_of: 文件的文档作为近似重复被丢弃时，代表文档所在的文件
+            signatures: 保留下来的文档的MinHash签名（文档ID → 编码后的签名）
+            signature_params: 签名参数
+        """
+        record = {
+            **self._fingerprint(file_path),
+            "doc_ids": list(doc_ids),
+            "node_ids": list(node_ids),
+        }
+        if duplicate_of:
+            record["duplicate_of"] = sorted(set(duplicate_of))
+        if signatures:
+            record["minhash"] = {"params": signature_params, "signatures": dict(signatures)}
+        self.files[file_path] = record
+
+    def supersede(self, file_path: str, doc_ids: Iterable[str], node_ids: Iterable[str],
+                  duplicate_of: Iterable[str]) -> None:
+        """
+        未变化文件中的文档被较新的版本取代：移除这些文档的节点和签名，记录取代它们的文件
+
+        取代它的文件被修改或删除后，该文件会重新摄入。
+        """
+        record = self.files.get(file_path)
+        if record is None:
+            return
+        doc_ids, node_ids = set(doc_ids), set(node_ids)
+        record["node_ids"] = [node_id for node_id in record.get("node_ids", []) if node_id not in node_ids]
+        record["duplicate_of"] = sorted(set(record.get("duplicate_of", [])) | set(duplicate_of))
+        minhash = record.get("minhash")
+        if minhash:
+            minhash["signatures"] = {doc_id: value for doc_id, value in minhash.get("signatures", {}).items()
+                                     if doc_id not in doc_ids}
+
+    def remove(self, file_path: str) -> None:
+        self.files.pop(file_path, None)
+        self._fingerprints.pop(file_path, None)
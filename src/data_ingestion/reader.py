@@ -1,11 +1,20 @@
 from llama_index.readers.file import FlatReader, DocxReader
 from llama_index.core.readers import SimpleDirectoryReader
-from typing import Dict, Any, List, Optional
+from llama_index.core.readers.file.base import default_file_metadata_func
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
 from llama_index.core.schema import Document
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import multiprocessing
+import os
+import uuid
 
 # 导入配置
 from config.config_rag import DOCUMENT_CONFIG
+from src.node_parser.word_parser import iter_docx_markdown
+from src.utils import default_logger
 
 # 自定义FlatReader实现，修复file参数问题
 class CustomFlatReader(FlatReader):
@@ -13,20 +22,218 @@ class CustomFlatReader(FlatReader):
         # 确保传递Path对象而不是字符串
         return super().load_data(file=Path(path), extra_info=extra_info)
 
-# 自定义DocxReader实现
+# 自定义DocxReader实现：增量解析 word/document.xml（不构建DOM，解析内存只与最大的单个块有关），
+# 标题和表格输出为Markdown（见 iter_docx_markdown）；后续清洗和摘要需要全文，Document中仍是完整文本
 class CustomDocxReader(DocxReader):
     def load_data(self, path, extra_info=None):
-        # 确保传递Path对象而不是字符串
-        return super().load_data(file=Path(path), extra_info=extra_info)
+        path = Path(path)
+        metadata = {"file_name": path.name}
+        if extra_info is not None:
+            metadata.update(extra_info)
+        return [Document(text="\n\n".join(iter_docx_markdown(path)), metadata=metadata)]
+
+
+class StableFileMetadata:
+    """
+    默认文件元数据，去掉每次读取都会变化的访问时间
+
+    元数据参与摄入缓存键的计算，必须在文件未修改时保持不变（类实例可被pickle，支持多进程读取）
+    """
+
+    def __call__(self, file_path: str) -> Dict[str, Any]:
+        metadata = default_file_metadata_func(file_path)
+        metadata.pop("last_accessed_date", None)
+        return metadata
+
+
+def assign_stable_ids(docs: List[Document]) -> List[Document]:
+    """
+    按文件路径和文本内容为文档生成确定性ID
+
+    同一文件内容不变时ID不变，使摄入缓存命中时返回的节点与新读取的文档ID一致；
+    内容变化时ID随之变化，不会误用旧的向量索引缓存。
+    """
+    for i, doc in enumerate(docs):
+        text_hash = hashlib.sha256(doc.text.encode("utf-8")).hexdigest()
+        doc.id_ = str(uuid.uuid5(uuid.NAMESPACE_URL, f"{doc.metadata.get('file_path', '')}#{i}#{text_hash}"))
+    return docs
+
+
+def get_file_extractor() -> Dict[str, Any]:
+    """返回扩展名到读取器实例的映射"""
+    return {
+        ".md": CustomFlatReader(),
+        ".mdx": CustomFlatReader(),
+        ".docx": CustomDocxReader(),
+    }
+
+
+def create_directory_reader(input_dir: Optional[str] = None,
+                            recursive: Optional[bool] = None,
+                            input_files: Optional[List[str]] = None) -> SimpleDirectoryReader:
+    """
+    创建目录读取器（只扫描文件列表，不读取文件内容）
+
+    Args:
+        input_dir: 文档目录，默认使用DOCUMENT_CONFIG["input_dir"]
+        recursive: 是否递归读取子目录，默认使用DOCUMENT_CONFIG["recursive"]
+        input_files: 指定要读取的文件列表，提供时忽略input_dir
+    Returns:
+        SimpleDirectoryReader实例
+    """
+    if input_files:
+        return SimpleDirectoryReader(input_files=input_files,
+                                     file_metadata=StableFileMetadata(),
+                                     file_extractor=get_file_extractor())
+    if input_dir is None:
+        input_dir = DOCUMENT_CONFIG.get("input_dir", "data")
+    if recursive is None:
+        recursive = DOCUMENT_CONFIG.get("recursive", True)
+    return SimpleDirectoryReader(input_dir=input_dir,
+                                 recursive=recursive,
+                                 exclude=[".pdf"],
+                                 file_metadata=StableFileMetadata(),
+                                 file_extractor=get_file_extractor())
+
+
+def list_input_files(input_dir: Optional[str] = None,
+                     recursive: Optional[bool] = None) -> List[str]:
+    """
+    列出输入目录中会被读取的文件路径（与文档metadata中的file_path一致）
+
+    目录不存在或为空时返回空列表
+    """
+    try:
+        reader = create_directory_reader(input_dir=input_dir, recursive=recursive)
+    except ValueError as e:
+        default_logger.warning(f"无法列出输入文件: {e}")
+        return []
+    return [str(path) for path in reader.input_files]
+
+
+def _load_file_isolated(input_file: Path,
+                        file_metadata: Any,
+                        file_extractor: Dict[str, Any]) -> Tuple[List[Document], Optional[str]]:
+    """
+    读取单个文件（在子进程中执行），异常被捕获并作为结果返回，不影响其他文件
+
+    Returns:
+        (文档列表, 错误信息)，成功时错误信息为None
+    """
+    try:
+        docs = SimpleDirectoryReader.load_file(input_file=input_file,
+                                               file_metadata=file_metadata,
+                                               file_extractor=file_extractor,
+                                               raise_on_error=True)
+        return docs, None
+    except Exception as e:
+        cause = e.__cause__ or e
+        return [], f"{type(cause).__name__}: {cause}"
+
+
+def _iter_documents_parallel(reader: SimpleDirectoryReader, num_workers: int) -> Iterator[Document]:
+    """
+    使用进程池并行读取文件，按文件顺序产出文档
+
+    同时在途的文件数限制为 num_workers * 4，避免读取速度远快于消费速度时占满内存。
+    """
+    files = iter(reader.input_files)
+    window = num_workers * 4
+    failed_files = []
+
+    with ProcessPoolExecutor(max_workers=num_workers,
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+
+        def submit_next():
+            input_file = next(files, None)
+            if input_file is not None:
+                pending.append((input_file, executor.submit(
+                    _load_file_isolated, input_file, reader.file_metadata, reader.file_extractor)))
+
+        for _ in range(window):
+            submit_next()
+
+        try:
+            while pending:
+                input_file, future = pending.popleft()
+                docs, error = future.result()
+                submit_next()
+
+                if error is not None:
+                    failed_files.append(str(input_file))
+                    default_logger.warning(f"读取文件 {input_file} 失败，已跳过: {error}")
+                    continue
+
+                yield from assign_stable_ids(reader._exclude_metadata(docs))
+        finally:
+            # 消费方提前退出时取消尚未开始的任务
+            for _, future in pending:
+                future.cancel()
+
+    if failed_files:
+        default_logger.warning(f"并行读取完成，{len(failed_files)} 个文件读取失败")
+
+
+def iter_documents(input_dir: Optional[str] = None,
+                   recursive: Optional[bool] = None,
+                   num_workers: Optional[int] = None,
+                   input_files: Optional[List[str]] = None) -> Iterator[Document]:
+    """
+    惰性读取文档：每次只读取一个文件，逐个产出Document
+
+    num_workers > 1 时使用进程池并行解析文件（docx解压与XML解析是CPU密集型操作），
+    输出顺序与串行读取一致，单个文件失败只会跳过该文件。
+
+    Args:
+        input_dir: 文档目录，默认使用DOCUMENT_CONFIG["input_dir"]
+        recursive: 是否递归读取子目录，默认使用DOCUMENT_CONFIG["recursive"]
+        num_workers: 读取进程数，默认使用DOCUMENT_CONFIG["num_workers"]
+        input_files: 指定要读取的文件列表，提供时忽略input_dir
+    Yields:
+        Document: 读取到的文档
+    """
+    reader = create_directory_reader(input_dir=input_dir, recursive=recursive, input_files=input_files)
+
+    if num_workers is None:
+        num_workers = DOCUMENT_CONFIG.get("num_workers", 1)
+    num_workers = min(int(num_workers or 1), os.cpu_count() or 1, len(reader.input_files))
+
+    if num_workers > 1:
+        default_logger.info(f"使用 {num_workers} 个进程并行读取 {len(reader.input_files)} 个文件")
+        yield from _iter_documents_parallel(reader, num_workers)
+        return
+
+    for file_docs in reader.iter_data():
+        yield from assign_stable_ids(file_docs)
+
+
+def iter_batches(documents: Iterable[Document], batch_size: Optional[int] = None) -> Iterator[List[Document]]:
+    """
+    将文档流切分为固定大小的批次，内存占用只与批次大小有关
+
+    Args:
+        documents: 文档的可迭代对象（列表或生成器）
+        batch_size: 批次大小，默认使用DOCUMENT_CONFIG["ingestion_batch_size"]
+    Yields:
+        List[Document]: 一个批次的文档
+    """
+    if batch_size is None:
+        batch_size = DOCUMENT_CONFIG.get("ingestion_batch_size", 64)
+    batch_size = max(1, int(batch_size))
 
-# 默认reader实例
-default_reader = SimpleDirectoryReader(input_dir=DOCUMENT_CONFIG["input_dir"], 
-                                       recursive=True, 
-                                       exclude=[".pdf"],
-                                       file_extractor={
-                                              ".md": CustomFlatReader(),
-                                              ".mdx": CustomFlatReader(),
-                                              ".docx": CustomDocxReader(), 
-                                        }).load_data()
+    batch = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
+def __getattr__(name):
+    # 兼容旧代码：default_reader 改为首次访问时才读取全部文档
+    if name == "default_reader":
+        return create_directory_reader().load_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
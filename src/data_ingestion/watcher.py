@@ -0,0 +1,115 @@
+"""
+输入目录监听
+
+以轮询方式比较输入目录的文件快照（路径 → 大小、修改时间），检测新增、修改和删除的文件。
+检测到变化后不会立即触发，而是等到目录在 debounce_seconds 内不再变化，
+把一次批量复制产生的多次修改合并为一次回调。
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from config.config_rag import WATCH_CONFIG
+from src.data_ingestion.reader import list_input_files
+from src.utils import default_logger
+
+Snapshot = Dict[str, Tuple[int, int]]
+
+
+class DirectoryWatcher:
+    """
+    轮询式目录监听器
+
+    Args:
+        on_change: 目录稳定后调用的回调，参数为新快照
+        input_dir: 监听目录，默认使用配置中的输入目录
+        poll_interval: 轮询间隔（秒）
+        debounce_seconds: 去抖时长（秒）
+    """
+
+    def __init__(self,
+                 on_change: Callable[[Snapshot], None],
+                 input_dir: Optional[str] = None,
+                 poll_interval: Optional[float] = None,
+                 debounce_seconds: Optional[float] = None):
+        self.on_change = on_change
+        self.input_dir = input_dir
+        self.poll_interval = poll_interval if poll_interval is not None else WATCH_CONFIG["poll_interval"]
+        self.debounce_seconds = (debounce_seconds if debounce_seconds is not None
+                                 else WATCH_CONFIG["debounce_seconds"])
+        self._snapshot: Optional[Snapshot] = None
+        self._pending_since: Optional[float] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def snapshot(self) -> Snapshot:
+        """获取输入目录当前的文件快照"""
+        snapshot = {}
+        for file_path in list_input_files(input_dir=self.input_dir):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                # 列出之后被删除的文件按删除处理
+                continue
+            snapshot[file_path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(self, now: Optional[float] = None) -> bool:
+        """
+        执行一次轮询
+
+        Returns:
+            bool: 本次轮询是否触发了回调
+        """
+        now = time.monotonic() if now is None else now
+        current = self.snapshot()
+
+        if self._snapshot is None:
+            # 第一次轮询只建立基线
+            self._snapshot = current
+            return False
+
+        if current != self._snapshot:
+            # 每次检测到变化都重新计时
+            changed = len(set(current.items()) ^ set(self._snapshot.items()))
+            default_logger.info(f"检测到输入目录变化（{changed} 项），等待目录稳定")
+            self._snapshot = current
+            self._pending_since = now
+            return False
+
+        if self._pending_since is None or now - self._pending_since < self.debounce_seconds:
+            return False
+
+        self._pending_since = None
+        try:
+            self.on_change(current)
+        except Exception as e:
+            # 回调失败不终止监听，下一次变化时会再次同步
+            default_logger.error(f"处理输入目录变化失败: {e}", exc_info=True)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                default_logger.error(f"轮询输入目录失败: {e}", exc_info=True)
+            self._stop_event.wait(self.poll_interval)
+
+    def start(self) -> None:
+        """在后台线程中开始监听"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="directory-watcher", daemon=True)
+        self._thread.start()
+        default_logger.info(f"开始监听输入目录，轮询间隔 {self.poll_interval} 秒，"
+                            f"去抖 {self.debounce_seconds} 秒")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止监听"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
@@ -7,19 +7,25 @@ from llama_index.core.indices import VectorStoreIndex
 from llama_index.core.indices.loading import load_index_from_storage
 from llama_index.core.agent import ReActAgent
 from src.models import LLMFactory, EmbeddingFactory, LLMProviderType, EmbeddingProviderType
-from src.data_ingestion.ingestion_pipeline import run_ingestion_pipeline, run_ingestion_pipeline_with_smart_chunking
+from src.data_ingestion.ingestion_pipeline import (run_ingestion_pipeline, run_ingestion_pipeline_with_smart_chunking,
+                                                   create_deduplicator)
+from src.data_ingestion.reader import iter_documents, list_input_files
+from src.data_ingestion.manifest import IngestionManifest, MANIFEST_PATH
+from src.transformations.near_duplicate_transform import encode_signature, decode_signature
 from typing import List, Dict, Optional, Any
 from llama_index.core.objects.tool_node_mapping import SimpleToolNodeMapping
 from llama_index.core.callbacks import CallbackManager
 from llama_index.core.node_parser import NodeParser
 from src.node_parser.node_parser_tool import get_parser_for_document
 import os
+import shutil
 import logging
 import time
 import requests
 from llama_index.core.schema import BaseNode
 from llama_index.core.storage.docstore import SimpleDocumentStore, DocumentStore
 from src.query_engine.enhanced_query_engine import create_enhanced_query_engine
+from src.indices.section_index import SectionIndex, SECTION_INDEX_FILE
 from config.config_rag import RETRIEVAL_CONFIG
 
 # 配置基本日志
@@ -117,6 +123,9 @@ def save_nodes_to_disk(nodes: List[BaseNode], store_name: str = "processed_nodes
         storage_context = StorageContext.from_defaults(docstore=doc_store)
         storage_context.persist(persist_dir=store_dir)
         
+        # 章节锚点索引与文档存储保存在同一目录
+        SectionIndex.from_nodes(nodes).save(os.path.join(store_dir, SECTION_INDEX_FILE))
+        
         # 存储到单例管理器
         context_manager = StorageContextManager.get_instance()
         context_manager.set_context(store_name, storage_context)
@@ -165,13 +174,208 @@ def load_nodes_from_disk(store_name: str = "processed_nodes") -> Optional[List[B
         logger.error(f"从文档存储加载节点时出错: {e}")
         return None
 
-def build_query_engine(docs: list[TextNode]) -> Dict:
+def load_section_index(store_name: str = "processed_nodes") -> Optional[SectionIndex]:
+    """加载与文档存储一起保存的章节锚点索引
+    
+    Args:
+        store_name: 存储目录名称
+        
+    Returns:
+        Optional[SectionIndex]: 章节锚点索引，不存在时返回None
+    """
+    return SectionIndex.load(os.path.join(DOC_STORE_DIR, store_name, SECTION_INDEX_FILE))
+
+def remove_vector_indices(doc_ids) -> int:
+    """删除指定原始文档的向量索引缓存目录
+    
+    Args:
+        doc_ids: 原始文档ID列表
+        
+    Returns:
+        int: 实际删除的目录数
+    """
+    removed = 0
+    for doc_id in doc_ids:
+        cache_path = os.path.join(VECTOR_CACHE_DIR, doc_id)
+        if os.path.isdir(cache_path):
+            shutil.rmtree(cache_path, ignore_errors=True)
+            removed += 1
+    return removed
+
+class IncrementalIngestionResult:
+    """增量摄入结果"""
+    
+    def __init__(self, nodes: Optional[List[BaseNode]],
+                 added_doc_ids: Optional[set] = None,
+                 removed_doc_ids: Optional[set] = None):
+        # 同步后文档存储中的全部节点
+        self.nodes = nodes
+        # 新摄入的原始文档ID
+        self.added_doc_ids = added_doc_ids or set()
+        # 被删除（或因修改被替换）的原始文档ID
+        self.removed_doc_ids = removed_doc_ids or set()
+    
+    def has_changes(self) -> bool:
+        return bool(self.added_doc_ids or self.removed_doc_ids)
+
+def sync_incremental_ingestion(store_name: str = "processed_nodes",
+                               manifest_path: str = MANIFEST_PATH) -> IncrementalIngestionResult:
+    """增量摄入文档，并返回新增和删除的原始文档ID
+    
+    根据摄入清单（文件路径 → 大小、修改时间、内容哈希、节点ID）对比输入目录：
+    只有新增和修改的文件会经过转换、切分；修改和删除文件的旧节点会从文档存储中移除，
+    对应的 store/vector_indices/<doc_id> 目录也会被删除。
+    作为近似重复被丢弃的文件记录代表文件，代表文件修改或删除后重新摄入。
+    保留下来的文档的MinHash签名保存在清单中：新文件先与未变化文件中的文档比较，
+    新文件是已摄入文档的较新版本时，旧版本的节点和向量索引被删除（一组重复只保留修改时间最新的一份）。
+    
+    Args:
+        store_name: 文档存储目录名称
+        manifest_path: 摄入清单路径
+        
+    Returns:
+        IncrementalIngestionResult: 同步后的全部节点以及变化的原始文档ID
+    """
+    manifest = IngestionManifest.load(manifest_path)
+    existing_nodes = load_nodes_from_disk(store_name)
+    file_paths = list_input_files()
+    
+    if not file_paths:
+        logger.warning("输入目录中没有可读取的文件，使用已持久化的节点")
+        return IncrementalIngestionResult(existing_nodes)
+    
+    # 收集需要删除的旧节点和旧文档
+    removed_node_ids = set()
+    removed_doc_ids = set()
+    
+    if existing_nodes is None and not manifest.is_empty():
+        logger.info("文档存储不存在，摄入清单已失效，执行全量摄入")
+        for file_path in manifest.files:
+            removed_doc_ids.update(manifest.get_doc_ids(file_path))
+        manifest = IngestionManifest(path=manifest_path)
+    elif existing_nodes is not None and manifest.is_empty():
+        logger.info("存在持久化节点但没有摄入清单，执行一次全量摄入以建立清单")
+        removed_doc_ids.update(node.ref_doc_id or node.id_ for node in existing_nodes)
+        existing_nodes = None
+    
+    diff = manifest.diff(file_paths)
+    logger.info(f"增量摄入对比结果: {diff}")
+    
+    if not diff.has_changes() and existing_nodes is not None:
+        manifest.save()
+        return IncrementalIngestionResult(existing_nodes)
+    
+    for file_path in diff.to_remove:
+        removed_node_ids.update(manifest.get_node_ids(file_path))
+        removed_doc_ids.update(manifest.get_doc_ids(file_path))
+        manifest.remove(file_path)
+    
+    # 只摄入新增和修改的文件
+    new_nodes = []
+    added_doc_ids = set()
+    if diff.to_ingest:
+        doc_sources = {}
+        # 较新的文件先读取，同一批次之外的重复也大多直接保留最新版本，不需要事后取代
+        to_ingest = sorted(diff.to_ingest, key=lambda path: (-os.path.getmtime(path), path))
+        
+        def tracked_documents():
+            for doc in iter_documents(input_files=to_ingest):
+                # 在转换修改file_path之前记录文档来源
+                doc_sources[doc.id_] = doc.metadata.get("file_path")
+                yield doc
+        
+        deduplicator = create_deduplicator("document")
+        # 未变化文件中已摄入文档的签名，新文件与它们比较
+        seeded_sources = {}
+        if deduplicator is not None:
+            for file_path in diff.unchanged:
+                mtime = manifest.files[file_path].get("mtime", 0.0)
+                for doc_id, value in manifest.get_signatures(file_path, deduplicator.signature_params).items():
+                    deduplicator.seed(doc_id, decode_signature(value), mtime, file_path)
+                    seeded_sources[doc_id] = file_path
+        
+        new_nodes = run_ingestion_pipeline_with_smart_chunking(documents=tracked_documents(),
+                                                               document_deduplicator=deduplicator)
+        
+        # 作为近似重复被丢弃的文件记录代表文件，代表文件变化时重新摄入（检测在转换之前，source为原始路径）
+        duplicate_of = {}
+        for cluster in (deduplicator.report.clusters.values() if deduplicator is not None else ()):
+            for duplicate in cluster["duplicates"]:
+                if duplicate["source"] != cluster["source"]:
+                    duplicate_of.setdefault(duplicate["source"], set()).add(cluster["source"])
+        
+        # 未变化文件中被较新版本取代的文档：删除旧节点和向量索引
+        if deduplicator is not None and deduplicator.action == "drop":
+            superseded_by_file = {}
+            for doc_id in deduplicator.superseded:
+                if doc_id in seeded_sources:
+                    superseded_by_file.setdefault(seeded_sources[doc_id], set()).add(doc_id)
+            for file_path, doc_ids in superseded_by_file.items():
+                node_ids = {node.id_ for node in (existing_nodes or []) if node.ref_doc_id in doc_ids}
+                logger.info(f"{file_path} 中的 {len(doc_ids)} 个文档已被较新版本取代，删除 {len(node_ids)} 个节点")
+                removed_node_ids.update(node_ids)
+                removed_doc_ids.update(doc_ids)
+                manifest.supersede(file_path, doc_ids, node_ids, duplicate_of.get(file_path, ()))
+        
+        ids_by_file = {}
+        for doc_id, file_path in doc_sources.items():
+            ids_by_file.setdefault(file_path, {"doc_ids": [], "node_ids": []})["doc_ids"].append(doc_id)
+        for node in new_nodes:
+            file_path = doc_sources.get(node.ref_doc_id or node.id_)
+            if file_path in ids_by_file:
+                ids_by_file[file_path]["node_ids"].append(node.id_)
+        
+        # 读取失败的文件不记录，下次运行时会重试
+        for file_path, ids in ids_by_file.items():
+            signatures = {}
+            if deduplicator is not None:
+                for doc_id in ids["doc_ids"]:
+                    signature = deduplicator.get_signature(doc_id)
+                    if signature is not None:
+                        signatures[doc_id] = encode_signature(signature)
+            manifest.record(file_path, doc_ids=ids["doc_ids"], node_ids=ids["node_ids"],
+                            duplicate_of=duplicate_of.get(file_path),
+                            signatures=signatures,
+                            signature_params=deduplicator.signature_params if deduplicator is not None else None)
+            added_doc_ids.update(ids["doc_ids"])
+    
+    nodes = [node for node in (existing_nodes or []) if node.id_ not in removed_node_ids]
+    nodes.extend(new_nodes)
+    
+    if not save_nodes_to_disk(nodes, store_name):
+        raise RuntimeError("增量摄入结果保存失败")
+    removed_indices = remove_vector_indices(removed_doc_ids)
+    manifest.save()
+    
+    logger.info(f"增量摄入完成: 新增 {len(new_nodes)} 个节点，删除 {len(removed_node_ids)} 个节点，"
+                f"清理 {removed_indices} 个向量索引")
+    return IncrementalIngestionResult(load_nodes_from_disk(store_name),
+                                      added_doc_ids=added_doc_ids,
+                                      removed_doc_ids=removed_doc_ids)
+
+def run_incremental_ingestion(store_name: str = "processed_nodes",
+                              manifest_path: str = MANIFEST_PATH) -> Optional[List[BaseNode]]:
+    """增量摄入文档
+    
+    详见 sync_incremental_ingestion。
+    
+    Args:
+        store_name: 文档存储目录名称
+        manifest_path: 摄入清单路径
+        
+    Returns:
+        Optional[List[BaseNode]]: 同步后文档存储中的全部节点
+    """
+    return sync_incremental_ingestion(store_name, manifest_path).nodes
+
+def build_query_engine(docs: list[TextNode], store_name: str = "processed_nodes") -> Dict:
     """
     构建文档查询引擎，带有缓存机制。
     将属于同一原始文档的节点组合在一起，创建统一的查询引擎。
     
     Args:
         docs: 文档节点列表（已切分的节点）
+        store_name: 文档存储目录名称，从中加载已保存的章节锚点索引
     
     Returns:
         Dict: 包含两个字典: 
@@ -179,6 +383,12 @@ def build_query_engine(docs: list[TextNode]) -> Dict:
             - 'by_category': 以类别为键、原始文档ID列表为值的字典
     """
     ensure_storage_dir_exists()
+    
+    # 章节锚点索引，用于查询时的章节扩展；优先使用与文档存储一起保存的索引，只补充其中缺少的节点
+    section_index = load_section_index(store_name) or SectionIndex()
+    missing = [doc for doc in docs if section_index.locate(doc.node_id) is None]
+    for doc in missing:
+        section_index.add_node(doc)
 
     # 按原始文档ID分组节点
     docs_by_original_id = {}
@@ -254,6 +464,7 @@ def build_query_engine(docs: list[TextNode]) -> Dict:
             
             vector_query_engine = create_enhanced_query_engine(
                 vector_index, 
+                section_index=section_index,
                 callback_manager=callback_manager
             )
             logger.info(f"为文档 {original_doc_id} 创建了增强查询引擎")
@@ -288,21 +499,10 @@ def build_tool_agents() -> Dict:
     logger.info("开始加载文档...")
 
     try:
-        # 首先尝试从磁盘加载持久化的节点
-        loaded_nodes = load_nodes_from_disk()
-        
-        # 如果找到了持久化的节点，直接使用
-        if loaded_nodes is not None:
-            logger.info("已加载持久化的节点数据")
-            docs = loaded_nodes
-        else:
-            # 如果没有持久化节点，使用智能切分管道处理文档
-            logger.info("使用智能切分管道处理文档...")
-            docs = run_ingestion_pipeline_with_smart_chunking()
-            # 将处理后的节点持久化保存
-            save_nodes_to_disk(docs)
-            # 重新加载
-            docs = load_nodes_from_disk()
+        # 增量同步：只处理新增、修改、删除的文件
+        docs = run_incremental_ingestion()
+        if docs is None:
+            raise ValueError("没有可用的文档节点")
             
         logger.info(f"文档加载成功，共 {len(docs)} 个节点")
         return build_document_agents(docs=docs)
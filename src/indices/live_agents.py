@@ -0,0 +1,146 @@
+"""
+监听模式下的类别代理
+
+输入目录变化时增量同步文档存储，只为新增文档构建向量索引，只重建受影响类别的代理。
+更新过程中始终在新字典上构建，完成后一次性替换引用，查询线程读到的要么是旧快照、
+要么是新快照，不会中断服务。
+"""
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from llama_index.core.agent import ReActAgent
+
+from src.data_ingestion.manifest import MANIFEST_PATH
+from src.data_ingestion.watcher import DirectoryWatcher
+from src.indices.index import (
+    IncrementalIngestionResult,
+    _build_agent_for_category,
+    build_query_engine,
+    sync_incremental_ingestion,
+)
+
+logger = logging.getLogger('llama_kb.indices.live')
+
+
+def _original_doc_id(node) -> str:
+    return node.ref_doc_id or node.id_
+
+
+class LiveCategoryAgents:
+    """
+    可在线更新的类别代理集合
+
+    Args:
+        store_name: 文档存储目录名称
+        manifest_path: 摄入清单路径
+    """
+
+    def __init__(self, store_name: str = "processed_nodes", manifest_path: str = MANIFEST_PATH):
+        self.store_name = store_name
+        self.manifest_path = manifest_path
+        self._engines: Dict[str, object] = {}
+        self._categories: Dict[str, List[str]] = {}
+        self._agents: Dict[str, ReActAgent] = {}
+        # 同一时间只允许一个同步任务，查询不需要加锁
+        self._update_lock = threading.Lock()
+        self._watcher: Optional[DirectoryWatcher] = None
+
+    @property
+    def agents(self) -> Dict[str, ReActAgent]:
+        """当前的类别代理快照"""
+        return self._agents
+
+    def get_agent(self, category: str) -> Optional[ReActAgent]:
+        return self._agents.get(category)
+
+    def load(self) -> Dict[str, ReActAgent]:
+        """同步输入目录并构建全部类别代理"""
+        with self._update_lock:
+            result = sync_incremental_ingestion(self.store_name, self.manifest_path)
+            if result.nodes is None:
+                raise ValueError("没有可用的文档节点")
+            doc_engine = build_query_engine(docs=result.nodes, store_name=self.store_name)
+            self._swap(doc_engine["by_id"], doc_engine["by_category"], set(doc_engine["by_category"]))
+        return self._agents
+
+    def refresh(self) -> bool:
+        """
+        增量同步输入目录并更新受影响的代理
+
+        Returns:
+            bool: 是否有文档发生变化
+        """
+        with self._update_lock:
+            result = sync_incremental_ingestion(self.store_name, self.manifest_path)
+            if not result.has_changes():
+                logger.info("输入目录没有变化，代理保持不变")
+                return False
+            self._apply(result)
+        return True
+
+    def _apply(self, result: IncrementalIngestionResult) -> None:
+        """把一次增量同步的结果应用到查询引擎和代理上"""
+        added_nodes = [node for node in (result.nodes or [])
+                       if _original_doc_id(node) in result.added_doc_ids]
+        doc_engine = (build_query_engine(docs=added_nodes, store_name=self.store_name) if added_nodes
+                      else {"by_id": {}, "by_category": {}})
+
+        # 在副本上修改，旧快照继续服务查询
+        engines = {doc_id: engine for doc_id, engine in self._engines.items()
+                   if doc_id not in result.removed_doc_ids}
+        engines.update(doc_engine["by_id"])
+
+        affected = set(doc_engine["by_category"])
+        categories = {}
+        for category, doc_ids in self._categories.items():
+            kept = [doc_id for doc_id in doc_ids if doc_id not in result.removed_doc_ids]
+            if len(kept) != len(doc_ids):
+                affected.add(category)
+            if kept:
+                categories[category] = kept
+        for category, doc_ids in doc_engine["by_category"].items():
+            categories.setdefault(category, []).extend(doc_ids)
+
+        logger.info(f"增量更新: 新增 {len(doc_engine['by_id'])} 个文档，"
+                    f"删除 {len(result.removed_doc_ids)} 个文档，"
+                    f"重建 {len(affected)} 个类别代理: {sorted(affected)}")
+        self._swap(engines, categories, affected)
+
+    def _swap(self, engines: Dict, categories: Dict[str, List[str]], affected: set) -> None:
+        agents = {category: agent for category, agent in self._agents.items()
+                  if category in categories and category not in affected}
+        for category in affected:
+            category_doc_engines = {doc_id: engines[doc_id]
+                                    for doc_id in categories.get(category, []) if doc_id in engines}
+            if not category_doc_engines:
+                logger.info(f"类别 '{category}' 已没有文档，移除该代理")
+                continue
+            try:
+                agents[category] = _build_agent_for_category(category=category,
+                                                             doc_agents=category_doc_engines)
+            except Exception as e:
+                logger.error(f"为类别 '{category}' 构建代理失败: {e}")
+                # 重建失败时保留旧代理，避免该类别无法查询
+                if category in self._agents:
+                    agents[category] = self._agents[category]
+
+        # 引用赋值是原子的，查询线程不会看到中间状态
+        self._engines = engines
+        self._categories = categories
+        self._agents = agents
+
+    def start_watching(self,
+                       poll_interval: Optional[float] = None,
+                       debounce_seconds: Optional[float] = None) -> DirectoryWatcher:
+        """在后台监听输入目录，目录稳定后自动增量更新"""
+        if self._watcher is None:
+            self._watcher = DirectoryWatcher(on_change=lambda snapshot: self.refresh(),
+                                             poll_interval=poll_interval,
+                                             debounce_seconds=debounce_seconds)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self) -> None:
+        if self._watcher:
+            self._watcher.stop()
@@ -0,0 +1,135 @@
+"""
+章节锚点索引
+
+Markdown解析器为每个节点写入 Header N、section_link（文档内唯一的锚点）元数据，
+据此为每个原始文档建立两张表：
+    锚点 → 该章节的节点ID
+    章节路径（如 /安装/接线/） → 该章节及其所有子章节的节点ID
+以及 节点ID → (文档ID, 锚点, 章节路径)，检索命中某个节点后可以直接取出整个章节，
+或按名称跳转到指定章节，不需要扫描节点。索引与文档存储保存在同一目录。
+"""
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.utils import default_logger
+
+# 索引文件名（位于文档存储目录中）
+SECTION_INDEX_FILE = "section_index.json"
+
+_HEADER_KEY = re.compile(r'^Header (\d+)$')
+
+
+def _headers(metadata: Dict[str, Any]) -> List[str]:
+    """按级别排列的标题链"""
+    headers = sorted((int(match.group(1)), value) for key, value in metadata.items()
+                     if (match := _HEADER_KEY.match(key)))
+    return [header for _, header in headers]
+
+
+def _join_path(headers: List[str], separator: str = "/") -> str:
+    return separator + separator.join(headers) + separator
+
+
+def section_path(metadata: Dict[str, Any], separator: str = "/") -> Optional[str]:
+    """由 Header N 元数据得到节点所在章节的完整路径（如 /安装/接线/），没有标题时返回None"""
+    headers = _headers(metadata)
+    return _join_path(headers, separator) if headers else None
+
+
+class SectionIndex:
+    """
+    章节锚点索引
+
+    Args:
+        documents: 文档ID → {"anchors": {锚点: [节点ID]}, "paths": {章节路径: [节点ID]}}
+        nodes: 节点ID → [文档ID, 锚点, 章节路径]
+    """
+
+    def __init__(self,
+                 documents: Optional[Dict[str, Dict[str, Dict[str, List[str]]]]] = None,
+                 nodes: Optional[Dict[str, List[Optional[str]]]] = None):
+        self.documents = documents or {}
+        self.nodes = nodes or {}
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable) -> "SectionIndex":
+        """从带有 Header N / section_link 元数据的节点建立索引（按节点顺序记录）"""
+        index = cls()
+        for node in nodes:
+            index.add_node(node)
+        return index
+
+    def add_node(self, node) -> None:
+        """把节点加入索引，没有标题元数据的节点忽略"""
+        metadata = node.metadata if isinstance(node.metadata, dict) else {}
+        headers = _headers(metadata)
+        if not headers:
+            return
+        doc_id = node.ref_doc_id or node.node_id
+        anchor = metadata.get("section_link")
+        document = self.documents.setdefault(doc_id, {"anchors": {}, "paths": {}})
+        if anchor:
+            document["anchors"].setdefault(anchor, []).append(node.node_id)
+        # 节点同时属于所有上级章节
+        for depth in range(1, len(headers) + 1):
+            document["paths"].setdefault(_join_path(headers[:depth]), []).append(node.node_id)
+        self.nodes[node.node_id] = [doc_id, anchor, _join_path(headers)]
+
+    def get_section(self, doc_id: str, anchor: str) -> List[str]:
+        """按锚点取章节的节点ID（不含子章节）"""
+        return list(self.documents.get(doc_id, {}).get("anchors", {}).get(anchor, []))
+
+    def get_path(self, doc_id: str, path: str) -> List[str]:
+        """按章节路径取章节及其子章节的节点ID"""
+        return list(self.documents.get(doc_id, {}).get("paths", {}).get(path, []))
+
+    def locate(self, node_id: str) -> Optional[Tuple[str, Optional[str], str]]:
+        """节点所在的 (文档ID, 锚点, 章节路径)，不在索引中时返回None"""
+        entry = self.nodes.get(node_id)
+        return tuple(entry) if entry else None
+
+    def expand(self, node_id: str, include_subsections: bool = False) -> List[str]:
+        """
+        取命中节点所在的整个章节
+
+        Args:
+            node_id: 命中的节点ID
+            include_subsections: 是否包含子章节
+        Returns:
+            章节中的节点ID（按文档顺序，包含node_id本身），节点不在索引中时返回空列表
+        """
+        entry = self.nodes.get(node_id)
+        if entry is None:
+            return []
+        doc_id, anchor, path = entry
+        if include_subsections or not anchor:
+            return self.get_path(doc_id, path)
+        return self.get_section(doc_id, anchor)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["SectionIndex"]:
+        """从磁盘加载索引，不存在或损坏时返回None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(documents=data.get("documents", {}), nodes=data.get("nodes", {}))
+        except Exception as e:
+            default_logger.warning(f"加载章节索引 {path} 失败: {e}")
+            return None
+
+    def save(self, path: str) -> None:
+        """持久化索引（先写临时文件再替换）"""
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents, "nodes": self.nodes}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
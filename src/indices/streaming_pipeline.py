@@ -0,0 +1,367 @@
+"""
+流式摄入管道
+
+读取 → 转换 → 切分 → 嵌入 → 建索引 五个阶段并发运行，阶段之间使用有界队列连接：
+下游处理不过来时上游会在put处等待（背压），内存占用由队列大小而不是语料规模决定，
+早期文档的嵌入可以与后续文档的读取、摘要重叠进行。
+"""
+import asyncio
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.settings import Settings
+
+from config.config_rag import STREAMING_INGESTION_CONFIG
+from src.data_ingestion.ingestion_pipeline import (create_pipeline, chunk_documents, create_deduplicator,
+                                                   drop_duplicate_documents, drop_superseded_documents,
+                                                   arun_pipeline_batch)
+from src.data_ingestion.reader import iter_documents
+from src.indices.index import VECTOR_CACHE_DIR, ensure_storage_dir_exists
+
+logger = logging.getLogger('llama_kb.indices.streaming')
+
+# 阶段结束标记
+_DONE = object()
+
+
+class StageStats:
+    """单个阶段的统计信息"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def wall_seconds(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = self.wall_seconds
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "throughput": round(self.items / wall, 2) if wall > 0 else 0.0,
+            "utilization": round(self.busy_seconds / wall, 3) if wall > 0 else 0.0,
+        }
+
+
+class QueueStats:
+    """单个队列的深度采样"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.samples = 0
+        self.total_depth = 0
+        self.max_depth = 0
+
+    def sample(self, depth: int) -> None:
+        self.samples += 1
+        self.total_depth += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "avg_depth": round(self.total_depth / self.samples, 2) if self.samples else 0.0,
+        }
+
+
+class StreamingIngestionPipeline:
+    """
+    背压式异步流式摄入管道
+
+    Args:
+        queue_size: 阶段间队列的容量
+        transform_batch_size: 转换阶段每批最多处理的文档数
+        embed_batch_size: 嵌入阶段每次请求最少凑齐的节点数
+        embed_model: 嵌入模型，默认使用Settings.embed_model
+        persist_indices: 是否将每个原始文档的向量索引持久化到store/vector_indices
+        report_interval: 定期输出队列深度的间隔（秒），0表示不输出
+    """
+
+    STAGES = ["read", "transform", "chunk", "embed", "index"]
+
+    def __init__(self,
+                 queue_size: Optional[int] = None,
+                 transform_batch_size: Optional[int] = None,
+                 embed_batch_size: Optional[int] = None,
+                 embed_model: Optional[Any] = None,
+                 persist_indices: bool = True,
+                 report_interval: Optional[float] = None):
+        config = STREAMING_INGESTION_CONFIG
+        self.queue_size = queue_size or config.get("queue_size", 32)
+        self.transform_batch_size = transform_batch_size or config.get("transform_batch_size", 8)
+        self.embed_batch_size = embed_batch_size or config.get("embed_batch_size", 100)
+        self.report_interval = config.get("report_interval", 10) if report_interval is None else report_interval
+        self.persist_indices = persist_indices
+        self._embed_model = embed_model
+
+        self.stage_stats = {name: StageStats(name) for name in self.STAGES}
+        self.queue_stats: Dict[str, QueueStats] = {}
+        self.indices: Dict[str, VectorStoreIndex] = {}
+        self._deduplicator = None
+
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            self._embed_model = Settings.embed_model
+        return self._embed_model
+
+    def _new_queue(self, name: str) -> asyncio.Queue:
+        self.queue_stats[name] = QueueStats(name, self.queue_size)
+        return asyncio.Queue(maxsize=self.queue_size)
+
+    async def _put(self, name: str, queue: asyncio.Queue, item: Any) -> None:
+        await queue.put(item)
+        self.queue_stats[name].sample(queue.qsize())
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue, max_items: int) -> List[Any]:
+        """等待至少一个元素，然后取出当前已就绪的元素（最多max_items个）"""
+        items = [await queue.get()]
+        while len(items) < max_items and items[-1] is not _DONE and not queue.empty():
+            items.append(queue.get_nowait())
+        return items
+
+    async def _read_stage(self, documents: Iterable, out_q: asyncio.Queue) -> None:
+        stats = self.stage_stats["read"]
+        stats.started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        iterator = iter(documents)
+        while True:
+            started = time.perf_counter()
+            # 读取文件是阻塞IO，放到线程中执行
+            doc = await loop.run_in_executor(None, next, iterator, _DONE)
+            stats.busy_seconds += time.perf_counter() - started
+            if doc is _DONE:
+                break
+            stats.items += 1
+            await self._put("read", out_q, doc)
+        stats.finished_at = time.perf_counter()
+        await out_q.put(_DONE)
+
+    async def _transform_stage(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        stats = self.stage_stats["transform"]
+        stats.started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pipeline = create_pipeline()
+        deduplicator = self._deduplicator = create_deduplicator("document")
+        done = False
+        while not done:
+            batch = await self._drain(in_q, self.transform_batch_size)
+            if batch[-1] is _DONE:
+                done = True
+                batch = batch[:-1]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            # MinHash计算是CPU密集操作，放到线程中执行，不阻塞其他阶段
+            batch = await loop.run_in_executor(None, drop_duplicate_documents, batch, deduplicator)
+            processed = await arun_pipeline_batch(pipeline, batch) if batch else []
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += len(processed)
+            for doc in processed:
+                await self._put("transform", out_q, doc)
+        stats.finished_at = time.perf_counter()
+        await out_q.put(_DONE)
+
+    async def _chunk_stage(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        stats = self.stage_stats["chunk"]
+        stats.started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        done = False
+        while not done:
+            docs = await self._drain(in_q, self.transform_batch_size)
+            if docs[-1] is _DONE:
+                done = True
+                docs = docs[:-1]
+            if not docs:
+                continue
+            started = time.perf_counter()
+            chunks = await loop.run_in_executor(None, chunk_documents, docs)
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += len(chunks)
+
+            # 按原始文档分组，建索引以原始文档为单位
+            groups: Dict[str, List[BaseNode]] = {}
+            for chunk in chunks:
+                groups.setdefault(chunk.ref_doc_id or chunk.id_, []).append(chunk)
+            for doc_id, nodes in groups.items():
+                await self._put("chunk", out_q, (doc_id, nodes))
+        stats.finished_at = time.perf_counter()
+        await out_q.put(_DONE)
+
+    def _index_path(self, doc_id: str) -> str:
+        return os.path.join(VECTOR_CACHE_DIR, doc_id)
+
+    async def _embed_stage(self, in_q: asyncio.Queue, out_q: asyncio.Queue) -> None:
+        stats = self.stage_stats["embed"]
+        stats.started_at = time.perf_counter()
+        done = False
+        while not done:
+            # 凑够一批节点再请求嵌入，减少请求次数
+            groups = []
+            node_count = 0
+            while node_count < self.embed_batch_size:
+                item = await in_q.get()
+                if item is _DONE:
+                    done = True
+                    break
+                groups.append(item)
+                node_count += len(item[1])
+                if in_q.empty() and node_count > 0:
+                    break
+            if not groups:
+                continue
+
+            # 已有向量索引缓存的文档不需要重新嵌入
+            to_embed = [node for doc_id, nodes in groups
+                        if not (self.persist_indices and os.path.exists(self._index_path(doc_id)))
+                        for node in nodes if node.embedding is None]
+            if to_embed:
+                started = time.perf_counter()
+                texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in to_embed]
+                embeddings = await self.embed_model.aget_text_embedding_batch(texts)
+                for node, embedding in zip(to_embed, embeddings):
+                    node.embedding = embedding
+                stats.busy_seconds += time.perf_counter() - started
+                stats.items += len(to_embed)
+
+            for group in groups:
+                await self._put("embed", out_q, group)
+        stats.finished_at = time.perf_counter()
+        await out_q.put(_DONE)
+
+    def _build_index(self, doc_id: str, nodes: List[BaseNode]) -> None:
+        index_path = self._index_path(doc_id)
+        if self.persist_indices and os.path.exists(index_path):
+            logger.info(f"文档 {doc_id} 的向量索引已存在，跳过")
+            return
+        index = VectorStoreIndex(nodes, embed_model=self.embed_model)
+        if self.persist_indices:
+            index.storage_context.persist(persist_dir=index_path)
+        self.indices[doc_id] = index
+
+    def _remove_superseded(self, nodes: List[BaseNode]) -> List[BaseNode]:
+        """删除已被较新版本取代的文档的索引和节点（旧版本在较新版本出现之前已经建好索引）"""
+        kept = drop_superseded_documents(nodes, self._deduplicator)
+        if len(kept) < len(nodes):
+            for doc_id in self._deduplicator.superseded:
+                self.indices.pop(doc_id, None)
+                if self.persist_indices:
+                    shutil.rmtree(self._index_path(doc_id), ignore_errors=True)
+        return kept
+
+    async def _index_stage(self, in_q: asyncio.Queue, nodes_out: List[BaseNode]) -> None:
+        stats = self.stage_stats["index"]
+        stats.started_at = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await in_q.get()
+            if item is _DONE:
+                break
+            doc_id, nodes = item
+            started = time.perf_counter()
+            await loop.run_in_executor(None, self._build_index, doc_id, nodes)
+            stats.busy_seconds += time.perf_counter() - started
+            stats.items += 1
+            nodes_out.extend(nodes)
+        stats.finished_at = time.perf_counter()
+
+    async def _monitor(self, queues: Dict[str, asyncio.Queue]) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            depths = ", ".join(f"{name}={queue.qsize()}/{self.queue_size}" for name, queue in queues.items())
+            progress = ", ".join(f"{name}={stats.items}" for name, stats in self.stage_stats.items())
+            logger.info(f"队列深度: {depths}；已处理: {progress}")
+
+    async def arun(self, documents: Optional[Iterable] = None) -> List[BaseNode]:
+        """
+        运行流式摄入
+
+        Args:
+            documents: 要处理的文档（列表或生成器），默认从输入目录惰性读取
+        Returns:
+            带嵌入向量的节点列表
+        """
+        if documents is None:
+            documents = iter_documents()
+        if self.persist_indices:
+            ensure_storage_dir_exists()
+
+        queues = {name: self._new_queue(name) for name in ["read", "transform", "chunk", "embed"]}
+        nodes: List[BaseNode] = []
+
+        tasks = [
+            asyncio.ensure_future(self._read_stage(documents, queues["read"])),
+            asyncio.ensure_future(self._transform_stage(queues["read"], queues["transform"])),
+            asyncio.ensure_future(self._chunk_stage(queues["transform"], queues["chunk"])),
+            asyncio.ensure_future(self._embed_stage(queues["chunk"], queues["embed"])),
+            asyncio.ensure_future(self._index_stage(queues["embed"], nodes)),
+        ]
+        monitor = asyncio.ensure_future(self._monitor(queues)) if self.report_interval else None
+
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # 任一阶段失败时取消其余阶段，避免在队列上永久等待
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            if monitor is not None:
+                monitor.cancel()
+
+        nodes = await asyncio.get_running_loop().run_in_executor(None, self._remove_superseded, nodes)
+        self.log_report()
+        return nodes
+
+    def run(self, documents: Optional[Iterable] = None) -> List[BaseNode]:
+        """同步运行流式摄入"""
+        return asyncio.run(self.arun(documents))
+
+    def report(self) -> Dict[str, Any]:
+        """返回各阶段吞吐量和队列深度统计"""
+        stages = {name: stats.to_dict() for name, stats in self.stage_stats.items()}
+        bottleneck = max(stages, key=lambda name: stages[name]["utilization"]) if stages else None
+        return {
+            "stages": stages,
+            "queues": {name: stats.to_dict() for name, stats in self.queue_stats.items()},
+            "bottleneck": bottleneck,
+        }
+
+    def log_report(self) -> None:
+        report = self.report()
+        for name, stats in report["stages"].items():
+            logger.info(f"阶段 {name}: 处理 {stats['items']} 项，吞吐 {stats['throughput']}/s，"
+                        f"忙碌 {stats['busy_seconds']}s / {stats['wall_seconds']}s")
+        for name, stats in report["queues"].items():
+            logger.info(f"队列 {name}: 最大深度 {stats['max_depth']}/{stats['maxsize']}，"
+                        f"平均深度 {stats['avg_depth']}")
+        logger.info(f"瓶颈阶段: {report['bottleneck']}")
+
+
+def run_streaming_ingestion(documents: Optional[Iterable] = None, **kwargs) -> List[BaseNode]:
+    """
+    使用流式管道摄入文档并建立向量索引
+
+    Args:
+        documents: 要处理的文档，默认从输入目录惰性读取
+        **kwargs: 传给StreamingIngestionPipeline的参数
+    Returns:
+        带嵌入向量的节点列表
+    """
+    return StreamingIngestionPipeline(**kwargs).run(documents)
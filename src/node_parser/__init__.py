@@ -7,10 +7,12 @@ from src.node_parser.markdown_parser import CustomMarkdownNodeParser
 from src.node_parser.json_parser import JSONNodeParser
 from src.node_parser.word_parser import WordNodeParser
 from src.node_parser.semantic_parser import SemanticNodeParser
+from src.node_parser.embedding_semantic_parser import EmbeddingSemanticNodeParser
 
 __all__ = [
     "CustomMarkdownNodeParser",
     "JSONNodeParser",
     "WordNodeParser",
-    "SemanticNodeParser"
+    "SemanticNodeParser",
+    "EmbeddingSemanticNodeParser"
 ] 
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+基于嵌入的语义切分
+
+文本先按中英文句末标点和换行切成句子，每个句子与前后 buffer_size 个句子拼接成窗口，
+一批文档的所有窗口去重后成批请求嵌入（按 模型+文本 的哈希缓存），
+再用NumPy一次计算相邻窗口的余弦距离，距离超过百分位阈值的位置作为断点。
+超过 chunk_size 的语义段按句子继续切分。
+"""
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+from config.config_rag import SEMANTIC_CHUNKING_CONFIG
+from src.models import EmbeddingFactory, EmbeddingProviderType
+from src.node_parser.semantic_parser import SemanticNodeParser, count_tokens, split_cjk_sentences
+from src.utils import default_logger
+
+
+def sentence_windows(sentences: List[str], buffer_size: int) -> List[str]:
+    """每个句子与前后各 buffer_size 个句子拼接成的窗口"""
+    return ["".join(sentences[max(0, i - buffer_size):i + buffer_size + 1]).strip()
+            for i in range(len(sentences))]
+
+
+def adjacent_distances(embeddings: np.ndarray) -> np.ndarray:
+    """一次向量化计算相邻两行的余弦距离，返回长度为 行数-1 的数组"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.where(norms == 0, 1.0, norms)
+    return 1.0 - np.einsum("ij,ij->i", normalized[:-1], normalized[1:])
+
+
+def find_breakpoints(distances: np.ndarray, percentile: float) -> np.ndarray:
+    """距离超过百分位阈值的位置 i（在第 i 和 i+1 个句子之间断开）"""
+    if len(distances) == 0:
+        return np.zeros(0, dtype=int)
+    return np.flatnonzero(distances > np.percentile(distances, percentile))
+
+
+class EmbeddingSemanticNodeParser(NodeParser):
+    """
+    基于嵌入的语义节点解析器
+
+    在话题发生变化的位置切分，块的大小随内容变化，但不超过 chunk_size。
+    嵌入请求失败时退回按句子切分（SemanticNodeParser）。
+    """
+
+    chunk_size: int = Field(default=1024, description='块的最大token数')
+    buffer_size: int = Field(
+        default=SEMANTIC_CHUNKING_CONFIG.get("buffer_size", 1),
+        description='与前后各几个句子拼接后计算嵌入'
+    )
+    breakpoint_percentile: float = Field(
+        default=SEMANTIC_CHUNKING_CONFIG.get("breakpoint_percentile", 95),
+        description='相邻距离超过该百分位数的位置作为断点'
+    )
+    embed_batch_size: int = Field(
+        default=SEMANTIC_CHUNKING_CONFIG.get("embed_batch_size", 25),
+        description='每次嵌入请求的文本数（仅用于默认创建的嵌入模型）'
+    )
+    embed_model: Optional[Any] = Field(
+        default=None,
+        description='嵌入模型，为None时使用EmbeddingFactory创建',
+        exclude=True
+    )
+
+    _sentence_parser: SemanticNodeParser = PrivateAttr()
+    _cache: Any = PrivateAttr(default=None)
+    _cache_created: bool = PrivateAttr(default=False)
+
+    def __init__(self, chunk_size: int = 1024, chunk_overlap: int = 200, separator: str = " ", **kwargs):
+        """
+        Args:
+            chunk_size: 块的最大token数
+            chunk_overlap: 按句子切分（超长语义段、嵌入失败）时块之间重叠的token数
+            separator: 按句子切分时超长子句的分隔符
+        """
+        super().__init__(chunk_size=chunk_size, **kwargs)
+        self._sentence_parser = SemanticNodeParser(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                                   separator=separator)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "EmbeddingSemanticNodeParser"
+
+    def _get_embed_model(self):
+        if self.embed_model is None:
+            self.embed_model = EmbeddingFactory.create_embedding(EmbeddingProviderType.DASHSCOPE,
+                                                                 embed_batch_size=self.embed_batch_size)
+        return self.embed_model
+
+    def _get_cache(self):
+        if not self._cache_created:
+            # 延迟导入，避免 node_parser 与 data_ingestion 循环导入
+            from src.data_ingestion.cache import create_embedding_cache
+            self._cache = create_embedding_cache()
+            self._cache_created = True
+        return self._cache
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        批量获取文本嵌入：相同文本只请求一次，缓存命中的不再请求
+
+        Returns:
+            形状为 (len(texts), 维度) 的float32矩阵
+        """
+        from src.data_ingestion.cache import EmbeddingCache
+
+        embed_model = self._get_embed_model()
+        model_name = getattr(embed_model, "model_name", None)
+        keys = [EmbeddingCache.make_key(text, model_name) for text in texts]
+        unique = dict(zip(keys, texts))
+
+        cache = self._get_cache()
+        found = cache.get_many(unique) if cache is not None else {}
+        missing = [key for key in unique if key not in found]
+        if missing:
+            # 一次提交全部未命中的文本，由嵌入模型按 embed_batch_size 分批请求
+            embeddings = embed_model.get_text_embedding_batch([unique[key] for key in missing])
+            new_embeddings = dict(zip(missing, embeddings))
+            found.update(new_embeddings)
+            if cache is not None:
+                cache.put_many(new_embeddings)
+        default_logger.debug(f"句子嵌入 {len(texts)} 个窗口，去重后 {len(unique)} 个，请求 {len(missing)} 个")
+        return np.asarray([found[key] for key in keys], dtype=np.float32)
+
+    def _semantic_ranges(self, embeddings: np.ndarray) -> List[Tuple[int, int]]:
+        """由句子嵌入得到语义段的句子下标范围 [start, end)"""
+        breakpoints = find_breakpoints(adjacent_distances(embeddings), self.breakpoint_percentile)
+        bounds = [0, *(int(i) + 1 for i in breakpoints), len(embeddings)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _chunk_ranges(self, sentences: List[str], ranges: List[Tuple[int, int]],
+                      metadata_str: str) -> List[str]:
+        """拼接语义段，超过块大小的语义段按句子继续切分"""
+        chunk_size = self.chunk_size - len(get_tokenizer()(metadata_str))
+        token_sizes = [count_tokens(sentence) for sentence in sentences]
+        chunks = []
+        for start, end in ranges:
+            text = "".join(sentences[start:end]).strip()
+            if not text:
+                continue
+            if sum(token_sizes[start:end]) <= chunk_size:
+                chunks.append(text)
+            else:
+                chunks.extend(self._sentence_parser.split_text_metadata_aware(text, metadata_str))
+        return chunks
+
+    def _parse_nodes(
+        self,
+        nodes: Sequence[BaseNode],
+        show_progress: bool = False,
+        **kwargs: Any,
+    ) -> List[BaseNode]:
+        documents = []
+        for node in nodes:
+            sentences = split_cjk_sentences(node.get_content(metadata_mode=MetadataMode.NONE))
+            metadata_str = max(node.get_metadata_str(MetadataMode.EMBED),
+                               node.get_metadata_str(MetadataMode.LLM), key=len)
+            documents.append((node, sentences, metadata_str))
+
+        # 整批文档的句子窗口一起请求嵌入
+        windows = [window for _, sentences, _ in documents if len(sentences) > 1
+                   for window in sentence_windows(sentences, self.buffer_size)]
+        embeddings = None
+        if windows:
+            try:
+                embeddings = self.embed_texts(windows)
+            except Exception as e:
+                default_logger.warning(f"句子嵌入失败，改为按句子切分: {e}")
+
+        all_nodes = []
+        offset = 0
+        for node, sentences, metadata_str in documents:
+            if len(sentences) > 1 and embeddings is not None:
+                ranges = self._semantic_ranges(embeddings[offset:offset + len(sentences)])
+                offset += len(sentences)
+            else:
+                ranges = [(0, len(sentences))]
+            chunks = self._chunk_ranges(sentences, ranges, metadata_str)
+            all_nodes.extend(build_nodes_from_splits(chunks, node, id_func=self.id_func))
+
+        for node in all_nodes:
+            node.metadata["parser_type"] = "embedding_semantic"
+        return all_nodes
@@ -1,42 +1,121 @@
 """Custom Markdown node parser."""
+import functools
 import re
+from typing import Dict, List, Tuple
+
 from llama_index.core.node_parser import MarkdownNodeParser
 from llama_index.core.node_parser.node_utils import build_nodes_from_splits
-from llama_index.core.schema import BaseNode, TextNode
-from llama_index.readers.file import MarkdownReader
+from llama_index.core.schema import BaseNode, MetadataMode, TextNode
 
-def generate_markdown_header_id(header_text, previous_ids=None):
-  if previous_ids is None:
-    previous_ids = set()
+# 标题行：一个或多个#后跟空白
+_HEADER = re.compile(r'^(#+)\s(.*)')
+# 图片 ![描述](地址) 和链接 [文字](地址) 一次替换，只保留描述或文字
+_LINK_OR_IMAGE = re.compile(r'!?\[([^\]\n]*)\]\([^)\n]*\)')
+_NON_WORD = re.compile(r'\W+')
+# 代码块围栏：```或~~~，至少三个
+_FENCE = re.compile(r'^[ \t]*(`{3,}|~{3,})')
 
-  # Step 1: Convert to lowercase
-  id = header_text.lower()
 
-  # Step 2: Remove non-word text
-  id = re.sub(r'\W+', ' ', id)
+@functools.lru_cache(maxsize=4096)
+def _header_slug(header_text: str) -> str:
+  # 转小写，连续的非单词字符替换为一个连字符，去掉首尾连字符
+  return _NON_WORD.sub('-', header_text.lower()).strip('-')
 
-  # Step 3: Convert spaces to hyphens
-  id = id.strip().replace(' ', '-')
 
-  # Step 4: Remove multiple consecutive hyphens
-  id = re.sub(r'-+', '-', id)
+def generate_markdown_header_id(header_text, previous_ids=None):
+  if previous_ids is None:
+    previous_ids = set()
 
-  # Step 5 & 6: Ensure uniqueness
+  id = _header_slug(header_text)
+
+  # Ensure uniqueness
   original_id = id
   counter = 1
   while id in previous_ids:
     id = f"{original_id}-{counter}"
     counter += 1
 
-  # Add the new unique id to the set of previous ids
-  # previous_ids.add(id)
-
   return id
 
+
+def strip_links_and_images(line: str) -> str:
+  """去掉链接和图片的Markdown语法，保留链接文字和图片描述"""
+  return _LINK_OR_IMAGE.sub(r'\1', line) if '[' in line else line
+
+
+def tokenize_markdown(text: str) -> List[Tuple[str, List[Tuple[int, str, str]]]]:
+  """
+  逐行扫描一遍Markdown文本，按标题切分为章节
+
+  同时维护标题栈和代码块状态：代码块中的#不视为标题，代码块中的链接语法保持原样，
+  代码块外的链接和图片只保留文字。每个标题生成文档内唯一的锚点（重名标题依次加 -1、-2）。
+
+  Returns:
+      [(章节文本, 章节所在的标题栈 [(级别, 标题, 锚点)])]
+  """
+  sections = []
+  header_stack: List[Tuple[int, str, str]] = []
+  used_ids = set()
+  current: List[str] = []
+  # 打开当前代码块的围栏，不在代码块中时为None
+  open_fence = None
+
+  def flush():
+    section = "\n".join(current).strip()
+    if section:
+      sections.append((section, list(header_stack)))
+
+  for line in text.split("\n"):
+    fence_match = _FENCE.match(line)
+    if fence_match:
+      fence = fence_match.group(1)
+      if open_fence is None:
+        open_fence = fence
+      elif fence[0] == open_fence[0] and len(fence) >= len(open_fence) and not line[fence_match.end():].strip():
+        # 只有同类且不短于开始围栏的纯围栏行才结束代码块
+        open_fence = None
+      current.append(line)
+      continue
+
+    if open_fence is None:
+      header_match = _HEADER.match(line)
+      if header_match:
+        # 遇到新标题时结束上一个章节
+        flush()
+        header_level = len(header_match.group(1))
+        header_text = strip_links_and_images(header_match.group(2))
+        anchor = generate_markdown_header_id(header_text, used_ids)
+        used_ids.add(anchor)
+        # 弹出级别相同或更低的标题（标题级别可以跳跃，如H1直接到H3）
+        while header_stack and header_stack[-1][0] >= header_level:
+          header_stack.pop()
+        header_stack.append((header_level, header_text, anchor))
+        current = ["#" * header_level + " " + header_text]
+        continue
+      line = strip_links_and_images(line)
+
+    current.append(line)
+
+  flush()
+  return sections
+
+
+def section_metadata(header_stack: List[Tuple[int, str, str]], separator: str = "/") -> Dict[str, str]:
+  """由标题栈生成章节元数据：Header N、section_link 和 header_path"""
+  metadata = {f"Header {level}": header for level, header, _ in header_stack}
+  if header_stack:
+    metadata['section_link'] = header_stack[-1][2]
+  header_path = separator.join(header for _, header, _ in header_stack[:-1])
+  # ex: "/header1/header2/" || "/"
+  metadata['header_path'] = separator + header_path + separator if header_path else separator
+  return metadata
+
+
 class CustomMarkdownNodeParser(MarkdownNodeParser):
     """Markdown node parser.
 
     Splits a document into Nodes using custom Markdown splitting logic.
+    标题栈、代码块和链接/图片清理在一次逐行扫描中完成（见 tokenize_markdown）。
 
     Args:
         include_metadata (bool): whether to include metadata in nodes
@@ -44,52 +123,21 @@ class CustomMarkdownNodeParser(MarkdownNodeParser):
 
     """
 
-    def _update_metadata(
-        self, headers_metadata: dict, new_header: str, new_header_level: int
-    ) -> dict:
-        """Update the markdown headers for metadata.
-
-        Removes all headers that are equal or less than the level
-        of the newly found header
-        """
-        updated_headers = {}
-
-        for i in range(1, new_header_level):
-            key = f"Header {i}"
-            if key in headers_metadata:
-                updated_headers[key] = headers_metadata[key]
-
-        updated_headers[f"Header {new_header_level}"] = new_header
-        # print(updated_headers)
-        updated_headers['section_link'] \
-            = generate_markdown_header_id(new_header, updated_headers.values())
-        return updated_headers
-
-    def _build_node_from_split(
-        self,
-        text_split: str,
-        node: BaseNode,
-        metadata: dict,
-    ) -> TextNode:
-        """Build node from single text split."""
-        md_reader = MarkdownReader()
-
-        node = build_nodes_from_splits([text_split], node, id_func=self.id_func)[0]
-
-        node.text = md_reader.remove_hyperlinks(node.text)
-        node.text = md_reader.remove_images(node.text)
+    def _section_metadata(self, header_stack: List[Tuple[int, str, str]]) -> Dict[str, str]:
+        """由标题栈生成章节元数据：Header N、section_link 和 header_path"""
+        return section_metadata(header_stack, self.header_path_separator)
+
+    def get_nodes_from_node(self, node: BaseNode) -> List[TextNode]:
+        """Get nodes from document by splitting on headers."""
+        sections = tokenize_markdown(node.get_content(metadata_mode=MetadataMode.NONE))
+        if not sections:
+            return []
 
+        nodes = build_nodes_from_splits([section for section, _ in sections], node, id_func=self.id_func)
         if self.include_metadata:
-            # 处理node.metadata和metadata为字符串的情况
-            current_metadata = {}
-            if isinstance(node.metadata, dict):
-                current_metadata = node.metadata
-                
-            # 确保metadata参数也是字典
-            meta_dict = {}
-            if isinstance(metadata, dict):
-                meta_dict = metadata
-                
-            node.metadata = {**current_metadata, **meta_dict}
-
-        return node
\ No newline at end of file
+            for text_node, (_, header_stack) in zip(nodes, sections):
+                # 处理node.metadata不是字典的情况
+                if not isinstance(text_node.metadata, dict):
+                    text_node.metadata = {}
+                text_node.metadata.update(self._section_metadata(header_stack))
+        return nodes
@@ -1,4 +1,6 @@
 import os
+import threading
+from typing import Callable, Dict, Iterable, Tuple
 from llama_index.core.node_parser import NodeParser
 from llama_index.core.schema import TextNode
 from config.config_rag import CHUNKING_CONFIG
@@ -6,18 +8,127 @@ from src.node_parser import (
     CustomMarkdownNodeParser,
     JSONNodeParser,
     WordNodeParser,
-    SemanticNodeParser
+    SemanticNodeParser,
+    EmbeddingSemanticNodeParser
 )
 
-def get_parser_for_document(doc: TextNode) -> NodeParser:
+def _build_markdown_parser(config: dict) -> NodeParser:
+    return CustomMarkdownNodeParser(
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"],
+        separator=config["separator"]
+    )
+
+def _build_json_parser(config: dict) -> NodeParser:
+    return JSONNodeParser(
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"]
+    )
+
+def _build_word_parser(config: dict) -> NodeParser:
+    return WordNodeParser(
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"]
+    )
+
+def _build_semantic_parser(config: dict) -> NodeParser:
+    if config.get("semantic_mode", "sentence") == "embedding":
+        return EmbeddingSemanticNodeParser(
+            chunk_size=config["chunk_size"],
+            chunk_overlap=config["chunk_overlap"],
+            separator=config["separator"]
+        )
+    return SemanticNodeParser(
+        chunk_size=config["chunk_size"],
+        chunk_overlap=config["chunk_overlap"],
+        separator=config["separator"]
+    )
+
+class NodeParserRegistry:
+    """
+    解析器注册表
+    
+    维护 扩展名 → 文档类型 → 解析器构造函数 的映射，
+    每个（文档类型, 分块配置）只构造一次解析器并复用。
+    新格式通过 register_parser 注册，无需修改选择逻辑。
     """
-    根据文档类型选择适当的解析器，并使用优化的分块配置
+    
+    # 扩展名到文档类型（CHUNKING_CONFIG中的键）的映射
+    _extension_types: Dict[str, str] = {
+        ".md": "markdown",
+        ".mdx": "markdown",
+        ".json": "json",
+        ".doc": "docx",
+        ".docx": "docx",
+    }
+    
+    # 文档类型到解析器构造函数的映射，构造函数接收该类型的分块配置
+    _builders: Dict[str, Callable[[dict], NodeParser]] = {
+        "markdown": _build_markdown_parser,
+        "json": _build_json_parser,
+        "docx": _build_word_parser,
+        "default": _build_semantic_parser,
+    }
+    
+    # 已构造的解析器缓存，键为（文档类型, 分块配置）
+    _parsers: Dict[Tuple[str, tuple], NodeParser] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def register_parser(cls, doc_type: str, builder: Callable[[dict], NodeParser],
+                        extensions: Iterable[str] = ()) -> None:
+        """
+        注册新的解析器
+        
+        Args:
+            doc_type: 文档类型，同时作为CHUNKING_CONFIG中的配置键
+            builder: 解析器构造函数，接收分块配置字典
+            extensions: 使用该解析器的文件扩展名，例如[".txt"]
+        """
+        with cls._lock:
+            cls._builders[doc_type] = builder
+            for ext in extensions:
+                cls._extension_types[ext.lower()] = doc_type
+            # 清除该类型已缓存的解析器
+            cls._parsers = {key: parser for key, parser in cls._parsers.items() if key[0] != doc_type}
+    
+    @classmethod
+    def get_document_type(cls, file_ext: str) -> str:
+        """根据扩展名获取文档类型，未注册的扩展名归为default类型"""
+        return cls._extension_types.get(file_ext.lower(), "default")
+    
+    @classmethod
+    def get_parser(cls, doc_type: str) -> NodeParser:
+        """获取文档类型对应的解析器，相同分块配置下复用同一个实例"""
+        if doc_type not in cls._builders:
+            doc_type = "default"
+        config = CHUNKING_CONFIG.get(doc_type, CHUNKING_CONFIG["default"])
+        key = (doc_type, tuple(sorted(config.items())))
+        
+        parser = cls._parsers.get(key)
+        if parser is None:
+            with cls._lock:
+                parser = cls._parsers.get(key)
+                if parser is None:
+                    parser = cls._builders[doc_type](config)
+                    cls._parsers[key] = parser
+        return parser
+    
+    @classmethod
+    def clear_cache(cls) -> None:
+        """清除已构造的解析器"""
+        with cls._lock:
+            cls._parsers = {}
+
+def get_document_type(doc: TextNode) -> str:
+    """
+    根据文件扩展名确定文档类型，对应CHUNKING_CONFIG中的键
     
     Args:
         doc: 文档节点
         
     Returns:
-        NodeParser: 适合该文档类型的解析器
+        str: 文档类型，例如"markdown"、"json"、"docx" 或 "default"
     """
     # 从文件名或元数据中获取文件扩展名
     file_ext = ""
@@ -30,31 +141,18 @@ def get_parser_for_document(doc: TextNode) -> NodeParser:
         _, file_ext = os.path.splitext(file_name)
         file_ext = file_ext.lower()
     
-    # 根据扩展名选择解析器和配置
-    if file_ext in ['.md', '.mdx']:
-        config = CHUNKING_CONFIG.get("markdown", CHUNKING_CONFIG["default"])
-        return CustomMarkdownNodeParser(
-            chunk_size=config["chunk_size"],
-            chunk_overlap=config["chunk_overlap"],
-            separator=config["separator"]
-        )
-    elif file_ext in ['.json']:
-        config = CHUNKING_CONFIG.get("json", CHUNKING_CONFIG["default"])
-        return JSONNodeParser(
-            chunk_size=config["chunk_size"],
-            chunk_overlap=config["chunk_overlap"]
-        )
-    elif file_ext in ['.doc', '.docx']:
-        config = CHUNKING_CONFIG.get("docx", CHUNKING_CONFIG["default"])
-        return WordNodeParser(
-            chunk_size=config["chunk_size"],
-            chunk_overlap=config["chunk_overlap"]
-        )
-    else:
-        # 默认使用语义解析器
-        config = CHUNKING_CONFIG.get("default", CHUNKING_CONFIG["default"])
-        return SemanticNodeParser(
-            chunk_size=config["chunk_size"],
-            chunk_overlap=config["chunk_overlap"],
-            separator=config["separator"]
-        )
\ No newline at end of file
+    return NodeParserRegistry.get_document_type(file_ext)
+
+def get_parser_for_document(doc: TextNode) -> NodeParser:
+    """
+    根据文档类型选择适当的解析器，并使用优化的分块配置
+    
+    解析器由NodeParserRegistry缓存，同类型文档共用同一个实例
+    
+    Args:
+        doc: 文档节点
+        
+    Returns:
+        NodeParser: 适合该文档类型的解析器
+    """
+    return NodeParserRegistry.get_parser(get_document_type(doc))
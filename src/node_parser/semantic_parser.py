@@ -1,13 +1,51 @@
 """语义节点解析器"""
+import functools
+import re
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.text.sentence import _Split
 from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.utils import get_tokenizer
 from typing import List, Optional, Sequence
 
+# 句子：到中英文句末标点（连同其后的右引号、右括号和空格）、英文句号加空白或换行为止
+_SENTENCE = re.compile(
+    r'[^\n]*?(?:[。！？；!?;]+[”’」』）)"\']*[ \t]*|\.(?=\s)[ \t]*|\n+|$)'
+)
+# 超长句子按子句继续切分（中英文逗号、顿号、分号和句末标点）
+CJK_CLAUSE_REGEX = "[^,.;，、。？！；]+[,.;，、。？！；]?"
+
+
+def split_cjk_sentences(text: str) -> List[str]:
+    """
+    按 。！？；（及对应的英文标点）和换行切分句子，保留标点和换行，所有片段拼接后等于原文
+
+    只有空白的片段并入前一个句子。
+    """
+    sentences = []
+    for match in _SENTENCE.finditer(text):
+        piece = match.group()
+        if not piece:
+            continue
+        if sentences and not piece.strip():
+            sentences[-1] += piece
+        else:
+            sentences.append(piece)
+    return sentences
+
+
+@functools.lru_cache(maxsize=100000)
+def count_tokens(text: str) -> int:
+    """计算token数（使用LlamaIndex全局分词器），按文本缓存，重复出现的句子只计算一次"""
+    return len(get_tokenizer()(text))
+
+
 class SemanticNodeParser(SentenceSplitter):
     """
     语义节点解析器
     
-    用于处理默认情况下的文档，基于语义边界进行切分
+    用于处理默认情况下的文档，基于语义边界进行切分。
+    文本先按中英文句末标点和换行切成句子，每个句子只计算一次token数，
+    再按句子合并成接近 chunk_size 的块；超过 chunk_size 的句子按子句、分隔符、字符继续切分。
     """
     
     def __init__(
@@ -22,11 +60,11 @@ class SemanticNodeParser(SentenceSplitter):
         初始化语义节点解析器
         
         Args:
-            chunk_size: 块的大小（字符数）
-            chunk_overlap: 块之间重叠的字符数
+            chunk_size: 块的大小（token数）
+            chunk_overlap: 块之间重叠的token数
             include_metadata: 是否在节点中包含元数据
             paragraph_separator: 段落分隔符
-            separator: 句子分隔符
+            separator: 超长子句的最后切分分隔符（之后按字符切分）
         """
         super().__init__(
             chunk_size=chunk_size, 
@@ -34,8 +72,24 @@ class SemanticNodeParser(SentenceSplitter):
             include_metadata=include_metadata,
             paragraph_separator=paragraph_separator,
             separator=separator,
+            chunking_tokenizer_fn=split_cjk_sentences,
+            secondary_chunking_regex=CJK_CLAUSE_REGEX,
         )
     
+    def _token_size(self, text: str) -> int:
+        return count_tokens(text)
+    
+    def _split(self, text: str, chunk_size: int) -> List[_Split]:
+        """切分为不超过 chunk_size 的句子，合并时以句子为单位填满块"""
+        splits = []
+        for sentence in split_cjk_sentences(text):
+            token_size = self._token_size(sentence)
+            if token_size <= chunk_size:
+                splits.append(_Split(sentence, is_sentence=True, token_size=token_size))
+            else:
+                splits.extend(super()._split(sentence, chunk_size))
+        return splits
+    
     def get_nodes_from_documents(
         self, documents: Sequence[BaseNode]
     ) -> List[TextNode]:
@@ -1,56 +1,366 @@
-"""Word文档节点解析器"""
-from llama_index.core.node_parser import SimpleNodeParser
-from llama_index.core.schema import BaseNode, TextNode
-from typing import List, Optional, Sequence
+"""
+Word文档节点解析器
 
-class WordNodeParser(SimpleNodeParser):
+读取时用增量XML解析器扫描 word/document.xml（见 iter_docx_blocks），
+不构建整篇文档的DOM：每个段落、表格解析完成后立即产出并释放对应的XML元素，
+解析占用的内存只与最大的单个段落或表格有关（读取器产出的Document仍然包含全文）。
+标题段落输出为Markdown标题，表格输出为Markdown表格，段落之间用空行分隔。
+
+切分时逐行扫描这种结构化文本，块边界与标题、段落、表格对齐：
+遇到标题开始新块，表格尽量整体放入一个块，超长表格按行拆分并在每块重复表头，
+超长段落按中英文句子拆分（SemanticNodeParser）。每个节点带有与Markdown解析器相同的章节元数据（Header N、section_link、header_path）。
+"""
+import re
+import zipfile
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from xml.etree import ElementTree
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.node_parser import NodeParser
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+from src.node_parser.markdown_parser import generate_markdown_header_id, section_metadata
+from src.node_parser.semantic_parser import SemanticNodeParser
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_P, _TBL, _TR, _TC = _W + "p", _W + "tbl", _W + "tr", _W + "tc"
+_BODY, _STYLE, _NAME, _PSTYLE, _OUTLINE_LVL = _W + "body", _W + "style", _W + "name", _W + "pStyle", _W + "outlineLvl"
+_VAL, _STYLE_ID = _W + "val", _W + "styleId"
+# 文本框等内容在 mc:AlternateContent 的 Choice 和 Fallback 中各保存一份，只读取 Choice
+_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+# 段落中产生文字的元素（w:delText 是修订删除的文字，不计入）
+_TEXT_TAGS = {_W + "t": None, _W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n", _W + "noBreakHyphen": "-"}
+
+# 内置标题样式的名称（中文Word的styles.xml中也是英文名称）
+_HEADING_STYLE = re.compile(r'^(?:heading|标题)\s*([1-9])$', re.IGNORECASE)
+# 结构化文本中的标题行
+_HEADER = re.compile(r'^(#+)\s(.*)')
+_TABLE_SEPARATOR = re.compile(r'^\|(?:\s*-+\s*\|)+$')
+
+# 块类型
+HEADING, PARAGRAPH, TABLE = "heading", "paragraph", "table"
+
+
+def read_heading_styles(docx: zipfile.ZipFile) -> Dict[str, int]:
+    """读取 word/styles.xml，返回标题样式ID到标题级别的映射"""
+    levels = {}
+    try:
+        stream = docx.open("word/styles.xml")
+    except KeyError:
+        return levels
+    with stream:
+        for _, elem in ElementTree.iterparse(stream):
+            if elem.tag != _STYLE:
+                continue
+            style_id = elem.get(_STYLE_ID)
+            name = elem.find(_NAME)
+            match = _HEADING_STYLE.match(name.get(_VAL, "")) if name is not None else None
+            outline = elem.find(f"{_W}pPr/{_OUTLINE_LVL}")
+            if match:
+                levels[style_id] = int(match.group(1))
+            elif outline is not None and int(outline.get(_VAL, 9)) < 9:
+                levels[style_id] = int(outline.get(_VAL)) + 1
+            elem.clear()
+    return levels
+
+
+def _paragraph_text(paragraph: ElementTree.Element) -> str:
+    """段落自身的文字；文本框（w:txbxContent）中的嵌套段落单独产出，不计入外层段落"""
+    parts = []
+    stack = list(reversed(paragraph))
+    while stack:
+        elem = stack.pop()
+        if elem.tag == _P or elem.tag == _FALLBACK:
+            continue
+        if elem.tag in _TEXT_TAGS:
+            parts.append((elem.text or "") if _TEXT_TAGS[elem.tag] is None else _TEXT_TAGS[elem.tag])
+        stack.extend(reversed(elem))
+    return "".join(parts).strip()
+
+
+def _heading_level(paragraph: ElementTree.Element, heading_styles: Dict[str, int]) -> int:
+    """段落的标题级别，正文返回0；段落自身的大纲级别优先于样式"""
+    outline = paragraph.find(f"{_W}pPr/{_OUTLINE_LVL}")
+    if outline is not None:
+        level = int(outline.get(_VAL, 9))
+        return level + 1 if level < 9 else 0
+    style = paragraph.find(f"{_W}pPr/{_PSTYLE}")
+    return heading_styles.get(style.get(_VAL), 0) if style is not None else 0
+
+
+def _table_markdown(rows: List[List[str]]) -> str:
+    width = max(len(row) for row in rows)
+    lines = ["| " + " | ".join(row + [""] * (width - len(row))) + " |" for row in rows]
+    lines.insert(1, "|" + " --- |" * width)
+    return "\n".join(lines)
+
+
+def iter_docx_blocks(file: Union[str, IO[bytes]]) -> Iterator[Tuple[str, int, str]]:
+    """
+    增量解析docx，按文档顺序产出 (块类型, 标题级别, 文本)
+
+    标题块的级别为1-9，其余块为0；表格块的文本为Markdown表格，
+    单元格内的多个段落合并为一行，嵌套表格的文字并入外层单元格。
+    文本框中的段落在所在段落之前单独产出。
+    """
+    with zipfile.ZipFile(file) as docx:
+        heading_styles = read_heading_styles(docx)
+        with docx.open("word/document.xml") as stream:
+            body = None
+            table_depth = paragraph_depth = fallback_depth = 0
+            rows: List[List[str]] = []
+            cell: List[str] = []
+            for event, elem in ElementTree.iterparse(stream, events=("start", "end")):
+                tag = elem.tag
+                if event == "start":
+                    if tag == _FALLBACK:
+                        fallback_depth += 1
+                    elif fallback_depth:
+                        continue
+                    elif tag == _BODY:
+                        body = elem
+                    elif tag == _P:
+                        paragraph_depth += 1
+                    elif tag == _TBL:
+                        table_depth += 1
+                    elif tag == _TR and table_depth == 1:
+                        rows.append([])
+                    elif tag == _TC and table_depth == 1:
+                        cell = []
+                    continue
+
+                if tag == _FALLBACK:
+                    fallback_depth -= 1
+                    continue
+                if fallback_depth:
+                    continue
+
+                if tag == _P:
+                    paragraph_depth -= 1
+                    text = _paragraph_text(elem)
+                    if table_depth:
+                        if text:
+                            cell.append(text.replace("\n", " ").replace("|", "\\|"))
+                        continue
+                    if text:
+                        level = _heading_level(elem, heading_styles)
+                        if level:
+                            yield HEADING, level, text.replace("\n", " ")
+                        else:
+                            yield PARAGRAPH, 0, text
+                elif tag == _TC and table_depth == 1:
+                    rows[-1].append(" ".join(cell))
+                    continue
+                elif tag == _TBL:
+                    table_depth -= 1
+                    if table_depth:
+                        continue
+                    rows = [row for row in rows if any(row)]
+                    if rows:
+                        yield TABLE, 0, _table_markdown(rows)
+                    rows = []
+                else:
+                    continue
+                # 顶层段落或表格处理完成，释放已解析的元素（文本框所在的段落还没有结束时不释放）
+                if body is not None and not paragraph_depth:
+                    body.clear()
+
+
+def iter_docx_markdown(file: Union[str, IO[bytes]]) -> Iterator[str]:
+    """增量解析docx，按顺序产出每个块的Markdown文本"""
+    for kind, level, text in iter_docx_blocks(file):
+        yield "#" * level + " " + text if kind == HEADING else text
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """逐行产出文本，不复制整篇文本"""
+    start = 0
+    while start <= len(text):
+        end = text.find("\n", start)
+        if end == -1:
+            end = len(text)
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_text_blocks(text: str) -> Iterator[Tuple[str, int, str]]:
+    """
+    逐行扫描结构化文本，产出 (块类型, 标题级别, 文本)
+
+    标题行为标题块，连续的以|开头的行为表格块，其余以空行分隔为段落块。
+    """
+    current: List[str] = []
+    kind = PARAGRAPH
+
+    def flush():
+        block = "\n".join(current).strip()
+        current.clear()
+        return block
+
+    for line in _iter_lines(text):
+        stripped = line.strip()
+        header_match = _HEADER.match(stripped)
+        line_kind = TABLE if stripped.startswith("|") else PARAGRAPH
+        if header_match or not stripped or line_kind != kind:
+            block = flush()
+            if block:
+                yield kind, 0, block
+        kind = line_kind
+        if header_match:
+            yield HEADING, len(header_match.group(1)), header_match.group(2).strip()
+        elif stripped:
+            current.append(line)
+    block = flush()
+    if block:
+        yield kind, 0, block
+
+
+class WordNodeParser(NodeParser):
     """
     Word文档节点解析器
-    
-    专门用于解析Word (.doc, .docx) 格式的文档
+
+    专门用于解析Word (.docx) 格式的文档，块边界与标题、段落、表格对齐
     """
-    
+
+    chunk_size: int = Field(default=1024, gt=0, description="每个块的最大token数")
+    chunk_overlap: int = Field(default=20, ge=0, description="超长段落拆分时块之间重叠的token数")
+
+    _splitter: SemanticNodeParser = PrivateAttr()
+    _tokenizer: Any = PrivateAttr()
+
     def __init__(
         self,
         chunk_size: Optional[int] = 1024,
         chunk_overlap: Optional[int] = 20,
         include_metadata: bool = True,
+        **kwargs: Any,
     ):
         """
         初始化Word节点解析器
-        
+
         Args:
-            chunk_size: 块的大小（字符数）
-            chunk_overlap: 块之间重叠的字符数
+            chunk_size: 块的大小（token数）
+            chunk_overlap: 超长段落拆分时块之间重叠的token数
             include_metadata: 是否在节点中包含元数据
         """
         super().__init__(
-            chunk_size=chunk_size, 
+            chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             include_metadata=include_metadata,
+            **kwargs,
         )
-    
-    def get_nodes_from_documents(
-        self, documents: Sequence[BaseNode]
-    ) -> List[TextNode]:
+        self._splitter = SemanticNodeParser(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._tokenizer = get_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "WordNodeParser"
+
+    def _token_size(self, text: str) -> int:
+        return len(self._tokenizer(text))
+
+    def _split_table(self, table: str) -> List[str]:
+        """把超长表格按行拆分，每块重复表头"""
+        lines = table.split("\n")
+        header_size = 2 if len(lines) > 1 and _TABLE_SEPARATOR.match(lines[1].strip()) else 1
+        header, rows = "\n".join(lines[:header_size]), lines[header_size:]
+        budget = self.chunk_size - self._token_size(header)
+        pieces, current, size = [], [], 0
+        for row in rows:
+            row_size = self._token_size(row)
+            if current and size + row_size > budget:
+                pieces.append("\n".join([header] + current))
+                current, size = [], 0
+            if row_size > budget:
+                pieces.extend(self._splitter.split_text(row))
+                continue
+            current.append(row)
+            size += row_size
+        if current or not pieces:
+            pieces.append("\n".join([header] + current))
+        return pieces
+
+    def split_sections(self, text: str) -> List[Tuple[str, List[Tuple[int, str, str]]]]:
         """
-        从Word文档中获取节点
-        
-        Args:
-            documents: 要处理的文档序列
-            
+        切分结构化文本
+
         Returns:
-            List[TextNode]: 生成的节点列表
+            [(块文本, 块所在的标题栈 [(级别, 标题, 锚点)])]
         """
-        # 使用SimpleNodeParser的基本功能，进行Word特定的解析
-        nodes = super().get_nodes_from_documents(documents)
-        
-        # 在这里可以添加Word特定的处理逻辑
-        # 例如，尝试保留文档的段落和结构
+        chunks = []
+        header_stack: List[Tuple[int, str, str]] = []
+        used_ids = set()
+        current: List[str] = []
+        current_size = 0
+        has_body = False
+
+        def flush():
+            nonlocal current_size, has_body
+            if has_body:
+                chunks.append(("\n\n".join(current), list(header_stack)))
+            current.clear()
+            current_size = 0
+            has_body = False
+
+        for kind, level, block in iter_text_blocks(text):
+            if kind == HEADING:
+                # 标题开始新块；连续的标题合并到下一个有正文的块中
+                if has_body:
+                    flush()
+                anchor = generate_markdown_header_id(block, used_ids)
+                used_ids.add(anchor)
+                while header_stack and header_stack[-1][0] >= level:
+                    header_stack.pop()
+                header_stack.append((level, block, anchor))
+                block = "#" * level + " " + block
+                current.append(block)
+                current_size += self._token_size(block)
+                continue
+
+            block_size = self._token_size(block)
+            if current_size + block_size <= self.chunk_size:
+                current.append(block)
+                current_size += block_size
+                has_body = True
+                continue
+
+            if has_body:
+                flush()
+            if current_size + block_size <= self.chunk_size:
+                current.append(block)
+                current_size += block_size
+                has_body = True
+                continue
+
+            # 单个块超过块大小：表格按行拆分，段落按句子拆分，标题行放在第一块前面
+            pieces = self._split_table(block) if kind == TABLE else self._splitter.split_text(block)
+            for piece in pieces:
+                current.append(piece)
+                has_body = True
+                flush()
+        flush()
+        return chunks
+
+    def _parse_nodes(
+        self,
+        nodes: Sequence[BaseNode],
+        show_progress: bool = False,
+        **kwargs: Any,
+    ) -> List[BaseNode]:
+        all_nodes: List[BaseNode] = []
         for node in nodes:
-            # 确保metadata是字典类型
-            if not isinstance(node.metadata, dict):
-                node.metadata = {}
-            node.metadata["parser_type"] = "word"
-        
-        return nodes 
\ No newline at end of file
+            chunks = self.split_sections(node.get_content(metadata_mode=MetadataMode.NONE))
+            if not chunks:
+                continue
+            text_nodes = build_nodes_from_splits([chunk for chunk, _ in chunks], node, id_func=self.id_func)
+            for text_node, (_, header_stack) in zip(text_nodes, chunks):
+                # 确保metadata是字典类型
+                if not isinstance(text_node.metadata, dict):
+                    text_node.metadata = {}
+                if self.include_metadata:
+                    text_node.metadata.update(section_metadata(header_stack))
+                text_node.metadata["parser_type"] = "word"
+            all_nodes.extend(text_nodes)
+        return all_nodes
@@ -8,13 +8,52 @@ from llama_index.core.schema import NodeWithScore, QueryBundle
 from llama_index.core.response import Response
 from llama_index.core.retrievers import BaseRetriever
 from llama_index.core.postprocessor import SimilarityPostprocessor
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.storage.docstore.types import BaseDocumentStore
+from llama_index.core.bridge.pydantic import Field
 from llama_index.core.response_synthesizers import get_response_synthesizer
 from llama_index.core.callbacks import CallbackManager
 from config.config_rag import RETRIEVAL_CONFIG, QUERY_CONFIG
+from src.indices.section_index import SectionIndex
 import logging
 
 logger = logging.getLogger(__name__)
 
+class SectionExpansionPostprocessor(BaseNodePostprocessor):
+    """
+    章节扩展：把命中节点所在章节的其他节点按原文顺序插到命中节点之后，
+    通过章节锚点索引直接取得节点ID，不扫描节点。
+    """
+    
+    section_index: SectionIndex = Field(description="章节锚点索引")
+    docstore: BaseDocumentStore = Field(description="存放章节节点的文档存储")
+    max_nodes_per_hit: int = Field(default=5, description="每个命中节点最多补充的节点数")
+    include_subsections: bool = Field(default=False, description="是否同时补充子章节")
+    
+    @classmethod
+    def class_name(cls) -> str:
+        return "SectionExpansionPostprocessor"
+    
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        seen = {node.node.node_id for node in nodes}
+        expanded = []
+        for hit in nodes:
+            expanded.append(hit)
+            extra_ids = [node_id for node_id in self.section_index.expand(hit.node.node_id, self.include_subsections)
+                         if node_id not in seen][:self.max_nodes_per_hit]
+            seen.update(extra_ids)
+            for node in self.docstore.get_nodes(extra_ids, raise_error=False):
+                if node is not None:
+                    # 补充的节点沿用命中节点的分数
+                    expanded.append(NodeWithScore(node=node, score=hit.score))
+        if len(expanded) > len(nodes):
+            logger.info(f"章节扩展补充了 {len(expanded) - len(nodes)} 个节点")
+        return expanded
+
 class EnhancedQueryEngine(BaseQueryEngine):
     """
     增强的查询引擎，支持：
@@ -33,8 +72,11 @@ class EnhancedQueryEngine(BaseQueryEngine):
         similarity_cutoff: float = 0.7,
         rerank_top_k: int = 5,
         callback_manager: Optional[Any] = None,
+        section_expander: Optional[BaseNodePostprocessor] = None,
     ):
         self._retriever = retriever
+        # 章节扩展在重排序和截断之后执行，补充的节点不占用rerank_top_k名额
+        self._section_expander = section_expander
         
         # 确保response_synthesizer不为None
         if response_synthesizer is None:
@@ -215,6 +257,10 @@ class EnhancedQueryEngine(BaseQueryEngine):
         rerank_top_k = RETRIEVAL_CONFIG.get("rerank_top_k", 5)
         nodes = nodes[:rerank_top_k]
         
+        # 章节扩展（如果启用）
+        if self._section_expander is not None:
+            nodes = self._section_expander.postprocess_nodes(nodes, query_bundle)
+        
         logger.info(f"后处理后保留 {len(nodes)} 个节点")
         return nodes
     
@@ -256,6 +302,7 @@ class EnhancedQueryEngine(BaseQueryEngine):
 
 def create_enhanced_query_engine(
     index: VectorStoreIndex,
+    section_index: Optional[SectionIndex] = None,
     **kwargs
 ) -> EnhancedQueryEngine:
     """
@@ -263,6 +310,7 @@ def create_enhanced_query_engine(
     
     Args:
         index: 向量索引
+        section_index: 章节锚点索引，RETRIEVAL_CONFIG["expand_sections"]为True时用于章节扩展
         **kwargs: 额外参数
         
     Returns:
@@ -276,12 +324,23 @@ def create_enhanced_query_engine(
         similarity_top_k=config.get("similarity_top_k", 10)
     )
     
+    # 创建章节扩展
+    section_expander = None
+    if section_index is not None and config.get("expand_sections", False):
+        section_expander = SectionExpansionPostprocessor(
+            section_index=section_index,
+            docstore=index.docstore,
+            max_nodes_per_hit=config.get("section_expansion_max_nodes", 5),
+            include_subsections=config.get("section_expansion_include_subsections", False),
+        )
+    
     # 创建增强查询引擎
     query_engine = EnhancedQueryEngine(
         retriever=retriever,
         enable_reranking=config.get("enable_reranking", True),
         similarity_cutoff=config.get("similarity_cutoff", 0.7),
         rerank_top_k=config.get("rerank_top_k", 5),
+        section_expander=section_expander,
         **kwargs
     )
     
@@ -1,10 +1,17 @@
 from .data_cleaner_transform import DataCleanerTransform
-from .docs_summarizer_transform import DocsSummarizerTransform
+from .docs_summarizer_transform import DocsSummarizerTransform, SummaryError
+from .extractive_summarizer_transform import ExtractiveSummarizerTransform
+from .near_duplicate_transform import NearDuplicateTransform
+from .metadata_policy_transform import MetadataPolicyTransform
 from .document_url_normalizer_transform import DocumentURLNormalizerTransform
 from .category_extract import CategoryExtract
 __all__ = [
     "DataCleanerTransform",
     "DocsSummarizerTransform",
+    "SummaryError",
+    "ExtractiveSummarizerTransform",
+    "NearDuplicateTransform",
+    "MetadataPolicyTransform",
     "DocumentURLNormalizerTransform",
     "CategoryExtract"
 ]
@@ -1,10 +1,30 @@
 from llama_index.core.schema import TransformComponent
 from llama_index.core.bridge.pydantic import Field
+from typing import Optional
+import functools
 import os
 import re
 
 from src.utils import transform_logger
 
+# 类别文件名格式：类别_文件名.扩展名
+_CATEGORY_PATTERN = re.compile(r'^([^_]+)_.*')
+
+# 警告中最多列出的文件数
+_MAX_LISTED_FILES = 10
+
+
+@functools.lru_cache(maxsize=65536)
+def extract_category(file_name: str) -> Optional[str]:
+    """
+    从文件名中提取类别，无法提取时返回None
+
+    同一个文件切分出的所有节点文件名相同，结果按文件名缓存，每个文件只匹配一次。
+    """
+    category_match = _CATEGORY_PATTERN.match(os.path.basename(file_name))
+    return category_match.group(1) if category_match else None
+
+
 class CategoryExtract(TransformComponent):
     """
     从文件名中提取类别并将其存储在节点元数据中。
@@ -17,6 +37,9 @@ class CategoryExtract(TransformComponent):
         """
         transform_logger.info(f"正在处理 {len(nodes)} 个节点的类别提取")
         
+        # 本批涉及的文件及其类别，用于汇总日志
+        categories = {}
+        missing_file_name = 0
         for node in nodes:
             # 确保metadata是字典类型
             if not isinstance(node.metadata, dict):
@@ -24,19 +47,20 @@ class CategoryExtract(TransformComponent):
                 
             if 'file_name' in node.metadata:
                 file_name = node.metadata['file_name']
-                
-                # 尝试从文件名中提取类别（假设格式为：类别_文件名.扩展名）
-                category_match = re.match(r'^([^_]+)_.*', os.path.basename(file_name))
-                
-                if category_match:
-                    category = category_match.group(1)
+                category = extract_category(file_name)
+                categories[file_name] = category
+                if category is not None:
                     # 将类别添加到节点的元数据中
                     node.metadata['category'] = category
-                    transform_logger.debug(f"为文件 {file_name} 提取的类别: {category}")
-                else:
-                    transform_logger.warning(f"无法从文件 {file_name} 提取类别")
             else:
-                transform_logger.warning(f"节点缺少文件名元数据")
+                missing_file_name += 1
+        
+        failed = [file_name for file_name, category in categories.items() if category is None]
+        if failed:
+            listed = "，".join(failed[:_MAX_LISTED_FILES]) + ("等" if len(failed) > _MAX_LISTED_FILES else "")
+            transform_logger.warning(f"无法从 {len(failed)} 个文件提取类别: {listed}")
+        if missing_file_name:
+            transform_logger.warning(f"{missing_file_name} 个节点缺少文件名元数据")
                 
-        transform_logger.info(f"类别提取完成")
-        return nodes    
\ No newline at end of file
+        transform_logger.info(f"类别提取完成，共 {len(categories)} 个文件")
+        return nodes
@@ -1,14 +1,386 @@
 """
-数据清洗    
+数据清洗
+
+把启用的规则和Markdown围栏代码块（```、~~~）合并为一个预编译的正则（每条规则一个命名分组），
+每个文档只扫描一遍，按命中的分组决定替换内容：代码块只清理控制字符，删除整行后不留下多余的空行。
+可选的重复行规则需要先统计整篇文档，因此在正则扫描之前单独按行处理一次，
+只删除在分页位置（换页符、页码行前后）重复出现的页眉页脚。
+JSON、代码等结构化文件按扩展名识别，只清理控制字符。
+清洗结果汇总为报告（处理前后字节数、每条规则命中次数）。
 """
+import functools
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 
 from llama_index.core.schema import TransformComponent
-from llama_index.core.bridge.pydantic import Field
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
 
+from config.config_rag import CLEANING_CONFIG
 from src.utils import transform_logger
 
+# 单独成行的页码：第3页、第3页/共10页、- 3 -、Page 3 of 10
+_PAGE_NUMBER = (r'(?:第\s*\d+\s*页(?:\s*[/，,]?\s*共\s*\d+\s*页)?|[-–—]\s*\d+\s*[-–—]'
+                r'|[Pp]age\s+\d+(?:\s+of\s+\d+)?)')
+
+# 规则集：名称 → [(规则名, 正则, 替换内容)]，所有正则以 MULTILINE 模式编译
+RULE_SETS: Dict[str, List[Tuple[str, str, str]]] = {
+    # 控制字符、零宽字符和BOM（保留制表符和换行）
+    "control_chars": [
+        ("control_chars", r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f\u200b-\u200f\u2060\ufeff]+', ""),
+    ],
+    # 空白：合并连续空行，统一换行符（空行规则在前，\r\n结尾的空行也一次合并）
+    "whitespace": [
+        ("blank_lines", r'\r?\n(?:[ \t\u3000\xa0]*\r?\n){2,}', "\n\n"),
+        ("windows_newline", r'\r\n?', "\n"),
+    ],
+    # 行内空白：去掉行尾空白，合并行内连续空白（保留行首缩进）。
+    # 会去掉Markdown行尾两个空格的硬换行、合并对齐用的空格，默认不启用
+    "inline_whitespace": [
+        ("trailing_space", r'[ \t\u3000\xa0]+(?=\r?\n|\Z)', ""),
+        ("inner_space", r'(?<=\S)[ \t\u3000\xa0]{2,}(?=\S)', " "),
+    ],
+    # 分页残留：单独成行的页码（“1/2”这类可能是正文中的数值，不删除）
+    "page_artifacts": [
+        ("page_number", rf'^[ \t]*{_PAGE_NUMBER}[ \t]*(?:\n|$)', ""),
+    ],
+    # 法律声明：包含版权声明关键词的整行
+    "legal_notices": [
+        ("legal_notice", r'^[^\n]*(?:版权所有|保留所有权利|未经许可[^\n]*不得|All [Rr]ights [Rr]eserved'
+                         r'|Copyright\s*(?:©|\(c\))?\s*\d{4})[^\n]*(?:\n|$)', ""),
+    ],
+}
+
+# 不是正则规则、而是按行统计处理的规则集
+REPEATED_LINES = "repeated_lines"
+
+# Markdown围栏代码块：从开始围栏行到相同符号的结束围栏行（不含行尾换行），未闭合时延续到文末
+CODE_BLOCK = "code_block"
+_CODE_BLOCK_PATTERN = (r'^[ \t]*(?P<code_fence>```|~~~)[^\n]*(?s:.*?)'
+                       r'(?:\n[ \t]*(?P=code_fence)[^\n]*(?=\n|\Z)|\Z)')
+_CODE_BLOCK = re.compile(_CODE_BLOCK_PATTERN, re.MULTILINE)
+# Markdown围栏代码块的开始/结束行
+_FENCE = re.compile(r'^[ \t]*(```|~~~)')
+# 片段开头的空行
+_LEADING_BLANK_LINES = re.compile(r'(?:[ \t]*\n)+')
+# 结构化文件只应用的规则集
+STRUCTURED_RULE_SETS = ("control_chars",)
+
+# 重复行规则的分页标记：包含换页符的行、单独成行的页码
+_PAGE_NUMBER_LINE = re.compile(rf'[ \t]*{_PAGE_NUMBER}[ \t]*')
+# 不参与重复行统计的行：setext标题下划线和分隔线、列表项、短的键值行
+_SETEXT_OR_RULE = re.compile(r'(?:[-=_*][ \t]*){3,}')
+_LIST_ITEM = re.compile(r'(?:[-*+•]|\d+[.)、]|[a-zA-Z][.)])\s')
+_KEY_VALUE = re.compile(r'[^:：]{1,20}[:：]')
+
+
+@functools.lru_cache(maxsize=32)
+def compile_rules(rule_sets: Tuple[str, ...],
+                  custom_rules: Tuple[Tuple[str, str], ...] = (),
+                  code_blocks: bool = False) -> Tuple[Optional[re.Pattern], Dict[str, str]]:
+    """
+    把规则合并编译为一个正则
+
+    Args:
+        rule_sets: 启用的规则集
+        custom_rules: 自定义规则 (正则, 替换内容)
+        code_blocks: 是否加入匹配围栏代码块的分组（CODE_BLOCK），放在最前面，代码块整体不参与其他规则
+    Returns:
+        (合并后的正则, 分组名到替换内容的映射)，没有启用正则规则时正则为None
+    """
+    rules = []
+    for name in rule_sets:
+        if name == REPEATED_LINES:
+            continue
+        if name not in RULE_SETS:
+            raise ValueError(f"未知的清洗规则集: {name}")
+        rules.extend(RULE_SETS[name])
+    rules.extend((f"custom_{i}", pattern, replacement) for i, (pattern, replacement) in enumerate(custom_rules))
+    if not rules:
+        return None, {}
+
+    groups = {}
+    alternatives = [f"(?P<{CODE_BLOCK}>{_CODE_BLOCK_PATTERN})"] if code_blocks else []
+    for i, (name, pattern, replacement) in enumerate(rules):
+        group = f"g{i}_{name}"
+        groups[group] = replacement
+        alternatives.append(f"(?P<{group}>{pattern})")
+    return re.compile("|".join(alternatives), re.MULTILINE), groups
+
+
+def split_code_blocks(text: str) -> List[Tuple[bool, str]]:
+    """
+    按Markdown围栏代码块切分文本
+
+    Returns:
+        [(是否代码块, 片段)]，片段按顺序拼接等于原文；代码块包含开始和结束的围栏行，未闭合的围栏延续到文末
+    """
+    segments = []
+    start = 0
+    for match in _CODE_BLOCK.finditer(text):
+        end = match.end() + (text[match.end():match.end() + 1] == "\n")
+        if match.start() > start:
+            segments.append((False, text[start:match.start()]))
+        segments.append((True, text[match.start():end]))
+        start = end
+    if start < len(text):
+        segments.append((False, text[start:]))
+    return segments
+
+
+def _cleanable_lines(lines: List[str]) -> List[bool]:
+    """
+    每一行是否可以按重复行删除
+
+    围栏代码块内的行、围栏行、缩进代码行、标题（#标题、setext标题及其下划线）、分隔线、
+    表格行、列表项和短的键值行都不删除。
+    """
+    flags = []
+    fence = None
+    for i, line in enumerate(lines):
+        match = _FENCE.match(line)
+        if match and (fence is None or match.group(1) == fence):
+            fence = match.group(1) if fence is None else None
+            flags.append(False)
+            continue
+        stripped = line.strip()
+        next_line = lines[i + 1].strip() if i + 1 < len(lines) else ""
+        flags.append(fence is None
+                     and not line.startswith(("    ", "\t"))
+                     and not stripped.startswith(("|", "#"))
+                     and not _SETEXT_OR_RULE.fullmatch(stripped)
+                     # setext标题：下一行是 === 或 --- 下划线
+                     and not (stripped and _SETEXT_OR_RULE.fullmatch(next_line))
+                     and not _LIST_ITEM.match(stripped)
+                     and not _KEY_VALUE.match(stripped))
+    return flags
+
+
+def _page_boundary_lines(lines: List[str], window: int) -> set:
+    """
+    分页位置的行号：每个分页标记（换页符、单独成行的页码）前后各 window 个非空行，以及文档开头和结尾的 window 个非空行
+
+    没有分页标记时返回空集合。
+    """
+    markers = [i for i, line in enumerate(lines)
+               if "\f" in line or _PAGE_NUMBER_LINE.fullmatch(line)]
+    if not markers:
+        return set()
+    marker_set = set(markers)
+    boundary = set()
+
+    def collect(start: int, step: int) -> None:
+        found = 0
+        i = start
+        while 0 <= i < len(lines) and found < window and i not in marker_set:
+            if lines[i].strip():
+                boundary.add(i)
+                found += 1
+            i += step
+
+    collect(0, 1)
+    collect(len(lines) - 1, -1)
+    for i in markers:
+        if lines[i].strip("\f \t"):
+            # 换页符和页眉页脚在同一行
+            boundary.add(i)
+        collect(i - 1, -1)
+        collect(i + 1, 1)
+    return boundary
+
+
+def remove_repeated_lines(text: str, min_repeats: int, max_line_length: int, window: int = 1) -> Tuple[str, int]:
+    """
+    删除在分页位置重复出现至少 min_repeats 次的短行（页眉、页脚），保留第一次出现
+
+    分页位置见 _page_boundary_lines；正文中间重复出现的行（规格参数值、列表项等）不删除。
+    标题、分隔线、表格行、列表项、短的键值行和代码不参与统计，见 _cleanable_lines。
+
+    Returns:
+        (处理后的文本, 删除的行数)
+    """
+    lines = text.split("\n")
+    boundary = _page_boundary_lines(lines, window)
+    if not boundary:
+        return text, 0
+    cleanable = _cleanable_lines(lines)
+    candidates = {i: lines[i].strip("\f \t\u3000\xa0") for i in boundary if cleanable[i]}
+    counts = Counter(line for line in candidates.values() if line and len(line) <= max_line_length)
+    repeated = {line for line, count in counts.items() if count >= min_repeats}
+    if not repeated:
+        return text, 0
+    seen = set()
+    kept = []
+    removed = 0
+    for i, line in enumerate(lines):
+        stripped = candidates.get(i)
+        if stripped in repeated:
+            if stripped in seen:
+                removed += 1
+                # 换页符保留，后续的分页标记仍然可用
+                if "\f" in line:
+                    kept.append("\f")
+                continue
+            seen.add(stripped)
+        kept.append(line)
+    return "\n".join(kept), removed
+
+
+class CleaningReport:
+    """清洗统计"""
+
+    def __init__(self):
+        self.documents = 0
+        self.changed_documents = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.rule_hits: Counter = Counter()
+
+    @property
+    def bytes_removed(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def removed_ratio(self) -> float:
+        return self.bytes_removed / self.bytes_before if self.bytes_before else 0.0
+
+    def __str__(self) -> str:
+        hits = "，".join(f"{name} {count} 次" for name, count in self.rule_hits.most_common()) or "无"
+        return (f"清洗 {self.documents} 个文档（{self.changed_documents} 个有变化），"
+                f"{self.bytes_before} → {self.bytes_after} 字节，删除 {self.bytes_removed} 字节"
+                f"（{self.removed_ratio:.1%}）；规则命中: {hits}")
+
+
 class DataCleanerTransform(TransformComponent):
     """数据清洗"""
+
+    rule_sets: List[str] = Field(
+        default_factory=lambda: list(CLEANING_CONFIG.get("rule_sets", [])),
+        description='启用的规则集，见 RULE_SETS 和 repeated_lines'
+    )
+    custom_rules: List[Tuple[str, str]] = Field(
+        default_factory=lambda: [tuple(rule) for rule in CLEANING_CONFIG.get("custom_rules", [])],
+        description='自定义规则 (正则, 替换内容)'
+    )
+    repeated_line_min_count: int = Field(
+        default=CLEANING_CONFIG.get("repeated_line_min_count", 3),
+        description='重复行规则：出现至少多少次的行视为页眉页脚'
+    )
+    repeated_line_max_length: int = Field(
+        default=CLEANING_CONFIG.get("repeated_line_max_length", 80),
+        description='重复行规则：只统计不超过该长度的行'
+    )
+    repeated_line_window: int = Field(
+        default=CLEANING_CONFIG.get("repeated_line_window", 1),
+        description='重复行规则：分页标记前后各多少个非空行视为页眉页脚位置'
+    )
+
+    structured_file_types: List[str] = Field(
+        default_factory=lambda: list(CLEANING_CONFIG.get("structured_file_types", [])),
+        description='结构化文件的扩展名（JSON、代码等），这些文件只清理控制字符'
+    )
+
+    _report: Optional[CleaningReport] = PrivateAttr(default=None)
+
+    @property
+    def report(self) -> Optional[CleaningReport]:
+        """最近一次调用的清洗统计"""
+        return self._report
+
+    def is_structured(self, file_name: Optional[str]) -> bool:
+        """按扩展名判断是否为结构化文件"""
+        if not file_name:
+            return False
+        return os.path.splitext(file_name)[1].lower() in {ext.lower() for ext in self.structured_file_types}
+
+    def clean_text(self, text: str, report: Optional[CleaningReport] = None,
+                   file_name: Optional[str] = None) -> str:
+        """
+        按启用的规则清洗一段文本
+
+        Args:
+            text: 待清洗的文本
+            report: 累计命中次数的清洗报告
+            file_name: 文本所属的文件名，结构化文件只应用控制字符规则
+        """
+        def substitute(pattern, replacements, segment):
+            def replace(match):
+                group = match.lastgroup
+                if report is not None:
+                    report.rule_hits[group.split("_", 1)[1]] += 1
+                return replacements[group]
+            return pattern.sub(replace, segment)
+
+        # 代码（结构化文件、围栏代码块）只清理控制字符
+        code_rule_sets = tuple(name for name in self.rule_sets if name in STRUCTURED_RULE_SETS)
+        code_pattern, code_replacements = compile_rules(code_rule_sets)
+        if self.is_structured(file_name):
+            return substitute(code_pattern, code_replacements, text) if code_pattern is not None else text
+
+        if REPEATED_LINES in self.rule_sets:
+            text, removed = remove_repeated_lines(text, self.repeated_line_min_count,
+                                                  self.repeated_line_max_length, self.repeated_line_window)
+            if report is not None and removed:
+                report.rule_hits[REPEATED_LINES] += removed
+
+        pattern, replacements = compile_rules(tuple(self.rule_sets),
+                                              tuple(tuple(rule) for rule in self.custom_rules),
+                                              code_blocks=True)
+        if pattern is None:
+            return text
+
+        pieces = []
+        # 删除整行后输出末尾已经是段落分隔（或文档开头）时，跳过紧接着的空行，不留下多余的空行
+        skip_blank_lines = False
+
+        def emit(piece: str) -> None:
+            nonlocal skip_blank_lines
+            if skip_blank_lines:
+                blank = _LEADING_BLANK_LINES.match(piece)
+                if blank:
+                    piece = piece[blank.end():]
+                if not piece:
+                    return
+                skip_blank_lines = False
+            if piece:
+                pieces.append(piece)
+
+        position = 0
+        for match in pattern.finditer(text):
+            emit(text[position:match.start()])
+            position = match.end()
+            group = match.lastgroup
+            if group == CODE_BLOCK:
+                # 围栏代码块只清理控制字符
+                block = match.group()
+                emit(substitute(code_pattern, code_replacements, block) if code_pattern is not None else block)
+                continue
+            if report is not None:
+                report.rule_hits[group.split("_", 1)[1]] += 1
+            replacement = replacements[group]
+            emit(replacement)
+            deleted_line = (not replacement and match.group().endswith("\n")
+                            and (match.start() == 0 or text[match.start() - 1] == "\n"))
+            if deleted_line:
+                tail = "".join(pieces[-2:])
+                skip_blank_lines = not tail or tail.endswith("\n\n")
+        emit(text[position:])
+        return "".join(pieces)
+
     def __call__(self, nodes, **kwargs):
         transform_logger.info("开始数据清洗" + str(len(nodes)) + "条数据")
-        return nodes    
\ No newline at end of file
+        report = CleaningReport()
+        for node in nodes:
+            text = node.get_content()
+            metadata = node.metadata if isinstance(node.metadata, dict) else {}
+            cleaned = self.clean_text(text, report, metadata.get("file_name") or metadata.get("file_path"))
+            report.documents += 1
+            report.bytes_before += len(text.encode("utf-8"))
+            report.bytes_after += len(cleaned.encode("utf-8"))
+            if cleaned != text:
+                report.changed_documents += 1
+                node.set_content(cleaned)
+        self._report = report
+        transform_logger.info(str(report))
+        return nodes
@@ -1,96 +1,441 @@
 import asyncio
+import contextlib
+import json
+import re
 import traceback
+from typing import Any, Dict, List, Optional
 
 from llama_index.core.schema import TransformComponent
-from llama_index.core.bridge.pydantic import Field
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.constants import DEFAULT_CONTEXT_WINDOW
 from llama_index.core.response_synthesizers import TreeSummarize
 from src.models import LLMFactory, LLMProviderType
+from src.utils.async_utils import run_coroutine_sync
+from src.utils.rate_limiter import (RateLimiter, backoff_delay, estimate_tokens,
+                                    is_retryable_error, retry_after_seconds)
+from config.config_rag import SUMMARY_CONFIG
+
+# 长文档片段摘要（map阶段）使用的提示词
+SECTION_PROMPT = "这是一篇长文档中的一个片段。请用不超过100字概括这个片段的关键信息（如参数、结论、步骤），供后续合并成全文摘要。"
+
+# 多文档打包请求使用的提示词，{prompt} 为单篇文档的摘要要求
+PACK_PROMPT = ("下面有多篇相互独立的文档，每篇以 <document id=\"...\"> 开头、以 </document> 结尾。"
+               "请分别为每篇文档生成摘要，每篇的要求是：{prompt}\n"
+               "只输出一个JSON对象，键为文档id，值为该文档的摘要字符串，不要输出其他任何内容。")
+
+# 每篇文档在打包请求中的标签和JSON输出开销（token）
+PACK_DOC_OVERHEAD_TOKENS = 30
+
+_JSON_OBJECT = re.compile(r'\{.*\}', re.S)
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[。！？；!?;\n])')
+
+
+def split_text_by_tokens(text: str, max_tokens: int) -> List[str]:
+  """按句子边界把文本切成不超过 max_tokens 的片段，超长句子按字符硬切"""
+  sections, current, current_tokens = [], [], 0
+  for piece in _SENTENCE_BOUNDARY.split(text):
+    if not piece:
+      continue
+    piece_tokens = estimate_tokens(piece)
+    if piece_tokens > max_tokens:
+      if current:
+        sections.append("".join(current))
+        current, current_tokens = [], 0
+      # 每个字符至多计1个token，按字符数切分一定不超过预算
+      sections.extend(piece[i:i + max_tokens] for i in range(0, len(piece), max_tokens))
+      continue
+    if current and current_tokens + piece_tokens > max_tokens:
+      sections.append("".join(current))
+      current, current_tokens = [], 0
+    current.append(piece)
+    current_tokens += piece_tokens
+  if current:
+    sections.append("".join(current))
+  return sections
+
+def parse_packed_summaries(response: str, node_ids: List[str]) -> Dict[str, str]:
+  """
+  解析打包请求的回复，只返回请求中存在且摘要为非空字符串的条目；
+  回复不是合法JSON对象时返回空字典
+  """
+  match = _JSON_OBJECT.search(response or "")
+  if not match:
+    return {}
+  try:
+    data = json.loads(match.group(0))
+  except json.JSONDecodeError:
+    return {}
+  if not isinstance(data, dict):
+    return {}
+  wanted = set(node_ids)
+  return {
+    str(key): value.strip() for key, value in data.items()
+    if str(key) in wanted and isinstance(value, str) and value.strip()
+  }
+
+class SummaryError(RuntimeError):
+  """重试后仍有节点摘要失败
+
+  由 IngestionPipeline 调用时抛出异常，管道不会缓存这些没有摘要的节点。
+  """
+
+  def __init__(self, failed_nodes, message: Optional[str] = None):
+    self.failed_nodes = list(failed_nodes)
+    super().__init__(message or f"{len(self.failed_nodes)} 个节点摘要失败")
 
 class DocsSummarizerTransform(TransformComponent):
-  """对当前文档页面进行摘要。"""
+  """对当前文档页面进行摘要。
+
+  并发数受 max_concurrency 限制，请求按每分钟请求数和token数限流；
+  遇到429/5xx或超时按带抖动的指数退避重试，最终失败的节点记录在 failed_nodes 中，
+  默认抛出 SummaryError（见 raise_on_failure），由调用方重试。
+  生成的摘要按 文本+提示词+模型+max_tokens 的哈希持久化缓存，文本未变化时直接复用。
+  超出模型上下文的长文档按 map-reduce 方式分段并发摘要后再合并；
+  开启 pack_documents 时多篇短文档合并为一次请求，按节点ID返回JSON格式的摘要。
+  """
 
+  max_concurrency: int = Field(
+    default=SUMMARY_CONFIG.get("max_concurrency", 8),
+    description='同时进行的摘要请求数上限'
+  )
+  requests_per_minute: Optional[float] = Field(
+    default=SUMMARY_CONFIG.get("requests_per_minute"),
+    description='每分钟最多发起的请求数，None表示不限制'
+  )
+  tokens_per_minute: Optional[float] = Field(
+    default=SUMMARY_CONFIG.get("tokens_per_minute"),
+    description='每分钟最多消耗的token数，None表示不限制'
+  )
+  max_retries: int = Field(
+    default=SUMMARY_CONFIG.get("max_retries", 4),
+    description='可重试错误的最大重试次数'
+  )
+  timeout: Optional[float] = Field(
+    default=SUMMARY_CONFIG.get("timeout", 60),
+    description='单个节点摘要请求的超时（秒）'
+  )
+  max_input_tokens: Optional[int] = Field(
+    default=SUMMARY_CONFIG.get("max_input_tokens"),
+    description='单次摘要请求的输入token上限，None表示按LLM上下文窗口推算'
+  )
+  pack_documents: bool = Field(
+    default=SUMMARY_CONFIG.get("pack_documents", False),
+    description='是否把多篇短文档打包到一次请求中'
+  )
+  pack_max_tokens: int = Field(
+    default=SUMMARY_CONFIG.get("pack_max_tokens", 2000),
+    description='一次打包请求的输入token上限'
+  )
+  pack_max_docs: int = Field(
+    default=SUMMARY_CONFIG.get("pack_max_docs", 10),
+    description='一次打包请求最多包含的文档数'
+  )
+  pack_doc_max_tokens: int = Field(
+    default=SUMMARY_CONFIG.get("pack_doc_max_tokens", 500),
+    description='参与打包的单篇文档token上限，更长的文档单独请求'
+  )
+  use_cache: bool = Field(
+    default=True,
+    description='是否使用持久化摘要缓存（还需SUMMARY_CACHE_CONFIG启用）'
+  )
+  raise_on_failure: bool = Field(
+    default=True,
+    description='重试后仍有节点摘要失败时抛出 SummaryError，避免管道缓存没有摘要的结果；为False时照常返回节点'
+  )
 
-  async def generate_summary(self, node, summarizer, prompt):
-      print(f"===== 开始获取节点 {node.id_} 的摘要 =====")
+  _rate_limiter: Optional[RateLimiter] = PrivateAttr(default=None)
+  _failed_nodes: List = PrivateAttr(default_factory=list)
+  _summary_cache: Optional[Any] = PrivateAttr(default=None)
+  _cache_loaded: bool = PrivateAttr(default=False)
+  _input_budget: Optional[int] = PrivateAttr(default=None)
+
+  @property
+  def failed_nodes(self) -> List:
+    """最近一次调用中摘要失败的节点"""
+    return self._failed_nodes
+
+  def _get_rate_limiter(self) -> RateLimiter:
+    # 限流器在多个批次之间共享，额度按整个摄入过程计算
+    if self._rate_limiter is None:
+      self._rate_limiter = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+    return self._rate_limiter
+
+  def _get_summary_cache(self):
+    if not self.use_cache:
+      return None
+    if not self._cache_loaded:
+      # 延迟导入，避免 src.transformations 与 src.data_ingestion 循环导入
+      from src.data_ingestion.cache import create_summary_cache
+      self._summary_cache = create_summary_cache()
+      self._cache_loaded = True
+    return self._summary_cache
+
+  def _get_input_budget(self, prompt) -> int:
+    """单次请求可容纳的正文token数"""
+    budget = self._input_budget or self._resolve_input_budget(None, SUMMARY_CONFIG.get("max_tokens", 100))
+    return max(256, budget - estimate_tokens(prompt))
+
+  async def _call_with_retry(self, label, make_call, tokens, semaphore=None) -> str:
+    """执行一次LLM请求，可重试的错误按退避重试，最终失败时抛出异常"""
+    limiter = self._get_rate_limiter()
+    for attempt in range(self.max_retries + 1):
       try:
-          summary = await summarizer.aget_response(prompt, [node.text])
-          print(f"节点 {node.id_} 摘要生成成功: {summary[:50]}...")
-          # 确保metadata是字典类型
-          if not isinstance(node.metadata, dict):
-              node.metadata = {}
-          node.metadata['summary'] = summary
+        # 只在请求期间占用并发名额，退避等待时释放
+        async with (semaphore or contextlib.nullcontext()):
+          await limiter.acquire(tokens)
+          response = await asyncio.wait_for(make_call(), timeout=self.timeout)
+        return str(response)
       except Exception as e:
-          print(f"节点 {node.id_} 摘要生成失败: {str(e)}")
-          # 记录完整堆栈信息
-          traceback.print_exc()
-  
-  async def process_nodes(self, nodes, summarizer, prompt):
-    print(f"===== 开始处理 {len(nodes)} 个节点的摘要 =====")
-    tasks = []
+        if attempt < self.max_retries and is_retryable_error(e):
+          delay = retry_after_seconds(e) or backoff_delay(
+            attempt, SUMMARY_CONFIG.get("backoff_base", 1.0), SUMMARY_CONFIG.get("backoff_max", 30.0)
+          )
+          print(f"{label} 摘要请求失败（第 {attempt + 1} 次）: {type(e).__name__} {e}，"
+                f"{delay:.1f} 秒后重试")
+          await asyncio.sleep(delay)
+          continue
+        raise
+
+  async def _request(self, label, summarizer, prompt, text, semaphore=None) -> str:
+    """对一段文本发起一次摘要请求"""
+    tokens = estimate_tokens(prompt) + estimate_tokens(text) + SUMMARY_CONFIG.get("max_tokens", 100)
+    return await self._call_with_retry(
+      label, lambda: summarizer.aget_response(prompt, [text]), tokens, semaphore
+    )
+
+  async def _summarize_sections(self, label, summarizer, sections, semaphore=None) -> str:
+    """并发摘要各个片段，返回合并后的片段摘要"""
+    partials = await asyncio.gather(
+      *(self._request(f"{label}#{i}", summarizer, SECTION_PROMPT, section, semaphore)
+        for i, section in enumerate(sections))
+    )
+    return "\n\n".join(partials)
+
+  async def summarize_text(self, label, summarizer, prompt, text, semaphore=None) -> str:
+    """
+    生成文本摘要，按长度自动选择路径：
+    能放进单次请求的文本直接摘要；超长文本先按token预算切成片段并发摘要（map），
+    再对片段摘要做摘要（reduce），片段摘要仍然超长时逐层归并。
+    """
+    budget = self._get_input_budget(prompt)
+    text_tokens = estimate_tokens(text)
+    if text_tokens <= budget:
+      return await self._request(label, summarizer, prompt, text, semaphore)
+
+    section_budget = self._get_input_budget(SECTION_PROMPT)
+    sections = split_text_by_tokens(text, section_budget)
+    print(f"{label} 约 {text_tokens} tokens，超出单次请求上限 {budget}，拆分为 {len(sections)} 个片段并发摘要")
+    combined = await self._summarize_sections(label, summarizer, sections, semaphore)
+
+    while estimate_tokens(combined) > budget:
+      groups = split_text_by_tokens(combined, section_budget)
+      reduced = await self._summarize_sections(label, summarizer, groups, semaphore)
+      if estimate_tokens(reduced) >= estimate_tokens(combined):
+        # 片段摘要不再缩短，截断到预算内避免无限归并
+        combined = split_text_by_tokens(reduced, budget)[0]
+        break
+      combined = reduced
+    return await self._request(label, summarizer, prompt, combined, semaphore)
+
+  async def generate_summary(self, node, summarizer, prompt, semaphore=None) -> bool:
+    """生成单个节点的摘要，返回是否成功"""
+    print(f"===== 开始获取节点 {node.id_} 的摘要 =====")
+    # 确保metadata是字典类型
+    if not isinstance(node.metadata, dict):
+      node.metadata = {}
+    try:
+      summary = await self.summarize_text(f"节点 {node.id_}", summarizer, prompt, node.text, semaphore)
+    except Exception as e:
+      print(f"节点 {node.id_} 摘要生成失败: {type(e).__name__} {e}")
+      return False
+    print(f"节点 {node.id_} 摘要生成成功: {summary[:50]}...")
+    node.metadata['summary'] = summary
+    return True
+
+  def _plan_packs(self, nodes, prompt):
+    """把短文档按token预算和文档数上限分组，返回 (打包组列表, 需要单独请求的节点)"""
+    budget = min(self.pack_max_tokens, self._get_input_budget(PACK_PROMPT.format(prompt=prompt)))
+    packs, singles, current, current_tokens = [], [], [], 0
     for node in nodes:
-      task = asyncio.create_task(
-         self.generate_summary(node, summarizer, prompt)
-      )
-      tasks.append(task)
-    print(f"创建了 {len(tasks)} 个异步任务")
+      tokens = estimate_tokens(node.text) + PACK_DOC_OVERHEAD_TOKENS
+      if tokens > self.pack_doc_max_tokens or tokens > budget:
+        singles.append(node)
+        continue
+      if current and (current_tokens + tokens > budget or len(current) >= self.pack_max_docs):
+        packs.append(current)
+        current, current_tokens = [], 0
+      current.append(node)
+      current_tokens += tokens
+    if current:
+      packs.append(current)
+    # 只有一个文档的组没有打包收益
+    singles.extend(pack[0] for pack in packs if len(pack) == 1)
+    return [pack for pack in packs if len(pack) > 1], singles
+
+  async def _summarize_pack(self, nodes, llm, prompt, semaphore=None):
+    """
+    一次请求为多篇短文档生成摘要，返回未能从回复中解析出摘要的节点
+    """
+    documents = "\n".join(f'<document id="{node.id_}">\n{node.text}\n</document>' for node in nodes)
+    request = PACK_PROMPT.format(prompt=prompt) + "\n\n" + documents
+    tokens = estimate_tokens(request) + SUMMARY_CONFIG.get("max_tokens", 100) * len(nodes)
+    label = f"打包请求({len(nodes)} 个节点)"
     try:
-        await asyncio.gather(*tasks)
-        print("所有摘要任务已完成")
+      response = await self._call_with_retry(label, lambda: llm.acomplete(request), tokens, semaphore)
     except Exception as e:
-        print(f"处理节点摘要时发生错误: {str(e)}")
-        traceback.print_exc()
-  
-  
+      print(f"{label} 失败，改为逐个请求: {type(e).__name__} {e}")
+      return list(nodes)
+
+    summaries = parse_packed_summaries(response, [node.id_ for node in nodes])
+    leftovers = []
+    for node in nodes:
+      if not isinstance(node.metadata, dict):
+        node.metadata = {}
+      summary = summaries.get(node.id_)
+      if summary:
+        node.metadata['summary'] = summary
+      else:
+        leftovers.append(node)
+    print(f"{label} 完成，解析出 {len(nodes) - len(leftovers)} 个摘要，{len(leftovers)} 个改为逐个请求")
+    return leftovers
+
+  async def process_nodes(self, nodes, summarizer, prompt, model=None, max_tokens=None, packing_llm=None):
+    """并发生成摘要，返回失败的节点
+
+    提供 model 时按 文本+提示词+模型+max_tokens 查询和写入摘要缓存；
+    提供 packing_llm 时短文档先打包请求，回复无法解析的文档再逐个请求。
+    标记为近似重复（metadata["duplicate_of"]）的节点不请求LLM，代表节点在同一批中时复用它的摘要
+    """
+    print(f"===== 开始处理 {len(nodes)} 个节点的摘要（并发上限 {self.max_concurrency}） =====")
+    semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+    cache = self._get_summary_cache() if model is not None else None
+
+    cache_keys = {}
+    pending = []
+    linked = []
+    for node in nodes:
+      if not isinstance(node.metadata, dict):
+        node.metadata = {}
+      if node.metadata.get("duplicate_of"):
+        linked.append(node)
+        continue
+      if cache is not None:
+        cache_keys[node.id_] = cache.make_key(node.text, prompt, model, max_tokens)
+        cached = cache.get(cache_keys[node.id_])
+        if cached is not None:
+          node.metadata['summary'] = cached
+          continue
+      pending.append(node)
+
+    if packing_llm is not None and len(pending) > 1:
+      packs, singles = self._plan_packs(pending, prompt)
+      if packs:
+        leftovers = await asyncio.gather(
+          *(self._summarize_pack(pack, packing_llm, prompt, semaphore) for pack in packs)
+        )
+        retry_ids = {node.id_ for group in leftovers for node in group} | {node.id_ for node in singles}
+        done = [node for pack in packs for node in pack if node.id_ not in retry_ids]
+        if cache is not None:
+          for node in done:
+            cache.put(cache_keys[node.id_], node.metadata['summary'])
+        pending = [node for node in pending if node.id_ in retry_ids]
+
+    results = await asyncio.gather(
+      *(self.generate_summary(node, summarizer, prompt, semaphore) for node in pending)
+    )
+    if cache is not None:
+      for node, ok in zip(pending, results):
+        if ok:
+          cache.put(cache_keys[node.id_], node.metadata['summary'])
+    failed = [node for node, ok in zip(pending, results) if not ok]
+
+    if linked:
+      summaries = {node.id_: node.metadata.get('summary') for node in nodes}
+      for node in linked:
+        summary = summaries.get(node.metadata["duplicate_of"])
+        if summary:
+          node.metadata['summary'] = summary
+      print(f"跳过 {len(linked)} 个近似重复节点的摘要请求")
+    print(f"所有摘要任务已完成，成功 {len(nodes) - len(linked) - len(failed)} 个，失败 {len(failed)} 个")
+    return failed
+
+
   def __call__(self, nodes, **kwargs):
     print('===== DocsSummarizerTransform.__call__ 开始执行 =====')
     print(f"接收到 {len(nodes)} 个节点进行处理")
-    # 创建新的事件循环并在其中运行异步任务
     try:
-      loop = asyncio.get_event_loop()
-      print(f"获取到事件循环: {loop}")
-      # 如果当前线程没有事件循环或事件循环已关闭
-      if loop.is_closed():
-        print("当前事件循环已关闭，创建新的事件循环")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-      # 在事件循环中运行异步方法
-      print("准备执行异步摘要生成操作...")
-      result = loop.run_until_complete(self.acall(nodes, **kwargs))
+      # 在异步环境中应直接 await acall；同步调用时在独立的事件循环中运行
+      result = run_coroutine_sync(self.acall(nodes, **kwargs))
       print("异步摘要生成操作已完成")
       return result
-    except Exception as e:
-      print(f"===== 摘要生成过程中出错: {str(e)} =====")
-      # 打印详细的堆栈跟踪
-      traceback.print_exc()
-      # 出错时也要返回节点，确保流程不中断
-      return nodes
     finally:
       print('===== DocsSummarizerTransform.__call__ 执行完毕 =====')
 
+  def _resolve_input_budget(self, llm, max_tokens) -> int:
+    """根据LLM上下文窗口扣除输出和提示模板余量，得到单次请求的输入token上限"""
+    context_window = getattr(getattr(llm, "metadata", None), "context_window", None)
+    if not isinstance(context_window, int) or context_window <= 0:
+      context_window = DEFAULT_CONTEXT_WINDOW
+    budget = context_window - max_tokens - 256
+    if self.max_input_tokens:
+      budget = min(budget, self.max_input_tokens)
+    return budget
+
   async def acall(self, nodes, **kwargs):
     print("===== DocsSummarizerTransform.acall 开始执行 =====")
     try:
       print("初始化 TreeSummarize...")
-      summarizer = TreeSummarize(
-        verbose=True,
-        llm=LLMFactory.create_llm(LLMProviderType.QIANWENOPENAI,temperature=0.5,max_tokens=100)
+      max_tokens = SUMMARY_CONFIG.get("max_tokens", 100)
+      # 重试由本转换统一控制（退避、限流），关闭客户端自身的重试
+      llm = LLMFactory.create_llm(
+        LLMProviderType.QIANWENOPENAI,
+        temperature=SUMMARY_CONFIG.get("temperature", 0.5),
+        max_tokens=max_tokens,
+        max_retries=0
       )
+      summarizer = TreeSummarize(verbose=True, llm=llm)
+      self._input_budget = self._resolve_input_budget(llm, max_tokens)
       print("TreeSummarize 初始化完成")
 
       SUMMARY_PROMPT = "给我一个不超过100字的简短摘要。这里有很多页面，这只是其中一个。这个100字的摘要必须简明扼要地涵盖这个特定文档页面中讨论的所有内容，以便阅读这个简短摘要的人能够全面了解如果他们阅读整个页面将会学到什么。"
 
-      # 获取事件循环
-      # 运行直到完成
-      #   self.process_nodes(nodes, summarizer, SUMMARY_PROMPT)
-      # )
       print("开始异步处理节点...")
-      await self.process_nodes(nodes, summarizer, SUMMARY_PROMPT)
+      cache = self._get_summary_cache()
+      if cache is not None:
+        cache.reset_stats()
+      model = getattr(llm, "model", None) or getattr(llm, "model_name", None)
+      packing_llm = None
+      if self.pack_documents:
+        # 打包请求需要为每篇文档留出输出空间
+        packing_llm = LLMFactory.create_llm(
+          LLMProviderType.QIANWENOPENAI,
+          temperature=SUMMARY_CONFIG.get("temperature", 0.5),
+          max_tokens=max_tokens * self.pack_max_docs + PACK_DOC_OVERHEAD_TOKENS * self.pack_max_docs,
+          max_retries=0
+        )
+      self._failed_nodes = await self.process_nodes(nodes, summarizer, SUMMARY_PROMPT,
+                                                    model=str(model), max_tokens=max_tokens,
+                                                    packing_llm=packing_llm)
+      if cache is not None:
+        print(f"摘要缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+      if self._failed_nodes:
+        print(f"{len(self._failed_nodes)} 个节点摘要失败，已记录在 failed_nodes 中: "
+              f"{[node.id_ for node in self._failed_nodes]}")
+        if self.raise_on_failure:
+          raise SummaryError(self._failed_nodes)
       print("节点处理完成")
 
       return nodes
+    except SummaryError:
+      raise
     except Exception as e:
       print(f"acall 方法执行过程中出错: {str(e)}")
       traceback.print_exc()
-      raise
+      self._failed_nodes = list(nodes)
+      if self.raise_on_failure:
+        raise SummaryError(nodes, f"摘要生成出错: {e}") from e
+      # 不抛出异常时返回节点，确保流程不中断
+      return nodes
     finally:
-      print("===== DocsSummarizerTransform.acall 执行完毕 =====")
\ No newline at end of file
+      print("===== DocsSummarizerTransform.acall 执行完毕 =====")
@@ -1,3 +1,4 @@
+import functools
 from os.path import relpath, splitext
 
 from llama_index.core.schema import TransformComponent
@@ -9,6 +10,13 @@ from src.utils import transform_logger
 文档路径进行标准化： 比如"c:/aaa/bbb/data/docs/example.md" 转换为 "data/example.md"
 """
 
+
+@functools.lru_cache(maxsize=65536)
+def normalize_file_path(file_path: str, docs_path: str) -> str:
+  """计算相对docs_path、去掉扩展名的路径，按路径缓存，同一个文件的节点只计算一次"""
+  return splitext(relpath(file_path, docs_path))[0]
+
+
 class DocumentURLNormalizerTransform(TransformComponent):
 
   data_path: str = Field(
@@ -17,12 +25,15 @@ class DocumentURLNormalizerTransform(TransformComponent):
   )
 
   def __call__(self, nodes, **kwargs):
+    docs_path = self.data_path + "/docs"
+    file_paths = set()
     for node in nodes:
       # 确保metadata是字典类型
       if not isinstance(node.metadata, dict):
           node.metadata = {}
       # 确保file_path键存在
       if 'file_path' in node.metadata:
-        node.metadata["file_path"], _ = splitext(relpath(node.metadata['file_path'], self.data_path+"/docs"))
-        transform_logger.debug("文档路径标准化完成  " + node.metadata["file_path"])
-    return nodes
\ No newline at end of file
+        node.metadata["file_path"] = normalize_file_path(node.metadata['file_path'], docs_path)
+        file_paths.add(node.metadata["file_path"])
+    transform_logger.debug(f"文档路径标准化完成，{len(nodes)} 个节点，{len(file_paths)} 个文件")
+    return nodes
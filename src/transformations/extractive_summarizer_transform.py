@@ -0,0 +1,126 @@
+"""
+抽取式摘要：不调用LLM，从原文中挑选最有代表性的句子作为摘要。
+
+句子向量使用TF-IDF（中日韩文本用字符二元组，其他文本用单词），
+句子之间的余弦相似度构成图，用TextRank（PageRank幂迭代）为句子打分，
+按原文顺序拼接得分最高的句子，直到达到摘要长度上限。
+"""
+import asyncio
+import re
+from typing import Dict, List
+
+import numpy as np
+from llama_index.core.schema import TransformComponent
+from llama_index.core.bridge.pydantic import Field
+
+from src.utils import transform_logger
+
+_SENTENCE_END = re.compile(r'(?<=[。！？；!?;])\s*|\n+')
+_CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+')
+_WORD = re.compile(r'[A-Za-z][A-Za-z0-9_\-]*|\d+(?:\.\d+)?')
+
+
+def split_sentences(text: str) -> List[str]:
+  """按中英文句末标点和换行切分句子"""
+  return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence and sentence.strip()]
+
+
+def _terms(sentence: str) -> List[str]:
+  terms = [word.lower() for word in _WORD.findall(sentence)]
+  for run in _CJK_RUN.findall(sentence):
+    # 中文没有空格分词，使用字符二元组；单字片段保留单字
+    terms.extend(run[i:i + 2] for i in range(max(len(run) - 1, 1)))
+  return terms
+
+
+def textrank_scores(sentences: List[str], damping: float = 0.85, iterations: int = 50) -> np.ndarray:
+  """计算每个句子的TextRank得分"""
+  n = len(sentences)
+  if n == 0:
+    return np.zeros(0)
+  vocab: Dict[str, int] = {}
+  rows, cols = [], []
+  for i, sentence in enumerate(sentences):
+    for term in _terms(sentence):
+      rows.append(i)
+      cols.append(vocab.setdefault(term, len(vocab)))
+  if not vocab:
+    return np.full(n, 1.0 / n)
+
+  tf = np.zeros((n, len(vocab)), dtype=np.float32)
+  np.add.at(tf, (rows, cols), 1.0)
+  df = np.count_nonzero(tf, axis=0)
+  tfidf = tf * (np.log((1 + n) / (1 + df)) + 1.0)
+  norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+  tfidf /= np.where(norms == 0, 1.0, norms)
+
+  similarity = tfidf @ tfidf.T
+  np.fill_diagonal(similarity, 0.0)
+  row_sums = similarity.sum(axis=1, keepdims=True)
+  # 与其他句子都不相似的句子均匀分配权重
+  transition = np.where(row_sums > 0, similarity / np.where(row_sums == 0, 1.0, row_sums), 1.0 / n)
+
+  scores = np.full(n, 1.0 / n, dtype=np.float32)
+  for _ in range(iterations):
+    updated = (1 - damping) / n + damping * (transition.T @ scores)
+    if np.abs(updated - scores).sum() < 1e-6:
+      scores = updated
+      break
+    scores = updated
+  return scores
+
+
+def extractive_summary(text: str, max_chars: int = 100, max_sentences: int = 200) -> str:
+  """
+  生成抽取式摘要
+
+  Args:
+    text: 原文
+    max_chars: 摘要最大字符数
+    max_sentences: 参与打分的最多句子数（取前面的句子，限制超长文档的计算量）
+  """
+  sentences = split_sentences(text)[:max_sentences]
+  if not sentences:
+    return ""
+  if len(sentences) == 1:
+    return sentences[0][:max_chars]
+
+  scores = textrank_scores(sentences)
+  # 重复出现的句子（如页眉、声明）只保留一次，按第一次出现的位置排序
+  first_index = {}
+  for index, sentence in enumerate(sentences):
+    first_index.setdefault(sentence, index)
+  selected, length = set(), 0
+  for index in np.argsort(-scores, kind="stable"):
+    sentence = sentences[index]
+    if first_index[sentence] in selected or length + len(sentence) > max_chars:
+      continue
+    selected.add(first_index[sentence])
+    length += len(sentence)
+  if not selected:
+    # 最好的句子也超过上限时截断使用
+    return sentences[int(np.argmax(scores))][:max_chars]
+  return "".join(sentences[i] for i in sorted(selected))
+
+
+class ExtractiveSummarizerTransform(TransformComponent):
+  """抽取式文档摘要，完全离线运行，输出与 DocsSummarizerTransform 相同的 metadata['summary'] 字段。"""
+
+  max_chars: int = Field(
+    default=100,
+    description='摘要最大字符数'
+  )
+
+  def __call__(self, nodes, **kwargs):
+    transform_logger.info(f"开始为 {len(nodes)} 个节点生成抽取式摘要")
+    for node in nodes:
+      # 确保metadata是字典类型
+      if not isinstance(node.metadata, dict):
+        node.metadata = {}
+      node.metadata['summary'] = extractive_summary(node.text, self.max_chars)
+    transform_logger.info("抽取式摘要生成完成")
+    return nodes
+
+  async def acall(self, nodes, **kwargs):
+    # 打分是CPU计算，放到线程中执行，不阻塞事件循环
+    return await asyncio.to_thread(self.__call__, nodes, **kwargs)
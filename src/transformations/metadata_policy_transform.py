@@ -0,0 +1,84 @@
+"""
+元数据策略
+
+LlamaIndex 默认把节点的全部元数据拼进嵌入文本和LLM上下文。摘要、文件路径等字段在同一文档的
+所有节点上完全相同，每个节点都带上会白白增加嵌入token和回答生成的提示词长度。
+元数据策略为每个键指定它进入哪里：
+    all   嵌入文本和LLM上下文
+    embed 只进入嵌入文本
+    llm   只进入LLM上下文
+    none  都不进入（仍保留在metadata中，可用于过滤和展示）
+通过节点的 excluded_embed_metadata_keys / excluded_llm_metadata_keys 生效，未列出的键保持不变。
+"""
+from typing import Dict, Literal
+
+from llama_index.core.schema import MetadataMode, TransformComponent
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+from config.config_rag import METADATA_CONFIG
+from src.utils import transform_logger
+from src.utils.rate_limiter import estimate_tokens
+
+MetadataTarget = Literal["all", "embed", "llm", "none"]
+
+
+class MetadataPolicyReport:
+    """元数据策略统计：应用前后嵌入文本和LLM上下文中元数据部分的估算token数"""
+
+    def __init__(self):
+        self.nodes = 0
+        self.embed_tokens_before = 0
+        self.embed_tokens_after = 0
+        self.llm_tokens_before = 0
+        self.llm_tokens_after = 0
+
+    @property
+    def embed_tokens_saved(self) -> int:
+        return self.embed_tokens_before - self.embed_tokens_after
+
+    @property
+    def llm_tokens_saved(self) -> int:
+        return self.llm_tokens_before - self.llm_tokens_after
+
+    def __str__(self) -> str:
+        return (f"{self.nodes} 个节点的元数据：嵌入 {self.embed_tokens_before} → {self.embed_tokens_after} tokens"
+                f"（节省 {self.embed_tokens_saved}），LLM上下文 {self.llm_tokens_before} → {self.llm_tokens_after} tokens"
+                f"（节省 {self.llm_tokens_saved}）")
+
+
+def _set_excluded(keys: list, key: str, excluded: bool) -> None:
+    if excluded and key not in keys:
+        keys.append(key)
+    elif not excluded and key in keys:
+        keys.remove(key)
+
+
+class MetadataPolicyTransform(TransformComponent):
+    """按元数据策略设置节点的嵌入和LLM排除键"""
+
+    policy: Dict[str, MetadataTarget] = Field(
+        default_factory=lambda: dict(METADATA_CONFIG.get("policy", {})),
+        description='元数据键 → all / embed / llm / none'
+    )
+
+    _report: MetadataPolicyReport = PrivateAttr(default_factory=MetadataPolicyReport)
+
+    @property
+    def report(self) -> MetadataPolicyReport:
+        """最近一次调用的统计"""
+        return self._report
+
+    def __call__(self, nodes, **kwargs):
+        report = MetadataPolicyReport()
+        for node in nodes:
+            report.nodes += 1
+            report.embed_tokens_before += estimate_tokens(node.get_metadata_str(MetadataMode.EMBED))
+            report.llm_tokens_before += estimate_tokens(node.get_metadata_str(MetadataMode.LLM))
+            for key, target in self.policy.items():
+                _set_excluded(node.excluded_embed_metadata_keys, key, target not in ("all", "embed"))
+                _set_excluded(node.excluded_llm_metadata_keys, key, target not in ("all", "llm"))
+            report.embed_tokens_after += estimate_tokens(node.get_metadata_str(MetadataMode.EMBED))
+            report.llm_tokens_after += estimate_tokens(node.get_metadata_str(MetadataMode.LLM))
+        self._report = report
+        transform_logger.info(str(report))
+        return nodes
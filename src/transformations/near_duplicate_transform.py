@@ -0,0 +1,349 @@
+"""
+近似重复检测
+
+用MinHash签名估计文本之间的Jaccard相似度（字符n-gram分片，中文不需要分词），
+再用LSH分段（banding）把每段签名相同的文本放进同一个桶，只比较同桶的候选，
+不需要两两比较所有文本。检测到的重复按配置丢弃或标记 metadata['duplicate_of']，
+放在摘要之前，同一份资料的多个版本只摘要、切分和嵌入一次。
+
+同一个实例会记住已经处理过的文本，管道分批运行时也能跨批次检测重复；
+seed 可以预先加入已摄入文档的签名（见 encode_signature），增量摄入时新版本也会与旧版本比较。
+一组重复中保留来源文件修改时间最新的一份（相同时保留来源路径排序靠前的），与输入顺序无关：
+较新的版本晚于旧版本出现时，旧版本记录在 superseded 中，由调用方从结果和索引中删除。
+scope 为 "document" 时只在同一原始文档（ref_doc_id）的节点之间检测，
+不同文档共有的章节（如安全须知）不会从后一个文档中被去掉。
+"""
+import base64
+import json
+import os
+import re
+import zlib
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Tuple
+
+import numpy as np
+from llama_index.core.schema import TransformComponent
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+from config.config_rag import DEDUP_CONFIG
+from src.utils import transform_logger
+
+_WHITESPACE = re.compile(r'\s+')
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# 每次向量化计算的分片数，限制中间矩阵的内存（分片数 × 置换数）
+_SHINGLE_BLOCK = 2048
+
+
+def shingle_hashes(text: str, shingle_size: int) -> np.ndarray:
+    """把文本切成字符n-gram分片（空白合并、忽略大小写），返回去重后分片的32位哈希"""
+    text = _WHITESPACE.sub(" ", text).strip().lower()
+    if len(text) <= shingle_size:
+        shingles = {text} if text else set()
+    else:
+        shingles = {text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+class MinHashLSH:
+    """
+    MinHash签名 + LSH分段索引
+
+    Args:
+        num_perm: 签名长度（哈希置换数）
+        bands: 分段数，num_perm 必须能被整除；段数越多候选越多，召回越高
+        threshold: 估计的Jaccard相似度达到该值才视为重复
+        seed: 置换参数的随机种子，保证不同运行的签名一致
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16, threshold: float = 0.8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 必须能被 bands ({bands}) 整除")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        rng = np.random.RandomState(seed)
+        # a < 2^31、哈希值 < 2^32，a * x + b 不会超出uint64
+        self._a = rng.randint(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """计算分片哈希的MinHash签名"""
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), _SHINGLE_BLOCK):
+            block = hashes[start:start + _SHINGLE_BLOCK, None]
+            values = (block * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+            np.minimum(signature, values.min(axis=0), out=signature)
+        return signature
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        """
+        查找与签名最相似的已索引文本
+
+        Returns:
+            (键, 估计的Jaccard相似度)，没有达到阈值的候选时返回None
+        """
+        candidates = set()
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(key, ()))
+        best = None
+        for candidate in candidates:
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return best
+
+    def insert(self, key: str, signature: np.ndarray) -> None:
+        """把签名加入索引"""
+        self._signatures[key] = signature
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: str) -> None:
+        """从索引中移除签名"""
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket = buckets.get(band_key)
+            if bucket and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del buckets[band_key]
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        return self._signatures.get(key)
+
+
+def encode_signature(signature: np.ndarray) -> str:
+    """把签名编码为字符串（uint32字节的base64），用于持久化"""
+    return base64.b64encode(signature.astype("<u4").tobytes()).decode("ascii")
+
+
+def decode_signature(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype="<u4").astype(np.uint64)
+
+
+def _describe(node) -> str:
+    metadata = node.metadata or {}
+    return metadata.get("file_path") or metadata.get("file_name") or node.node_id
+
+
+def modified_time(node) -> float:
+    """节点来源文件的修改时间：优先读取文件，其次 metadata["last_modified_date"]，都没有时为0"""
+    metadata = node.metadata or {}
+    file_path = metadata.get("file_path")
+    if file_path:
+        try:
+            return os.stat(file_path).st_mtime
+        except (OSError, TypeError, ValueError):
+            pass
+    value = metadata.get("last_modified_date")
+    if value:
+        try:
+            return datetime.fromisoformat(str(value)).timestamp()
+        except ValueError:
+            pass
+    return 0.0
+
+
+class DuplicateReport:
+    """重复簇统计：每个簇以保留的文本为代表，记录被丢弃或标记的重复"""
+
+    def __init__(self):
+        self.checked = 0
+        self.skipped_short = 0
+        self.clusters: Dict[str, dict] = {}
+
+    @property
+    def duplicates(self) -> int:
+        return sum(len(cluster["duplicates"]) for cluster in self.clusters.values())
+
+    def add(self, canonical_id: str, canonical_source: str, node, similarity: float) -> None:
+        self._add(canonical_id, canonical_source, node.node_id, _describe(node), similarity)
+
+    def _add(self, canonical_id: str, canonical_source: str,
+             duplicate_id: str, duplicate_source: str, similarity: float) -> dict:
+        cluster = self.clusters.setdefault(canonical_id, {"id": canonical_id, "source": canonical_source,
+                                                          "duplicates": []})
+        entry = {"id": duplicate_id, "source": duplicate_source, "similarity": round(similarity, 4)}
+        cluster["duplicates"].append(entry)
+        return entry
+
+    def supersede(self, old_id: str, old_source: str, new_id: str, new_source: str, similarity: float) -> None:
+        """较新的版本取代之前保留的版本：旧版本及其重复并入新版本的簇"""
+        old_cluster = self.clusters.pop(old_id, None)
+        self._add(new_id, new_source, old_id, old_source, similarity)["superseded"] = True
+        if old_cluster is not None:
+            self.clusters[new_id]["duplicates"].extend(old_cluster["duplicates"])
+
+    def to_dict(self) -> dict:
+        return {
+            "checked": self.checked,
+            "skipped_short": self.skipped_short,
+            "duplicates": self.duplicates,
+            "clusters": list(self.clusters.values()),
+        }
+
+    def save(self, path: str) -> None:
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def __str__(self) -> str:
+        return (f"检查 {self.checked} 个节点（{self.skipped_short} 个过短未参与），"
+                f"发现 {len(self.clusters)} 个重复簇、{self.duplicates} 个重复节点")
+
+
+class NearDuplicateTransform(TransformComponent):
+    """近似重复检测，适用于文档和切分后的节点"""
+
+    action: Literal["drop", "link"] = Field(
+        default=DEDUP_CONFIG.get("action", "drop"),
+        description='重复的处理方式：drop 丢弃，link 保留并在 metadata["duplicate_of"] 中记录代表节点ID'
+    )
+    threshold: float = Field(
+        default=DEDUP_CONFIG.get("threshold", 0.8),
+        description='估计的Jaccard相似度达到该值视为重复'
+    )
+    num_perm: int = Field(
+        default=DEDUP_CONFIG.get("num_perm", 128),
+        description='MinHash签名长度'
+    )
+    bands: int = Field(
+        default=DEDUP_CONFIG.get("bands", 16),
+        description='LSH分段数'
+    )
+    shingle_size: int = Field(
+        default=DEDUP_CONFIG.get("shingle_size", 5),
+        description='字符分片长度'
+    )
+    min_chars: int = Field(
+        default=DEDUP_CONFIG.get("min_chars", 50),
+        description='短于该长度的文本不参与检测（如目录、标题）'
+    )
+    scope: Literal["global", "document"] = Field(
+        default="global",
+        description='检测范围：global 所有节点之间，document 只在同一原始文档的节点之间'
+    )
+    report_path: Optional[str] = Field(
+        default=None,
+        description='重复簇报告（JSON）的保存路径，None表示只写日志'
+    )
+
+    _indexes: Dict[str, MinHashLSH] = PrivateAttr(default_factory=dict)
+    # 已保留文本的 (修改时间, 来源)
+    _kept: Dict[str, Tuple[float, str]] = PrivateAttr(default_factory=dict)
+    _superseded: Dict[str, str] = PrivateAttr(default_factory=dict)
+    _report: DuplicateReport = PrivateAttr(default_factory=DuplicateReport)
+
+    @property
+    def report(self) -> DuplicateReport:
+        """累计的重复簇统计"""
+        return self._report
+
+    @property
+    def superseded(self) -> Dict[str, str]:
+        """之前保留、后来被较新版本取代的节点ID → 取代它的节点ID"""
+        return self._superseded
+
+    @property
+    def signature_params(self) -> str:
+        """签名参数，参数不同的签名不能比较"""
+        return f"minhash-{self.num_perm}-{self.shingle_size}"
+
+    def reset(self) -> None:
+        """清空已记住的文本和统计"""
+        self._indexes = {}
+        self._kept = {}
+        self._superseded = {}
+        self._report = DuplicateReport()
+
+    def _get_index(self, scope_key: str) -> MinHashLSH:
+        index = self._indexes.get(scope_key)
+        if index is None:
+            index = self._indexes[scope_key] = MinHashLSH(self.num_perm, self.bands, self.threshold)
+        return index
+
+    def seed(self, node_id: str, signature: np.ndarray, mtime: float, source: str) -> None:
+        """加入已摄入文本的签名（只用于 scope="global"），之后的文本会与它比较"""
+        self._get_index("").insert(node_id, signature)
+        self._kept[node_id] = (mtime, source)
+
+    def get_signature(self, node_id: str) -> Optional[np.ndarray]:
+        """已保留文本的签名"""
+        for index in self._indexes.values():
+            signature = index.get(node_id)
+            if signature is not None:
+                return signature
+        return None
+
+    def __call__(self, nodes, **kwargs):
+        transform_logger.info(f"开始近似重复检测 {len(nodes)} 个节点")
+        report = self._report
+        duplicates_before = report.duplicates
+
+        candidates = []
+        keep = [True] * len(nodes)
+        for position, node in enumerate(nodes):
+            text = node.get_content()
+            report.checked += 1
+            if len(text.strip()) < self.min_chars:
+                report.skipped_short += 1
+                continue
+            scope_key = (node.ref_doc_id or node.node_id) if self.scope == "document" else ""
+            signature = self._get_index(scope_key).signature(shingle_hashes(text, self.shingle_size))
+            candidates.append((-modified_time(node), _describe(node), position, scope_key, signature))
+
+        # 先处理较新的版本，本批内的重复总是保留最新的一份
+        for neg_mtime, source, position, scope_key, signature in sorted(candidates, key=lambda c: c[:3]):
+            node = nodes[position]
+            index = self._indexes[scope_key]
+            match = index.query(signature)
+            if match is None:
+                index.insert(node.node_id, signature)
+                self._kept[node.node_id] = (-neg_mtime, source)
+                continue
+
+            canonical_id, similarity = match
+            canonical_mtime, canonical_source = self._kept[canonical_id]
+            if (neg_mtime, source) < (-canonical_mtime, canonical_source):
+                # 之前批次（或已摄入）保留的是较旧的版本，改为保留当前版本
+                index.remove(canonical_id)
+                index.insert(node.node_id, signature)
+                self._kept.pop(canonical_id)
+                self._kept[node.node_id] = (-neg_mtime, source)
+                for old_id, new_id in self._superseded.items():
+                    if new_id == canonical_id:
+                        self._superseded[old_id] = node.node_id
+                self._superseded[canonical_id] = node.node_id
+                report.supersede(canonical_id, canonical_source, node.node_id, source, similarity)
+                continue
+
+            report.add(canonical_id, canonical_source, node, similarity)
+            if self.action == "link":
+                node.metadata["duplicate_of"] = canonical_id
+                for keys in (node.excluded_embed_metadata_keys, node.excluded_llm_metadata_keys):
+                    if "duplicate_of" not in keys:
+                        keys.append("duplicate_of")
+            else:
+                keep[position] = False
+
+        kept = [node for node, flag in zip(nodes, keep) if flag]
+        found = report.duplicates - duplicates_before
+        transform_logger.info(f"本批发现 {found} 个近似重复节点（{'丢弃' if self.action == 'drop' else '标记'}）；累计: {report}")
+        if found and self.report_path:
+            report.save(self.report_path)
+        return kept
@@ -0,0 +1,23 @@
+"""
+在同步代码中运行协程
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Coroutine, TypeVar
+
+T = TypeVar("T")
+
+
+def run_coroutine_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """
+    同步运行协程并返回结果
+
+    当前线程没有运行中的事件循环时直接运行；已在事件循环中（异步Web服务、Jupyter）时，
+    在独立线程的新事件循环中运行，避免 run_until_complete 报 "This event loop is already running"。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
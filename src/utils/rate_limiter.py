@@ -0,0 +1,122 @@
+"""
+异步限流与重试工具
+
+TokenBucket 以"预占"方式扣减额度：额度不足时余额变为负数，调用方按欠额等待，
+预占本身是同步操作，因此同一事件循环内的等待者按到达顺序依次放行，无需异步锁。
+"""
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+_CJK_PATTERN = re.compile('[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符按1个token，其余字符按4个字符1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenBucket:
+    """
+    令牌桶，容量为每分钟额度，按秒匀速补充
+
+    Args:
+        per_minute: 每分钟额度
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        预占额度
+
+        Returns:
+            float: 需要等待的秒数，0表示可以立即执行
+        """
+        # 超过容量的单次请求按容量计算，否则永远无法放行
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        wait = self.reserve(amount)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RateLimiter:
+    """
+    同时限制每分钟请求数和每分钟token数
+
+    Args:
+        requests_per_minute: 每分钟请求数，None表示不限制
+        tokens_per_minute: 每分钟token数，None表示不限制
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens: int = 0) -> None:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for attr in ("status_code", "status", "http_status", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """判断错误是否值得重试：超时、连接错误、429限流和5xx服务端错误"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or 500 <= status < 600
+    # 未携带状态码的SDK异常按类名判断
+    name = type(error).__name__
+    return name in ("RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError")
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """读取响应头中的Retry-After（秒），没有时返回None"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """带完全抖动的指数退避：在[0, min(cap, base * 2^attempt)]内随机取值"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,131 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from llama_index.core import Document
+from llama_index.core.ingestion import IngestionCache, IngestionPipeline
+from llama_index.core.schema import TextNode, TransformComponent
+
+from src.data_ingestion import ingestion_pipeline as module
+from src.data_ingestion.cache import SQLiteKVStore
+from src.transformations import CategoryExtract, DocsSummarizerTransform
+
+
+class ThreadRecordingTransform(TransformComponent):
+    """记录 __call__ 所在线程的同步转换"""
+
+    def __call__(self, nodes, **kwargs):
+        ThreadRecordingTransform.threads.append(threading.get_ident())
+        return nodes
+
+
+class ThreadRecordingKVStore(SQLiteKVStore):
+    """记录读写所在线程的缓存"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = []
+
+    def get(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        return super().get(*args, **kwargs)
+
+    def put(self, *args, **kwargs):
+        self.threads.append(threading.get_ident())
+        return super().put(*args, **kwargs)
+
+
+class TestAsyncIngestion(unittest.TestCase):
+    """测试异步摄入入口"""
+
+    def setUp(self):
+        self.docs = [
+            Document(text="# 标题\n\n" + "Markdown内容。" * 50, metadata={"file_name": "类型_a.md"}),
+            Document(text="这是Word文档。" * 300, metadata={"file_name": "类型_b.docx"}),
+        ]
+        patcher = patch.object(module, "create_pipeline",
+                               lambda: IngestionPipeline(transformations=[CategoryExtract()]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_arun_with_smart_chunking(self):
+        """测试在事件循环中运行智能切分管道，且不阻塞其他协程"""
+        async def run():
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            nodes = await module.arun_ingestion_pipeline_with_smart_chunking(documents=iter(self.docs),
+                                                                            checkpoint_dir="")
+            task.cancel()
+            return nodes, ticks
+
+        nodes, ticks = asyncio.run(run())
+        self.assertGreater(len(nodes), 2)
+        self.assertTrue(all(node.metadata.get("category") == "类型" for node in nodes))
+        self.assertTrue(ticks)
+
+    def test_arun_ingestion_pipeline(self):
+        """测试异步基础管道"""
+        nodes = asyncio.run(module.arun_ingestion_pipeline(documents=self.docs))
+        self.assertEqual(len(nodes), 2)
+
+    def test_blocking_steps_off_event_loop(self):
+        """测试同步转换、缓存读写和文档级去重不在事件循环线程中执行"""
+        ThreadRecordingTransform.threads = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            kv_store = ThreadRecordingKVStore(os.path.join(tmp_dir, "cache.db"))
+            pipeline = IngestionPipeline(transformations=[ThreadRecordingTransform()],
+                                         cache=IngestionCache(cache=kv_store))
+            dedup_threads = []
+            deduplicator = MagicMock(side_effect=lambda nodes: (dedup_threads.append(threading.get_ident()), nodes)[1])
+
+            async def run():
+                loop_thread = threading.get_ident()
+                with patch.object(module, "create_pipeline", lambda: pipeline), \
+                        patch.object(module, "create_deduplicator", lambda level: deduplicator):
+                    nodes = await module.arun_ingestion_pipeline(documents=self.docs)
+                    # 第二次运行命中缓存
+                    await module.arun_ingestion_pipeline(documents=self.docs)
+                return loop_thread, nodes
+
+            loop_thread, nodes = asyncio.run(run())
+        self.assertEqual(len(nodes), 2)
+        self.assertEqual(len(ThreadRecordingTransform.threads), 1)
+        self.assertEqual(len(kv_store.threads), 3)
+        self.assertEqual(len(dedup_threads), 2)
+        for thread in ThreadRecordingTransform.threads + kv_store.threads + dedup_threads:
+            self.assertNotEqual(thread, loop_thread)
+
+    @patch('src.transformations.docs_summarizer_transform.TreeSummarize')
+    @patch('src.models.LLMFactory.create_llm')
+    def test_summarizer_call_inside_running_loop(self, mock_create_llm, mock_tree_summarize):
+        """测试在运行中的事件循环里同步调用摘要转换"""
+        async def fake_response(prompt, texts):
+            return "摘要"
+
+        mock_tree_summarize.return_value = MagicMock(aget_response=fake_response)
+        transform = DocsSummarizerTransform(use_cache=False)
+        node = TextNode(text="测试文档。", id_="n1")
+
+        async def run():
+            return transform([node])
+
+        result = asyncio.run(run())
+        self.assertEqual(result[0].metadata["summary"], "摘要")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from llama_index.core import Document
+
+from src.transformations import DataCleanerTransform
+from src.transformations.data_cleaner_transform import compile_rules, remove_repeated_lines, split_code_blocks
+
+
+class TestDataCleaner(unittest.TestCase):
+    """测试基于规则的数据清洗"""
+
+    def test_whitespace_and_control_chars(self):
+        """测试控制字符、行尾空白、连续空行和行内空白在一次扫描中被清理"""
+        cleaner = DataCleanerTransform(rule_sets=["control_chars", "whitespace", "inline_whitespace"])
+        text = "\ufeff第一段\u200b内容。   \r\n\n\n\n第二段  内容\u3000\n"
+        self.assertEqual(cleaner.clean_text(text), "第一段内容。\n\n第二段 内容\n")
+
+    def test_indentation_preserved(self):
+        """测试行首缩进不被合并"""
+        cleaner = DataCleanerTransform(rule_sets=["whitespace", "inline_whitespace"])
+        self.assertEqual(cleaner.clean_text("代码：\n    if a:\n        b()\n"), "代码：\n    if a:\n        b()\n")
+
+    def test_page_artifacts(self):
+        """测试删除单独成行的页码，“1/2”这类数值保留"""
+        cleaner = DataCleanerTransform(rule_sets=["page_artifacts"])
+        text = "正文一\n第 3 页\n正文二\n- 4 -\nPage 5 of 10\n正文三包含第3页字样\n1/2\n"
+        self.assertEqual(cleaner.clean_text(text), "正文一\n正文二\n正文三包含第3页字样\n1/2\n")
+
+    def test_deleted_line_leaves_no_extra_blank_lines(self):
+        """测试删除整行后段落之间只保留一个空行，段落不会被合并"""
+        cleaner = DataCleanerTransform(rule_sets=["whitespace", "page_artifacts"])
+        self.assertEqual(cleaner.clean_text("第 1 页\n\n正文一\n\n第 2 页\n\n\n\n正文二\n第 3 页\n\n正文三"),
+                         "正文一\n\n正文二\n\n正文三")
+        self.assertEqual(cleaner.clean_text("正文一\n\n- 4 -\nPage 5 of 10\n\n正文二"), "正文一\n\n正文二")
+
+    def test_repeated_lines(self):
+        """测试在分页位置重复出现的页眉页脚只保留第一次，表格行和正文中的重复行不受影响"""
+        page = "公司文档\n内容{0}\n| a | b |\n支持\n页脚说明\n"
+        text = "\f".join(page.format(i) for i in range(3))
+        cleaned, removed = remove_repeated_lines(text, min_repeats=3, max_line_length=80)
+        self.assertEqual(removed, 4)
+        self.assertEqual(cleaned, "公司文档\n内容0\n| a | b |\n支持\n页脚说明\n\f\n内容1\n| a | b |\n支持\n"
+                                  "\f\n内容2\n| a | b |\n支持\n")
+
+    def test_repeated_lines_without_page_breaks(self):
+        """测试没有分页标记的文档不删除任何重复行"""
+        text = "公司文档\n内容一\n公司文档\n内容二\n公司文档\n"
+        self.assertEqual(remove_repeated_lines(text, min_repeats=3, max_line_length=80), (text, 0))
+
+    def test_structure_lines_kept(self):
+        """测试setext标题、分隔线、重复的规格值和列表项在默认配置和启用重复行规则时都保留"""
+        text = ("参数一\n------\n\n以太网\n支持\n\n- 是\n\n第 1 页\n"
+                "参数二\n------\n\n串口\n支持\n\n- 是\n\n第 2 页\n"
+                "参数三\n------\n\nCAN\n支持\n\n- 是\n\n***\n\n型号：XC-200\n\n第 3 页\n"
+                "型号：XC-200\n\n1/2\n")
+        expected = text.replace("第 1 页\n", "").replace("第 2 页\n", "").replace("第 3 页\n", "")
+        self.assertEqual(DataCleanerTransform().clean_text(text), expected)
+        cleaner = DataCleanerTransform(rule_sets=["whitespace", "page_artifacts", "repeated_lines"])
+        self.assertEqual(cleaner.clean_text(text), expected)
+
+    def test_repeated_lines_opt_in(self):
+        """测试重复行规则默认不启用"""
+        self.assertNotIn("repeated_lines", DataCleanerTransform().rule_sets)
+
+    def test_legal_notices_opt_in(self):
+        """测试法律声明规则默认不启用，启用后删除整行"""
+        text = "正文\n版权所有 © 2024 某公司\n"
+        self.assertEqual(DataCleanerTransform(rule_sets=["whitespace"]).clean_text(text), text)
+        self.assertEqual(DataCleanerTransform(rule_sets=["legal_notices"]).clean_text(text), "正文\n")
+
+    def test_custom_rules(self):
+        """测试自定义规则与内置规则合并到同一个正则"""
+        cleaner = DataCleanerTransform(rule_sets=["whitespace", "inline_whitespace"], custom_rules=[(r'【内部资料】', "")])
+        pattern, groups = compile_rules(tuple(cleaner.rule_sets), tuple(tuple(r) for r in cleaner.custom_rules))
+        self.assertIn("g4_custom_0", groups)
+        self.assertEqual(cleaner.clean_text("【内部资料】正文  内容"), "正文 内容")
+
+    def test_split_code_blocks(self):
+        """测试按围栏代码块切分，片段拼接等于原文"""
+        text = "说明\n```python\nx  = 1\n```\n结尾\n~~~\n未闭合"
+        segments = split_code_blocks(text)
+        self.assertEqual(segments, [(False, "说明\n"), (True, "```python\nx  = 1\n```\n"),
+                                    (False, "结尾\n"), (True, "~~~\n未闭合")])
+        self.assertEqual("".join(segment for _, segment in segments), text)
+
+    def test_default_config_keeps_fenced_code(self):
+        """测试默认配置下围栏代码块原样保留，代码块后的正文不会被并入代码"""
+        block = "```json\n{\n  \"a\":   1\n}\n```\n\n\n\n"
+        text = "# 示例\n\n" + "说明文字。\n\n".join([block] * 3) + "结尾  \n第二行\n"
+        documents = [Document(text=text, metadata={"file_name": "示例.md"})]
+        DataCleanerTransform()(documents)
+        cleaned = documents[0].text
+        self.assertEqual(cleaned.count("```"), 6)
+        self.assertEqual(cleaned.count("{\n  \"a\":   1\n}"), 3)
+        # Markdown行尾两个空格的硬换行保留
+        self.assertTrue(cleaned.endswith("结尾  \n第二行\n"))
+
+    def test_default_config_keeps_json(self):
+        """测试默认配置下JSON文件只清理控制字符，清洗后仍可解析"""
+        import json
+        data = [{"name": f"参数{i}", "values": [{"a": 1}, {"b": 2}]} for i in range(5)]
+        text = "\ufeff" + json.dumps(data, ensure_ascii=False, indent=2) + "\n\n\n\n"
+        documents = [Document(text=text, metadata={"file_name": "参数.json"})]
+        DataCleanerTransform()(documents)
+        self.assertEqual(json.loads(documents[0].text), data)
+        self.assertEqual(documents[0].text, text[1:])
+
+    def test_unknown_rule_set(self):
+        """测试未知规则集抛出异常"""
+        with self.assertRaises(ValueError):
+            DataCleanerTransform(rule_sets=["no_such_rules"]).clean_text("文本")
+
+    def test_report(self):
+        """测试清洗报告统计字节数和规则命中次数"""
+        cleaner = DataCleanerTransform(rule_sets=["whitespace", "inline_whitespace"])
+        documents = [Document(text="内容   \n\n\n\n结尾"), Document(text="无需清洗")]
+        cleaner(documents)
+        report = cleaner.report
+        self.assertEqual(documents[0].text, "内容\n\n结尾")
+        self.assertEqual(documents[1].text, "无需清洗")
+        self.assertEqual(report.documents, 2)
+        self.assertEqual(report.changed_documents, 1)
+        self.assertEqual(report.bytes_removed, 5)
+        self.assertEqual(report.rule_hits["trailing_space"], 1)
+        self.assertEqual(report.rule_hits["blank_lines"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+
+from src.data_ingestion.watcher import DirectoryWatcher
+
+
+class TestDirectoryWatcher(unittest.TestCase):
+    """测试输入目录监听"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.calls = []
+        self.watcher = DirectoryWatcher(on_change=self.calls.append,
+                                        input_dir=self.tmp_dir.name,
+                                        debounce_seconds=10)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_debounce_burst(self):
+        """测试连续修改只在目录稳定后触发一次"""
+        self._write("类型_a.md", "a")
+        self.assertFalse(self.watcher.poll(now=0))
+
+        self._write("类型_b.md", "b")
+        self.assertFalse(self.watcher.poll(now=1))
+        self._write("类型_c.md", "c")
+        self.assertFalse(self.watcher.poll(now=5))
+        # 距离最后一次变化不足去抖时长
+        self.assertFalse(self.watcher.poll(now=12))
+        self.assertTrue(self.watcher.poll(now=16))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(self.calls[0]), 3)
+        # 没有新变化时不再触发
+        self.assertFalse(self.watcher.poll(now=40))
+
+    def test_detects_modify_and_delete(self):
+        """测试检测修改和删除"""
+        path = self._write("类型_a.md", "a")
+        self._write("类型_b.md", "b")
+        self.watcher.poll(now=0)
+
+        self._write("类型_a.md", "内容变长了")
+        os.remove(os.path.join(self.tmp_dir.name, "类型_b.md"))
+        self.watcher.poll(now=1)
+        self.assertTrue(self.watcher.poll(now=20))
+        self.assertEqual(list(self.calls[0]), [path])
+
+    def test_callback_error_keeps_watching(self):
+        """测试回调异常不会终止监听"""
+        def failing(snapshot):
+            raise RuntimeError("模拟同步失败")
+
+        self.watcher.on_change = failing
+        self.watcher.poll(now=0)
+        self._write("类型_a.md", "a")
+        self.watcher.poll(now=1)
+        self.assertTrue(self.watcher.poll(now=20))
+
+
+if __name__ == "__main__":
+    unittest.main()
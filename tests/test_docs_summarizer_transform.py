@@ -5,18 +5,33 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import asyncio
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
 from llama_index.core.schema import TextNode
-from src.transformations.docs_summarizer_transform import DocsSummarizerTransform
+from llama_index.core import Document
+from llama_index.core.ingestion import IngestionCache, IngestionPipeline
+from src.data_ingestion import ingestion_pipeline
+from src.data_ingestion.cache import SQLiteKVStore
+from src.transformations.docs_summarizer_transform import (DocsSummarizerTransform, SECTION_PROMPT, SummaryError,
+                                                           parse_packed_summaries, split_text_by_tokens)
+from src.utils.rate_limiter import estimate_tokens
 from src.models import LLMFactory, LLMProviderType
+from config.config_rag import SUMMARY_CACHE_CONFIG
 
 class TestDocsSummarizerTransform(unittest.TestCase):
     """测试 DocsSummarizerTransform 类"""
 
     def setUp(self):
         """测试前的准备工作"""
+        # 摘要缓存写入临时目录
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        cache_patcher = patch.dict(SUMMARY_CACHE_CONFIG, {"path": os.path.join(self.tmp_dir.name, "summary.db")})
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
         self.transform = DocsSummarizerTransform()
         
         # 创建测试节点
@@ -26,10 +41,89 @@ class TestDocsSummarizerTransform(unittest.TestCase):
         )
         self.nodes = [self.test_node]
 
+    def _patch_llm(self, responses):
+        """模拟LLM：按顺序使用 responses 中的结果，异常对象会被抛出"""
+        calls = []
+
+        async def fake_response(prompt, texts):
+            result = responses[min(len(calls), len(responses) - 1)]
+            calls.append(texts[0])
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        summarizer = MagicMock()
+        summarizer.aget_response = fake_response
+        # 替换之前模拟的LLM
+        for patcher in getattr(self, "_llm_patchers", []):
+            patcher.stop()
+        self._llm_patchers = [patch('src.transformations.docs_summarizer_transform.TreeSummarize',
+                                    return_value=summarizer),
+                              patch('src.models.LLMFactory.create_llm', return_value=MagicMock(model="mock-model"))]
+        for patcher in self._llm_patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return calls
+
     def test_call(self):
         """测试同步调用方法"""
+        self._patch_llm(["这是一个测试摘要。"])
         result = self.transform(self.nodes)
         self.assertEqual(result, self.nodes)
+        self.assertEqual(self.test_node.metadata["summary"], "这是一个测试摘要。")
+
+    def test_call_raises_after_retries(self):
+        """测试重试后仍失败时抛出 SummaryError，关闭 raise_on_failure 时照常返回节点"""
+        self._patch_llm([ValueError("不可重试的错误")])
+        with self.assertRaises(SummaryError) as context:
+            self.transform(self.nodes)
+        self.assertEqual([node.id_ for node in context.exception.failed_nodes], ["test_node_1"])
+
+        transform = DocsSummarizerTransform(raise_on_failure=False)
+        self.assertEqual(transform(self.nodes), self.nodes)
+        self.assertEqual([node.id_ for node in transform.failed_nodes], ["test_node_1"])
+        self.assertNotIn("summary", self.test_node.metadata)
+
+    def test_failed_batch_not_cached_and_retried(self):
+        """测试摘要失败的批次不写入管道缓存，入口函数重试批次，LLM恢复后重新生成摘要"""
+        def pipeline():
+            return IngestionPipeline(
+                transformations=[DocsSummarizerTransform(max_retries=0)],
+                cache=IngestionCache(cache=SQLiteKVStore(os.path.join(self.tmp_dir.name, "pipeline.db"))),
+            )
+
+        documents = [Document(text="这是一个测试文档。" * 10, id_="doc1")]
+        with patch.dict(ingestion_pipeline.SUMMARY_CONFIG, {"batch_retries": 1}):
+            # LLM一直失败：重试后保留没有摘要的节点，原文档不被修改
+            calls = self._patch_llm([ValueError("服务不可用")])
+            nodes = ingestion_pipeline.run_pipeline_batch(pipeline(), documents)
+            self.assertIsNone(nodes[0].metadata.get("summary"))
+            self.assertEqual(len(calls), 3)
+            self.assertEqual(documents[0].metadata, {})
+
+        # LLM恢复：不会命中之前没有摘要的缓存结果
+        self._patch_llm(["恢复后的摘要"])
+        nodes = ingestion_pipeline.run_pipeline_batch(pipeline(), documents)
+        self.assertEqual(nodes[0].metadata["summary"], "恢复后的摘要")
+
+        # 第一次失败、重试成功
+        calls = self._patch_llm([ValueError("暂时失败"), "重试后的摘要"])
+        nodes = ingestion_pipeline.run_pipeline_batch(pipeline(), [Document(text="另一个文档。" * 10, id_="doc2")])
+        self.assertEqual(nodes[0].metadata["summary"], "重试后的摘要")
+        self.assertEqual(len(calls), 2)
+
+    def test_allow_summary_failures_restores_settings(self):
+        """测试临时允许摘要失败后恢复每个摘要转换原来的 raise_on_failure 和管道缓存设置"""
+        strict = DocsSummarizerTransform()
+        lenient = DocsSummarizerTransform(raise_on_failure=False)
+        pipeline = IngestionPipeline(transformations=[strict, lenient], disable_cache=False)
+        with ingestion_pipeline._allow_summary_failures(pipeline):
+            self.assertFalse(strict.raise_on_failure)
+            self.assertFalse(lenient.raise_on_failure)
+            self.assertTrue(pipeline.disable_cache)
+        self.assertTrue(strict.raise_on_failure)
+        self.assertFalse(lenient.raise_on_failure)
+        self.assertFalse(pipeline.disable_cache)
 
     @patch('src.transformations.docs_summarizer_transform.TreeSummarize')
     @patch('src.models.LLMFactory.create_llm')
@@ -74,5 +168,146 @@ class TestDocsSummarizerTransform(unittest.TestCase):
         
         asyncio.run(test_process())
 
+    def test_concurrency_limit_and_retry(self):
+        """测试并发上限、429重试和失败节点收集"""
+        class RateLimitError(Exception):
+            status_code = 429
+
+        nodes = [TextNode(text=f"文档{i}", id_=f"node_{i}") for i in range(6)]
+        state = {"running": 0, "peak": 0, "calls": {}}
+
+        async def fake_response(prompt, texts):
+            text = texts[0]
+            state["calls"][text] = state["calls"].get(text, 0) + 1
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.01)
+            state["running"] -= 1
+            if text == "文档0" and state["calls"][text] == 1:
+                raise RateLimitError("too many requests")
+            if text == "文档1":
+                raise ValueError("不可重试的错误")
+            return f"{text}的摘要"
+
+        summarizer = MagicMock()
+        summarizer.aget_response = fake_response
+        transform = DocsSummarizerTransform(max_concurrency=2, max_retries=2,
+                                            requests_per_minute=None, tokens_per_minute=None)
+
+        with patch('src.transformations.docs_summarizer_transform.backoff_delay', return_value=0):
+            failed = asyncio.run(transform.process_nodes(nodes, summarizer, "提示"))
+
+        self.assertLessEqual(state["peak"], 2)
+        self.assertEqual(state["calls"]["文档0"], 2)
+        self.assertEqual(nodes[0].metadata["summary"], "文档0的摘要")
+        self.assertEqual([node.id_ for node in failed], ["node_1"])
+        self.assertEqual(state["calls"]["文档1"], 1)
+
+    def test_summary_cache_reused(self):
+        """测试相同文本、提示词和模型的摘要跨实例复用"""
+        calls = []
+
+        async def fake_response(prompt, texts):
+            calls.append(texts[0])
+            return f"{texts[0][:4]}的摘要"
+
+        summarizer = MagicMock()
+        summarizer.aget_response = fake_response
+
+        async def run(transform, nodes):
+            return await transform.process_nodes(nodes, summarizer, "提示", model="qwen", max_tokens=100)
+
+        asyncio.run(run(DocsSummarizerTransform(), [TextNode(text="文档内容A", id_="a")]))
+        transform = DocsSummarizerTransform()
+        nodes = [TextNode(text="文档内容A", id_="a2"), TextNode(text="文档内容B", id_="b")]
+        asyncio.run(run(transform, nodes))
+
+        self.assertEqual(calls, ["文档内容A", "文档内容B"])
+        self.assertEqual(nodes[0].metadata["summary"], "文档内容的摘要")
+        cache = transform._get_summary_cache()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_linked_duplicates_skip_llm(self):
+        """测试标记为近似重复的节点不请求LLM，复用同批代表节点的摘要"""
+        calls = []
+
+        async def fake_response(prompt, texts):
+            calls.append(texts[0])
+            return "代表节点的摘要"
+
+        summarizer = MagicMock()
+        summarizer.aget_response = fake_response
+        transform = DocsSummarizerTransform(use_cache=False)
+        canonical = TextNode(text="数据手册v2", id_="v2")
+        duplicate = TextNode(text="数据手册v1", id_="v1", metadata={"duplicate_of": "v2"})
+        orphan = TextNode(text="数据手册v0", id_="v0", metadata={"duplicate_of": "earlier"})
+
+        failed = asyncio.run(transform.process_nodes([duplicate, canonical, orphan], summarizer, "提示"))
+
+        self.assertEqual(failed, [])
+        self.assertEqual(calls, ["数据手册v2"])
+        self.assertEqual(duplicate.metadata["summary"], "代表节点的摘要")
+        self.assertNotIn("summary", orphan.metadata)
+
+    def test_map_reduce_long_document(self):
+        """测试超长文档分段并发摘要后再合并，短文档只请求一次"""
+        prompts = []
+
+        async def fake_response(prompt, texts):
+            prompts.append(prompt)
+            return "片段要点。"
+
+        summarizer = MagicMock()
+        summarizer.aget_response = fake_response
+        transform = DocsSummarizerTransform(max_input_tokens=300, use_cache=False)
+        long_node = TextNode(text="这是一个很长的句子用于测试分段。" * 200, id_="long")
+        short_node = TextNode(text="短文档。", id_="short")
+
+        failed = asyncio.run(transform.process_nodes([long_node, short_node], summarizer, "提示"))
+
+        self.assertEqual(failed, [])
+        self.assertEqual(long_node.metadata["summary"], "片段要点。")
+        self.assertGreater(prompts.count(SECTION_PROMPT), 5)
+        # 长文档最后一次reduce + 短文档一次
+        self.assertEqual(prompts.count("提示"), 2)
+
+    def test_split_text_by_tokens(self):
+        """测试按句子边界切分且每段不超过预算"""
+        text = "第一句。第二句很长很长！" * 30 + "无标点" * 100
+        sections = split_text_by_tokens(text, 50)
+        self.assertEqual("".join(sections), text)
+        self.assertTrue(all(estimate_tokens(section) <= 50 for section in sections))
+
+    def test_packed_summaries_with_fallback(self):
+        """测试短文档打包请求，回复中缺失的文档改为单独请求"""
+        nodes = [TextNode(text=f"短文档{i}。", id_=f"n{i}") for i in range(4)]
+        packed_requests = []
+
+        async def fake_complete(prompt):
+            packed_requests.append(prompt)
+            # 故意漏掉 n3
+            return MagicMock(__str__=lambda self: '```json\n{"n0": "摘要0", "n1": "摘要1", "n2": "摘要2"}\n```')
+
+        async def fake_response(prompt, texts):
+            return f"{texts[0]}单独摘要"
+
+        packing_llm = MagicMock()
+        packing_llm.acomplete = fake_complete
+        summarizer = MagicMock()
+        summarizer.aget_response = fake_response
+        transform = DocsSummarizerTransform(use_cache=False, pack_max_docs=10)
+
+        failed = asyncio.run(transform.process_nodes(nodes, summarizer, "提示", packing_llm=packing_llm))
+
+        self.assertEqual(failed, [])
+        self.assertEqual(len(packed_requests), 1)
+        self.assertEqual([node.metadata["summary"] for node in nodes[:3]], ["摘要0", "摘要1", "摘要2"])
+        self.assertEqual(nodes[3].metadata["summary"], "短文档3。单独摘要")
+
+    def test_parse_packed_summaries_malformed(self):
+        """测试无法解析的回复返回空结果"""
+        self.assertEqual(parse_packed_summaries("抱歉，我无法完成", ["a"]), {})
+        self.assertEqual(parse_packed_summaries('{"a": 1}', ["a"]), {})
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
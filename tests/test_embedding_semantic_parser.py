@@ -0,0 +1,124 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import tempfile
+import unittest
+from typing import List
+from unittest.mock import patch
+
+import numpy as np
+from llama_index.core import Document
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from config.config_rag import CHUNKING_CONFIG, EMBEDDING_CACHE_CONFIG
+from src.node_parser import EmbeddingSemanticNodeParser, SemanticNodeParser
+from src.node_parser.embedding_semantic_parser import adjacent_distances, find_breakpoints, sentence_windows
+from src.node_parser.node_parser_tool import NodeParserRegistry
+
+
+class TopicEmbedding(BaseEmbedding):
+    """按关键词生成话题向量的测试嵌入模型，记录每次批量请求的大小"""
+
+    model_name: str = "topic-test"
+    requests: List[int] = []
+    fail: bool = False
+
+    def _vector(self, text: str) -> List[float]:
+        return [text.count("温度"), text.count("通信"), text.count("安装"), 0.01]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self.fail:
+            raise ConnectionError("network unreachable")
+        self.requests.append(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+
+TEXT = ("工作温度范围宽。温度传感器精度高。温度低时启动快。温度高时保护可靠。"
+        "支持多种通信协议。通信接口为CAN。通信速率可配置。通信距离远。"
+        "安装前断开电源。安装在导轨上。安装后检查接线。安装完成上电。")
+
+
+class TestEmbeddingSemanticParser(unittest.TestCase):
+    """测试基于嵌入的语义切分"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        patcher = patch.dict(EMBEDDING_CACHE_CONFIG, {"path": os.path.join(self.temp_dir, "embeddings.db")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.embed_model = TopicEmbedding(embed_batch_size=25, requests=[])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _parser(self, **kwargs):
+        return EmbeddingSemanticNodeParser(chunk_size=kwargs.pop("chunk_size", 512), embed_model=self.embed_model,
+                                           buffer_size=0, breakpoint_percentile=80, **kwargs)
+
+    def test_vectorized_helpers(self):
+        """测试句子窗口、相邻距离和百分位断点"""
+        self.assertEqual(sentence_windows(["a", "b", "c"], 1), ["ab", "abc", "bc"])
+        distances = adjacent_distances(np.array([[1, 0], [1, 0], [0, 1], [0, 2]], dtype=np.float32))
+        np.testing.assert_allclose(distances, [0.0, 1.0, 0.0], atol=1e-6)
+        self.assertEqual(find_breakpoints(distances, 50).tolist(), [1])
+        self.assertEqual(find_breakpoints(np.zeros(0), 95).tolist(), [])
+
+    def test_split_at_topic_changes(self):
+        """测试在话题变化处切分"""
+        nodes = self._parser().get_nodes_from_documents([Document(text=TEXT, metadata={"file_name": "a.txt"})])
+        self.assertEqual([node.text for node in nodes], [
+            "工作温度范围宽。温度传感器精度高。温度低时启动快。温度高时保护可靠。",
+            "支持多种通信协议。通信接口为CAN。通信速率可配置。通信距离远。",
+            "安装前断开电源。安装在导轨上。安装后检查接线。安装完成上电。",
+        ])
+        self.assertTrue(all(node.metadata["parser_type"] == "embedding_semantic" for node in nodes))
+
+    def test_batched_and_cached(self):
+        """测试多个文档的句子一起分批请求，重复句子和再次切分命中缓存"""
+        docs = [Document(text=TEXT * 3, metadata={"file_name": f"{i}.txt"}) for i in range(4)]
+        parser = self._parser(chunk_size=2048)
+        parser.get_nodes_from_documents(docs)
+        # 12个不同的句子，一次请求完成，而不是每个句子一次
+        self.assertEqual(self.embed_model.requests, [12])
+
+        self.embed_model.requests.clear()
+        self._parser(chunk_size=2048).get_nodes_from_documents(docs)
+        self.assertEqual(self.embed_model.requests, [])
+
+    def test_oversized_section_split_by_sentences(self):
+        """测试超过块大小的语义段按句子继续切分"""
+        nodes = self._parser(chunk_size=40, chunk_overlap=0).get_nodes_from_documents(
+            [Document(text=TEXT, metadata={"file_name": "a.txt"})])
+        self.assertGreater(len(nodes), 3)
+        self.assertEqual("".join(node.text for node in nodes), TEXT)
+
+    def test_fallback_when_embedding_fails(self):
+        """测试嵌入失败时退回按句子切分"""
+        self.embed_model.fail = True
+        nodes = self._parser().get_nodes_from_documents([Document(text=TEXT, metadata={"file_name": "a.txt"})])
+        self.assertEqual([node.text for node in nodes], [TEXT])
+
+    def test_registry_mode(self):
+        """测试通过 semantic_mode 选择解析器"""
+        NodeParserRegistry.clear_cache()
+        self.addCleanup(NodeParserRegistry.clear_cache)
+        self.assertIsInstance(NodeParserRegistry.get_parser("default"), SemanticNodeParser)
+        with patch.dict(CHUNKING_CONFIG["default"], {"semantic_mode": "embedding"}):
+            self.assertIsInstance(NodeParserRegistry.get_parser("default"), EmbeddingSemanticNodeParser)
+
+
+if __name__ == "__main__":
+    unittest.main()
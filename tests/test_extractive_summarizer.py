@@ -0,0 +1,48 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from unittest.mock import patch
+
+from llama_index.core.schema import TextNode
+
+from src.data_ingestion.ingestion_pipeline import create_pipeline
+from src.transformations import ExtractiveSummarizerTransform
+from src.transformations.extractive_summarizer_transform import extractive_summary, split_sentences
+
+
+class TestExtractiveSummarizer(unittest.TestCase):
+    """测试抽取式摘要"""
+
+    TEXT = ("本产品是一款高性能工业控制器。控制器支持多种通信协议，包括Modbus和CAN总线。"
+            "工作温度范围为-40到85摄氏度！控制器的功耗低于5瓦。\n安装时请注意通风；控制器支持远程固件升级。")
+
+    def test_split_sentences(self):
+        """测试按中文标点和换行切分句子"""
+        sentences = split_sentences(self.TEXT)
+        self.assertEqual(len(sentences), 6)
+        self.assertEqual(sentences[2], "工作温度范围为-40到85摄氏度！")
+
+    def test_summary_within_limit_and_from_source(self):
+        """测试摘要不超过长度上限，且由原文句子按原顺序组成"""
+        summary = extractive_summary(self.TEXT * 5, max_chars=60)
+        self.assertTrue(0 < len(summary) <= 60)
+        sentences = split_sentences(self.TEXT)
+        picked = [s for s in sentences if s in summary]
+        self.assertTrue(picked)
+        self.assertEqual(summary, "".join(picked))
+
+    def test_pipeline_extractive_mode_makes_no_llm_calls(self):
+        """测试create_pipeline选择抽取式摘要时不创建LLM"""
+        with patch("src.models.LLMFactory.create_llm", side_effect=AssertionError("不应调用LLM")):
+            pipeline = create_pipeline(summary_mode="extractive")
+            self.assertTrue(any(isinstance(t, ExtractiveSummarizerTransform) for t in pipeline.transformations))
+            nodes = ExtractiveSummarizerTransform()([TextNode(text=self.TEXT)])
+        self.assertTrue(nodes[0].metadata["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
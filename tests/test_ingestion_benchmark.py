@@ -0,0 +1,42 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+
+from benchmarks.ingestion_benchmark import generate_corpus, run_benchmark
+from src.models import LLMFactory, LLMProviderType
+
+
+class TestIngestionBenchmark(unittest.TestCase):
+    """测试离线摄入基准（小规模冒烟测试）"""
+
+    def test_corpus_is_deterministic(self):
+        """测试相同参数生成相同语料"""
+        with tempfile.TemporaryDirectory() as dir_a, tempfile.TemporaryDirectory() as dir_b:
+            paths_a = generate_corpus(dir_a, num_docs=3, paragraphs=5, formats=["md", "json"])
+            paths_b = generate_corpus(dir_b, num_docs=3, paragraphs=5, formats=["md", "json"])
+            self.assertEqual([os.path.basename(p) for p in paths_a], [os.path.basename(p) for p in paths_b])
+            with open(paths_a[0], encoding="utf-8") as fa, open(paths_b[0], encoding="utf-8") as fb:
+                self.assertEqual(fa.read(), fb.read())
+
+    def test_run_all_stages_offline(self):
+        """测试使用桩模型跑完所有阶段，且退出后恢复原提供商"""
+        original = dict(LLMFactory._providers)
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            generate_corpus(corpus_dir, num_docs=6, paragraphs=8)
+            results = run_benchmark(corpus_dir)
+
+        self.assertEqual([r.name for r in results], ["read", "transform", "chunk", "embed"])
+        self.assertEqual(results[0].docs, 6)
+        self.assertGreaterEqual(results[2].chunks, 6)
+        self.assertTrue(all(r.seconds > 0 for r in results))
+        self.assertEqual(LLMFactory._providers[LLMProviderType.QIANWENOPENAI],
+                         original[LLMProviderType.QIANWENOPENAI])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pickle
+import sqlite3
+import tempfile
+import unittest
+
+from llama_index.core import Document
+from llama_index.core.ingestion import IngestionCache, IngestionPipeline
+from llama_index.core.schema import TransformComponent
+
+from src.data_ingestion.cache import EmbeddingCache, SQLiteKVStore
+
+
+class CountingTransform(TransformComponent):
+    """记录调用次数的转换"""
+
+    def __call__(self, nodes, **kwargs):
+        CountingTransform.calls += 1
+        for node in nodes:
+            node.metadata["seen"] = True
+        return nodes
+
+
+class TestSQLiteKVStore(unittest.TestCase):
+    """测试SQLite转换缓存"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "cache.db")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_get_delete(self):
+        """测试基本读写"""
+        store = SQLiteKVStore(self.db_path)
+        store.put("k1", {"nodes": ["中文内容"]})
+        self.assertEqual(store.get("k1"), {"nodes": ["中文内容"]})
+        self.assertIsNone(store.get("k1", collection="other"))
+        self.assertTrue(store.delete("k1"))
+        self.assertIsNone(store.get("k1"))
+
+    def test_lru_eviction(self):
+        """测试超过条目上限时淘汰最久未访问的条目"""
+        store = SQLiteKVStore(self.db_path, max_entries=2)
+        store.put("a", {"v": 1})
+        store.put("b", {"v": 2})
+        store.get("a")
+        store.put("c", {"v": 3})
+        self.assertEqual(sorted(store.get_all()), ["a", "c"])
+
+    def test_stats_after_replace_and_delete(self):
+        """测试覆盖写入和删除后条目数与总字节数统计仍然准确"""
+        store = SQLiteKVStore(self.db_path)
+        store.put("a", {"v": "x" * 10})
+        store.put("b", {"v": 2})
+        store.put("a", {"v": 1})
+        store.delete("b")
+        store.delete("missing")
+        conn = store._get_conn()
+        expected = conn.execute("SELECT COUNT(*), SUM(size) FROM kv").fetchone()
+        self.assertEqual(store.stats(), tuple(expected))
+        self.assertEqual(store.stats(), (1, len('{"v": 1}')))
+
+    def test_batch_eviction(self):
+        """测试超出上限时一次淘汰到上限的90%，保留最近访问的条目"""
+        store = SQLiteKVStore(self.db_path, max_entries=20)
+        for i in range(20):
+            store.put(f"k{i}", {"v": i})
+        store.get("k0")
+        store.put("k20", {"v": 20})
+        keys = store.get_all()
+        self.assertEqual(len(keys), 18)
+        self.assertIn("k0", keys)
+        self.assertIn("k20", keys)
+        self.assertNotIn("k1", keys)
+        self.assertEqual(store.stats()[0], 18)
+
+    def _transactions(self, store):
+        """记录连接上执行的事务语句"""
+        statements = []
+        store._get_conn().set_trace_callback(statements.append)
+        return lambda: [sql for sql in statements if sql.strip().upper().startswith(("BEGIN", "COMMIT"))]
+
+    def _last_access(self, store, key):
+        return store._get_conn().execute("SELECT last_access FROM kv WHERE key = ?", (key,)).fetchone()[0]
+
+    def test_access_time_written_in_batches(self):
+        """测试读取命中不提交事务，访问时间攒够一批或flush时一次写回"""
+        store = SQLiteKVStore(self.db_path)
+        store.ACCESS_FLUSH_SIZE = 3
+        store.put("a", {"v": 1})
+        store.put("b", {"v": 2})
+        store.put("c", {"v": 3})
+        written = self._last_access(store, "a")
+        transactions = self._transactions(store)
+
+        store.get("a")
+        store.get("b")
+        self.assertEqual(transactions(), [])
+        self.assertEqual(self._last_access(store, "a"), written)
+
+        store.flush()
+        self.assertEqual(len(transactions()), 2)
+        self.assertGreater(self._last_access(store, "a"), written)
+
+        # 攒够3个不同的键时自动写回
+        store.get_many(["a", "b", "missing"])
+        store.get("a")
+        self.assertEqual(len(transactions()), 2)
+        store.get("c")
+        self.assertEqual(len(transactions()), 4)
+
+    def test_embedding_cache_batched(self):
+        """测试嵌入缓存批量写入只用一个事务，批量读取不提交事务"""
+        store = SQLiteKVStore(self.db_path)
+        store.put("warmup", {"v": 1})
+        cache = EmbeddingCache(store)
+        transactions = self._transactions(store)
+
+        cache.put_many({f"k{i}": [0.5, 0.25] for i in range(5)})
+        self.assertEqual(len(transactions()), 2)
+        found = cache.get_many([f"k{i}" for i in range(7)])
+        self.assertEqual(sorted(found), [f"k{i}" for i in range(5)])
+        self.assertEqual(found["k0"], [0.5, 0.25])
+        self.assertEqual((cache.hits, cache.misses), (5, 2))
+        self.assertEqual(len(transactions()), 2)
+
+    def test_size_eviction(self):
+        """测试超出总字节数上限时按大小淘汰"""
+        value = {"v": "x" * 100}
+        size = len('{"v": "' + "x" * 100 + '"}')
+        store = SQLiteKVStore(self.db_path, max_size_bytes=size * 10)
+        for i in range(11):
+            store.put(f"k{i}", value)
+        entries, total_size = store.stats()
+        self.assertEqual(entries, 9)
+        self.assertLessEqual(total_size, size * 9)
+
+    def test_old_schema_rebuilt(self):
+        """测试旧表结构的缓存库被清空重建"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "CREATE TABLE kv (collection TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (collection, key))"
+        )
+        conn.execute("INSERT INTO kv VALUES ('data', 'old', '{}', 2, 0)")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteKVStore(self.db_path, max_entries=2)
+        self.assertIsNone(store.get("old"))
+        store.put("new", {"v": 1})
+        self.assertEqual(store.stats(), (1, len('{"v": 1}')))
+
+    def test_persistent_and_picklable(self):
+        """测试缓存跨实例持久化，且可以被pickle传给子进程"""
+        SQLiteKVStore(self.db_path).put("k", {"v": 1})
+        store = pickle.loads(pickle.dumps(SQLiteKVStore(self.db_path)))
+        self.assertEqual(store.get("k"), {"v": 1})
+
+    def test_pipeline_cache_hit(self):
+        """测试相同输入再次运行管道时不再执行转换"""
+        CountingTransform.calls = 0
+
+        def run():
+            pipeline = IngestionPipeline(
+                transformations=[CountingTransform()],
+                cache=IngestionCache(cache=SQLiteKVStore(self.db_path)),
+            )
+            return pipeline.run(documents=[Document(text="测试文档", id_="doc1")])
+
+        first = run()
+        second = run()
+        self.assertEqual(CountingTransform.calls, 1)
+        self.assertEqual(second[0].id_, first[0].id_)
+        self.assertTrue(second[0].metadata["seen"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from llama_index.core import Document
+from llama_index.core.schema import TransformComponent
+from llama_index.core.ingestion import IngestionPipeline
+
+import src.data_ingestion.ingestion_pipeline as module
+from src.data_ingestion.checkpoint import IngestionCheckpoint, CHUNKED_FILE
+
+
+class FailingSummaryTransform(TransformComponent):
+    """模拟摘要阶段：处理到指定文档时失败"""
+
+    def __call__(self, nodes, **kwargs):
+        for node in nodes:
+            if node.metadata["file_name"] == FailingSummaryTransform.fail_on:
+                raise RuntimeError("模拟服务中断")
+            FailingSummaryTransform.processed.append(node.metadata["file_name"])
+            node.metadata["summary"] = "摘要"
+        return nodes
+
+
+class TestIngestionCheckpoint(unittest.TestCase):
+    """测试摄入检查点与断点续跑"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_dir = os.path.join(self.tmp_dir.name, "checkpoint")
+        self.docs = [
+            Document(text=f"# 标题{i}\n\n第{i}个文档的内容。", id_=f"doc{i}", metadata={"file_name": f"类型_{i}.md"})
+            for i in range(4)
+        ]
+        FailingSummaryTransform.processed = []
+        self.original_create_pipeline = module.create_pipeline
+        self.original_batch_size = module.DOCUMENT_CONFIG.get("ingestion_batch_size")
+        module.create_pipeline = lambda: IngestionPipeline(transformations=[FailingSummaryTransform()])
+        module.DOCUMENT_CONFIG["ingestion_batch_size"] = 2
+
+    def tearDown(self):
+        module.create_pipeline = self.original_create_pipeline
+        module.DOCUMENT_CONFIG["ingestion_batch_size"] = self.original_batch_size
+        self.tmp_dir.cleanup()
+
+    def test_resume_after_failure(self):
+        """测试中途失败后重新运行只处理未完成的文档"""
+        FailingSummaryTransform.fail_on = "类型_2.md"
+        with self.assertRaises(RuntimeError):
+            module.run_ingestion_pipeline_with_smart_chunking(self.docs, checkpoint_dir=self.checkpoint_dir)
+        self.assertTrue(os.path.exists(os.path.join(self.checkpoint_dir, CHUNKED_FILE)))
+        self.assertTrue(IngestionCheckpoint(self.checkpoint_dir).is_chunked("doc1"))
+
+        FailingSummaryTransform.fail_on = None
+        FailingSummaryTransform.processed = []
+        nodes = module.run_ingestion_pipeline_with_smart_chunking(self.docs, checkpoint_dir=self.checkpoint_dir)
+
+        self.assertEqual(FailingSummaryTransform.processed, ["类型_2.md", "类型_3.md"])
+        self.assertEqual([node.ref_doc_id for node in nodes], ["doc0", "doc1", "doc2", "doc3"])
+        self.assertTrue(all(node.metadata.get("summary") == "摘要" for node in nodes))
+        # 全部完成后删除检查点
+        self.assertFalse(os.path.exists(self.checkpoint_dir))
+
+    def test_truncated_line_is_ignored(self):
+        """测试检查点最后一行写入不完整时仍能加载"""
+        checkpoint = IngestionCheckpoint(self.checkpoint_dir)
+        checkpoint.save_chunks({"doc0": [self.docs[0]]})
+        with open(os.path.join(self.checkpoint_dir, CHUNKED_FILE), "a", encoding="utf-8") as f:
+            f.write('{"doc_id": "doc1", "nod')
+
+        reloaded = IngestionCheckpoint(self.checkpoint_dir)
+        self.assertTrue(reloaded.is_chunked("doc0"))
+        self.assertFalse(reloaded.is_chunked("doc1"))
+
+    def test_append_after_truncated_line(self):
+        """测试恢复后追加的记录不会接在不完整的最后一行后面"""
+        checkpoint = IngestionCheckpoint(self.checkpoint_dir)
+        checkpoint.save_chunks({"doc0": [self.docs[0]]})
+        path = os.path.join(self.checkpoint_dir, CHUNKED_FILE)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"doc_id": "doc1", "nod')
+
+        IngestionCheckpoint(self.checkpoint_dir).save_chunks({"doc1": [self.docs[1]]})
+        reloaded = IngestionCheckpoint(self.checkpoint_dir)
+        self.assertTrue(reloaded.is_chunked("doc0"))
+        self.assertTrue(reloaded.is_chunked("doc1"))
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+
+    def test_failed_write_is_rolled_back(self):
+        """测试写入失败时回退到写入前的文件内容"""
+        checkpoint = IngestionCheckpoint(self.checkpoint_dir)
+        checkpoint.save_chunks({"doc0": [self.docs[0]]})
+        path = os.path.join(self.checkpoint_dir, CHUNKED_FILE)
+        size = os.path.getsize(path)
+
+        with patch("src.data_ingestion.checkpoint.os.fsync", side_effect=OSError("磁盘已满")):
+            with self.assertRaises(OSError):
+                checkpoint.save_chunks({"doc1": [self.docs[1]]})
+        self.assertEqual(os.path.getsize(path), size)
+        self.assertFalse(IngestionCheckpoint(self.checkpoint_dir).is_chunked("doc1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
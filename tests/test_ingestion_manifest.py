@@ -0,0 +1,82 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+
+from src.data_ingestion.manifest import IngestionManifest
+
+
+class TestIngestionManifest(unittest.TestCase):
+    """测试增量摄入清单"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp_dir.name, "manifest.json")
+        self.files = []
+        for i in range(3):
+            file_path = os.path.join(self.tmp_dir.name, f"类型_文档{i}.md")
+            self._write(file_path, f"文档{i}的内容")
+            self.files.append(file_path)
+
+        manifest = IngestionManifest(path=self.manifest_path)
+        for i, file_path in enumerate(self.files):
+            manifest.record(file_path, doc_ids=[f"doc{i}"], node_ids=[f"node{i}_a", f"node{i}_b"])
+        manifest.save()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write(self, file_path, text):
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_duplicate_reingested_when_canonical_removed(self):
+        """测试作为近似重复被丢弃的文件在代表文件删除后重新摄入"""
+        manifest = IngestionManifest.load(self.manifest_path)
+        manifest.record(self.files[1], doc_ids=["doc1"], node_ids=[], duplicate_of=[self.files[0]])
+        manifest.save()
+
+        manifest = IngestionManifest.load(self.manifest_path)
+        self.assertEqual(manifest.get_duplicate_of(self.files[1]), [self.files[0]])
+        self.assertFalse(manifest.diff(self.files).has_changes())
+        diff = manifest.diff(self.files[1:])
+        self.assertEqual(diff.deleted, [self.files[0]])
+        self.assertEqual(diff.changed, [self.files[1]])
+        self.assertEqual(diff.unchanged, [self.files[2]])
+
+    def test_unchanged(self):
+        """测试未修改的文件不需要重新摄入"""
+        diff = IngestionManifest.load(self.manifest_path).diff(self.files)
+        self.assertFalse(diff.has_changes())
+        self.assertEqual(sorted(diff.unchanged), sorted(self.files))
+
+    def test_added_changed_deleted(self):
+        """测试新增、修改、删除文件的识别"""
+        new_file = os.path.join(self.tmp_dir.name, "类型_新文档.md")
+        self._write(new_file, "新文档")
+        self._write(self.files[0], "修改后的内容，长度也不同")
+        os.remove(self.files[2])
+
+        manifest = IngestionManifest.load(self.manifest_path)
+        diff = manifest.diff([new_file, self.files[0], self.files[1]])
+        self.assertEqual(diff.added, [new_file])
+        self.assertEqual(diff.changed, [self.files[0]])
+        self.assertEqual(diff.deleted, [self.files[2]])
+        self.assertEqual(diff.unchanged, [self.files[1]])
+        self.assertEqual(manifest.get_node_ids(self.files[2]), ["node2_a", "node2_b"])
+
+    def test_touch_without_content_change(self):
+        """测试只修改时间变化、内容不变的文件视为未修改"""
+        stat = os.stat(self.files[1])
+        os.utime(self.files[1], (stat.st_atime, stat.st_mtime + 10))
+
+        diff = IngestionManifest.load(self.manifest_path).diff(self.files)
+        self.assertFalse(diff.has_changes())
+
+
+if __name__ == "__main__":
+    unittest.main()
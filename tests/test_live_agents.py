@@ -0,0 +1,80 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from unittest.mock import patch
+
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+
+from src.indices import live_agents
+from src.indices.index import IncrementalIngestionResult
+from src.indices.live_agents import LiveCategoryAgents
+
+
+def make_node(doc_id, category):
+    node = TextNode(text=doc_id, metadata={"category": category})
+    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=doc_id)
+    return node
+
+
+def fake_build_query_engine(docs, store_name="processed_nodes"):
+    by_id, by_category = {}, {}
+    for node in docs:
+        by_id[node.ref_doc_id] = f"engine-{node.ref_doc_id}"
+        by_category.setdefault(node.metadata["category"], []).append(node.ref_doc_id)
+    return {"by_id": by_id, "by_category": by_category}
+
+
+class TestLiveCategoryAgents(unittest.TestCase):
+    """测试增量更新类别代理"""
+
+    def setUp(self):
+        self.built = []
+
+        def fake_build_agent(category, doc_agents):
+            self.built.append(category)
+            return (category, tuple(sorted(doc_agents)))
+
+        patchers = [
+            patch.object(live_agents, "build_query_engine", side_effect=fake_build_query_engine),
+            patch.object(live_agents, "_build_agent_for_category", side_effect=fake_build_agent),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.live = LiveCategoryAgents()
+        nodes = [make_node("a", "产品"), make_node("b", "产品"), make_node("c", "政策")]
+        with patch.object(live_agents, "sync_incremental_ingestion",
+                          return_value=IncrementalIngestionResult(nodes)):
+            self.live.load()
+        self.built.clear()
+
+    def test_only_affected_categories_rebuilt(self):
+        """测试只重建受影响的类别，其他类别沿用旧代理"""
+        old_policy_agent = self.live.get_agent("政策")
+        result = IncrementalIngestionResult(
+            [make_node("a", "产品"), make_node("c", "政策"), make_node("d", "产品")],
+            added_doc_ids={"d"}, removed_doc_ids={"b"})
+        with patch.object(live_agents, "sync_incremental_ingestion", return_value=result):
+            self.assertTrue(self.live.refresh())
+
+        self.assertEqual(self.built, ["产品"])
+        self.assertEqual(self.live.get_agent("产品"), ("产品", ("a", "d")))
+        self.assertIs(self.live.get_agent("政策"), old_policy_agent)
+
+    def test_empty_category_removed(self):
+        """测试类别下文档全部删除后移除该代理"""
+        result = IncrementalIngestionResult([make_node("a", "产品"), make_node("b", "产品")],
+                                            removed_doc_ids={"c"})
+        with patch.object(live_agents, "sync_incremental_ingestion", return_value=result):
+            self.live.refresh()
+        self.assertIsNone(self.live.get_agent("政策"))
+        self.assertEqual(self.built, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
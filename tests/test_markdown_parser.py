@@ -0,0 +1,82 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from llama_index.core import Document
+
+from src.node_parser import CustomMarkdownNodeParser
+from src.node_parser.markdown_parser import generate_markdown_header_id, tokenize_markdown
+
+
+TEXT = """前言 [官网](http://example.com) 和 ![接线图](wiring.png)
+
+# 安装
+步骤一
+```python
+# 不是标题 [a](b)
+```
+## 接线 [说明](manual.md)
+内容
+### 安装
+内容二
+# 维护
+结束"""
+
+
+class TestMarkdownParser(unittest.TestCase):
+    """测试单次扫描的Markdown解析器"""
+
+    def setUp(self):
+        self.parser = CustomMarkdownNodeParser(chunk_size=1024, chunk_overlap=20, separator=" ")
+        self.nodes = self.parser.get_nodes_from_documents([Document(text=TEXT, metadata={"file_name": "手册_a.md"})])
+
+    def test_header_id(self):
+        """测试标题锚点生成"""
+        self.assertEqual(generate_markdown_header_id("  Hello, World! "), "hello-world")
+        self.assertEqual(generate_markdown_header_id("Quick_Start"), "quick_start")
+        self.assertEqual(generate_markdown_header_id("安装", {"安装", "安装-1"}), "安装-2")
+
+    def test_sections_and_code_blocks(self):
+        """测试按标题切分，代码块中的#和链接保持原样"""
+        self.assertEqual([node.text for node in self.nodes], [
+            "前言 官网 和 接线图",
+            "# 安装\n步骤一\n```python\n# 不是标题 [a](b)\n```",
+            "## 接线 说明\n内容",
+            "### 安装\n内容二",
+            "# 维护\n结束",
+        ])
+
+    def test_header_metadata(self):
+        """测试 Header N、section_link 和 header_path 元数据"""
+        metadata = self.nodes[3].metadata
+        self.assertEqual(metadata["file_name"], "手册_a.md")
+        self.assertEqual(metadata["Header 1"], "安装")
+        self.assertEqual(metadata["Header 2"], "接线 说明")
+        self.assertEqual(metadata["Header 3"], "安装")
+        self.assertEqual(metadata["header_path"], "/安装/接线 说明/")
+        # 重名标题的锚点在文档内唯一
+        self.assertEqual(self.nodes[1].metadata["section_link"], "安装")
+        self.assertEqual(metadata["section_link"], "安装-1")
+        # 新的一级标题清空下级标题
+        self.assertNotIn("Header 2", self.nodes[4].metadata)
+        self.assertNotIn("section_link", self.nodes[0].metadata)
+
+    def test_tokenize_empty(self):
+        """测试空文本和只有标题的文本"""
+        self.assertEqual(tokenize_markdown(""), [])
+        self.assertEqual(tokenize_markdown("# 标题"), [("# 标题", [(1, "标题", "标题")])])
+
+    def test_tilde_and_nested_fences(self):
+        """测试~~~围栏，以及代码块内不同类或更短的围栏不结束代码块"""
+        text = "# 标题\n~~~\n# 不是标题\n```\n# 也不是\n~~~\n# 新章节\n````md\n```\n# 还在代码块\n````\n结束"
+        sections = tokenize_markdown(text)
+        self.assertEqual([stack[-1][1] for _, stack in sections], ["标题", "新章节"])
+        self.assertTrue(sections[1][0].endswith("# 还在代码块\n````\n结束"))
+
+
+if __name__ == "__main__":
+    unittest.main()
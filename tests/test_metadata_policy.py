@@ -0,0 +1,91 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from unittest.mock import patch
+
+from llama_index.core import Document
+from llama_index.core.schema import MetadataMode, TextNode
+
+from src.data_ingestion import ingestion_pipeline
+from src.transformations import MetadataPolicyTransform
+
+
+class TestMetadataPolicy(unittest.TestCase):
+    """测试元数据策略"""
+
+    def _node(self):
+        return TextNode(text="正文内容", metadata={
+            "summary": "这是一段同一文档所有节点都相同的摘要" * 3,
+            "category": "手册",
+            "file_path": "sub/手册_控制器",
+            "header": "安装",
+        }, excluded_embed_metadata_keys=["header"])
+
+    def test_policy_targets(self):
+        """测试每个键按策略进入嵌入文本或LLM上下文"""
+        node = self._node()
+        MetadataPolicyTransform(policy={"summary": "none", "category": "all",
+                                        "file_path": "llm", "header": "embed"})([node])
+        embed_text = node.get_content(metadata_mode=MetadataMode.EMBED)
+        llm_text = node.get_content(metadata_mode=MetadataMode.LLM)
+        self.assertNotIn("summary", embed_text)
+        self.assertNotIn("summary", llm_text)
+        self.assertIn("category", embed_text)
+        self.assertIn("category", llm_text)
+        self.assertNotIn("file_path", embed_text)
+        self.assertIn("file_path", llm_text)
+        # 原来被排除的键按策略重新加入
+        self.assertIn("header", embed_text)
+        self.assertNotIn("header", llm_text)
+        # 元数据本身保留
+        self.assertIn("summary", node.metadata)
+
+    def test_unlisted_keys_unchanged_and_idempotent(self):
+        """测试未列出的键保持原状，重复应用结果不变"""
+        node = self._node()
+        transform = MetadataPolicyTransform(policy={"summary": "none"})
+        transform([node])
+        transform([node])
+        self.assertEqual(node.excluded_embed_metadata_keys, ["header", "summary"])
+        self.assertEqual(node.excluded_llm_metadata_keys, ["summary"])
+
+    def test_report(self):
+        """测试统计元数据token节省"""
+        transform = MetadataPolicyTransform(policy={"summary": "none"})
+        transform([self._node(), self._node()])
+        report = transform.report
+        self.assertEqual(report.nodes, 2)
+        self.assertGreater(report.embed_tokens_saved, 50)
+        self.assertEqual(report.embed_tokens_saved, report.llm_tokens_saved)
+        self.assertIn("节省", str(report))
+
+    def test_chunks_follow_policy(self):
+        """测试切分后的节点（包括解析器新增的元数据）按策略处理"""
+        doc = Document(text="Word内容。" * 600, metadata={"file_name": "手册_a.docx", "summary": "摘要"})
+        chunks = ingestion_pipeline.chunk_documents([doc])
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertIn("summary", chunk.excluded_embed_metadata_keys)
+            self.assertIn("parser_type", chunk.excluded_llm_metadata_keys)
+
+        with patch.dict(ingestion_pipeline.METADATA_CONFIG, {"enabled": False}):
+            chunks = ingestion_pipeline.chunk_documents([doc])
+        self.assertNotIn("summary", chunks[0].excluded_embed_metadata_keys)
+
+    def test_policy_applied_once_in_chunking_pipeline(self):
+        """测试带切分的管道只在切分之后应用一次元数据策略"""
+        with patch.dict(ingestion_pipeline.METADATA_CONFIG, {"enabled": True}):
+            pipeline = ingestion_pipeline.create_pipeline_with_chunking("extractive")
+            names = [type(t).__name__ for t in pipeline.transformations]
+            self.assertEqual(names.count("MetadataPolicyTransform"), 1)
+            self.assertEqual(names[-2:], ["SentenceSplitter", "MetadataPolicyTransform"])
+            base_names = [type(t).__name__ for t in ingestion_pipeline.create_pipeline("extractive").transformations]
+            self.assertEqual(base_names[-1], "MetadataPolicyTransform")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from unittest.mock import patch
+
+from llama_index.core.schema import TextNode
+
+from src.transformations import CategoryExtract, DocumentURLNormalizerTransform
+from src.transformations import category_extract, document_url_normalizer_transform
+
+
+class TestMetadataTransforms(unittest.TestCase):
+    """测试按文件缓存的元数据提取"""
+
+    def setUp(self):
+        category_extract.extract_category.cache_clear()
+        document_url_normalizer_transform.normalize_file_path.cache_clear()
+        self.nodes = []
+        for file_name in ["手册_控制器.md", "手册_控制器.md", "说明.docx"] * 100:
+            self.nodes.append(TextNode(text="内容", metadata={
+                "file_name": file_name,
+                "file_path": f"./data/docs/sub/{file_name}",
+            }))
+
+    def test_category_computed_once_per_file(self):
+        """测试每个文件只提取一次类别，所有节点共享同一个结果"""
+        with patch.object(category_extract, "transform_logger") as logger:
+            CategoryExtract()(self.nodes)
+        info = category_extract.extract_category.cache_info()
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(self.nodes[0].metadata["category"], "手册")
+        self.assertIs(self.nodes[0].metadata["category"], self.nodes[3].metadata["category"])
+        self.assertNotIn("category", self.nodes[2].metadata)
+        # 日志按批汇总，而不是每个节点一行
+        self.assertEqual(logger.warning.call_count, 1)
+        self.assertIn("说明.docx", logger.warning.call_args[0][0])
+
+    def test_missing_file_name(self):
+        """测试缺少文件名的节点汇总为一条警告"""
+        nodes = [TextNode(text="内容"), TextNode(text="内容")]
+        with patch.object(category_extract, "transform_logger") as logger:
+            CategoryExtract()(nodes)
+        logger.warning.assert_called_once()
+        self.assertIn("2 个节点", logger.warning.call_args[0][0])
+
+    def test_file_path_normalized_once_per_file(self):
+        """测试每个文件只标准化一次路径"""
+        with patch.object(document_url_normalizer_transform, "transform_logger") as logger:
+            DocumentURLNormalizerTransform()(self.nodes)
+        info = document_url_normalizer_transform.normalize_file_path.cache_info()
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(self.nodes[0].metadata["file_path"], os.path.join("sub", "手册_控制器"))
+        self.assertEqual(self.nodes[2].metadata["file_path"], os.path.join("sub", "说明"))
+        self.assertEqual(logger.debug.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,275 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from llama_index.core import Document
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+
+from src.data_ingestion import ingestion_pipeline
+from src.transformations import NearDuplicateTransform
+from src.transformations.near_duplicate_transform import (MinHashLSH, decode_signature, encode_signature,
+                                                           shingle_hashes)
+
+
+DATASHEET = ("XC-200 工业控制器数据手册。控制器支持Modbus RTU、Modbus TCP和CAN总线通信，"
+             "提供8路数字输入、8路数字输出和4路模拟量输入。工作温度范围为-40到85摄氏度，"
+             "供电电压为24V直流，典型功耗低于5瓦。设备支持远程固件升级和看门狗复位。")
+
+
+class TestNearDuplicate(unittest.TestCase):
+    """测试MinHash LSH近似重复检测"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _documents(self):
+        return [
+            Document(text=DATASHEET, metadata={"file_name": "XC-200_v1.md"}),
+            # 修订版：只改了一处参数
+            Document(text=DATASHEET.replace("低于5瓦", "低于4.5瓦"), metadata={"file_name": "XC-200_v2.md"}),
+            Document(text="安装指南：先固定导轨，再连接电源线和通信线，上电前检查接线是否牢固，"
+                          "确认拨码开关设置正确，最后通过配置软件写入站号和波特率。",
+                     metadata={"file_name": "install.md"}),
+        ]
+
+    def test_signature_similarity(self):
+        """测试签名估计的相似度：相近文本高，无关文本低"""
+        index = MinHashLSH(num_perm=128, bands=16, threshold=0.5)
+        original = index.signature(shingle_hashes(DATASHEET, 5))
+        revised = index.signature(shingle_hashes(DATASHEET.replace("低于5瓦", "低于4.5瓦"), 5))
+        other = index.signature(shingle_hashes(self._documents()[2].text, 5))
+        index.insert("original", original)
+        key, similarity = index.query(revised)
+        self.assertEqual(key, "original")
+        self.assertGreater(similarity, 0.8)
+        self.assertIsNone(index.query(other))
+
+    def test_invalid_bands(self):
+        """测试签名长度不能被分段数整除时抛出异常"""
+        with self.assertRaises(ValueError):
+            MinHashLSH(num_perm=100, bands=16)
+
+    def test_drop_duplicates(self):
+        """测试丢弃重复文档并输出重复簇报告"""
+        report_path = os.path.join(self.temp_dir, "duplicates.json")
+        transform = NearDuplicateTransform(action="drop", report_path=report_path)
+        documents = self._documents()
+        kept = transform(documents)
+        self.assertEqual([doc.metadata["file_name"] for doc in kept], ["XC-200_v1.md", "install.md"])
+
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+        self.assertEqual(report["duplicates"], 1)
+        cluster = report["clusters"][0]
+        self.assertEqual(cluster["id"], documents[0].node_id)
+        self.assertEqual(cluster["source"], "XC-200_v1.md")
+        self.assertEqual(cluster["duplicates"][0]["source"], "XC-200_v2.md")
+
+    def test_link_duplicates(self):
+        """测试标记模式保留重复文档并记录代表文档ID"""
+        transform = NearDuplicateTransform(action="link")
+        documents = self._documents()
+        kept = transform(documents)
+        self.assertEqual(len(kept), 3)
+        self.assertEqual(kept[1].metadata["duplicate_of"], documents[0].node_id)
+        self.assertIn("duplicate_of", kept[1].excluded_embed_metadata_keys)
+        self.assertNotIn("duplicate_of", kept[0].metadata)
+
+    def test_across_batches_and_short_texts(self):
+        """测试跨批次检测重复，过短的文本不参与检测"""
+        transform = NearDuplicateTransform(action="drop")
+        documents = self._documents()
+        self.assertEqual(len(transform(documents[:1])), 1)
+        self.assertEqual(len(transform(documents[1:])), 1)
+        self.assertEqual(len(transform([Document(text="目录"), Document(text="目录")])), 2)
+        self.assertEqual(transform.report.skipped_short, 2)
+
+        transform.reset()
+        self.assertEqual(len(transform(documents[1:2])), 1)
+
+    def _dated_documents(self):
+        """v1 较旧、v2 较新（按文件修改时间）"""
+        documents = []
+        for name, text, mtime in (("XC-200_v2.md", DATASHEET.replace("低于5瓦", "低于4.5瓦"), 2000),
+                                  ("XC-200_v1.md", DATASHEET, 1000)):
+            path = os.path.join(self.temp_dir, name)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.utime(path, (mtime, mtime))
+            documents.append(Document(text=text, id_=name, metadata={"file_path": path}))
+        return documents
+
+    def test_keeps_newest_within_batch(self):
+        """测试同一批中保留修改时间最新的版本，与输入顺序无关"""
+        newer, older = self._dated_documents()
+        for order in ([older, newer], [newer, older]):
+            transform = NearDuplicateTransform(action="drop")
+            self.assertEqual([doc.id_ for doc in transform(order)], [newer.id_])
+            self.assertEqual(transform.superseded, {})
+
+    def test_newer_version_supersedes_earlier_batch(self):
+        """测试较新的版本在之后的批次出现时取代已保留的旧版本"""
+        newer, older = self._dated_documents()
+        transform = NearDuplicateTransform(action="drop")
+        self.assertEqual(len(transform([older])), 1)
+        self.assertEqual(len(transform([newer])), 1)
+        self.assertEqual(transform.superseded, {older.id_: newer.id_})
+        self.assertIsNone(transform.get_signature(older.id_))
+        cluster = transform.report.clusters[newer.id_]
+        self.assertEqual(cluster["duplicates"][0]["id"], older.id_)
+        self.assertTrue(cluster["duplicates"][0]["superseded"])
+
+        nodes = [TextNode(text="a", relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc.id_)})
+                 for doc in (older, newer)]
+        kept = ingestion_pipeline.drop_superseded_documents(nodes, transform)
+        self.assertEqual([node.ref_doc_id for node in kept], [newer.id_])
+
+    def test_seeded_signatures(self):
+        """测试预先加入的签名参与比较，编码后的签名可以还原"""
+        newer, older = self._dated_documents()
+        first = NearDuplicateTransform(action="drop")
+        first([older])
+        encoded = encode_signature(first.get_signature(older.id_))
+
+        self.assertEqual(decode_signature(encoded).tolist(), first.get_signature(older.id_).tolist())
+        transform = NearDuplicateTransform(action="drop")
+        transform.seed(older.id_, decode_signature(encoded), 1000, older.metadata["file_path"])
+        # 旧版本的重新读取被丢弃；较新的版本取代已摄入的旧版本
+        self.assertEqual(transform([Document(text=older.text, id_="copy", metadata={"file_name": "copy.md"})]), [])
+        self.assertEqual(len(transform([newer])), 1)
+        self.assertEqual(transform.superseded, {older.id_: newer.id_})
+
+    def test_document_scope(self):
+        """测试按文档范围检测时，不同文档共有的内容都保留，同一文档内的重复仍被丢弃"""
+        transform = NearDuplicateTransform(action="drop", scope="document")
+        chunks = [TextNode(text=DATASHEET, id_=f"{doc_id}_{i}",
+                           relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)})
+                  for doc_id in ("doc_a", "doc_b") for i in range(2)]
+        kept = transform(chunks)
+        self.assertEqual([node.node_id for node in kept], ["doc_a_0", "doc_b_0"])
+
+    def test_chunk_level_defaults(self):
+        """测试节点级检测默认关闭，启用时只在同一文档内检测"""
+        self.assertIsNone(ingestion_pipeline.create_deduplicator("chunk"))
+        with patch.dict(ingestion_pipeline.DEDUP_CONFIG, {"chunk_level": True, "report_path": None}):
+            self.assertEqual(ingestion_pipeline.create_deduplicator("chunk").scope, "document")
+            self.assertEqual(ingestion_pipeline.create_deduplicator("document").scope, "global")
+
+    def test_pipeline_order(self):
+        """测试检测不在缓存的管道中，可通过配置关闭"""
+        with patch.dict(ingestion_pipeline.DEDUP_CONFIG, {"report_path": None}):
+            names = [type(t).__name__ for t in ingestion_pipeline._base_transformations("extractive")]
+            self.assertNotIn("NearDuplicateTransform", names)
+            self.assertIsNotNone(ingestion_pipeline.create_deduplicator("document"))
+
+        with patch.dict(ingestion_pipeline.DEDUP_CONFIG, {"enabled": False}):
+            self.assertIsNone(ingestion_pipeline.create_deduplicator("document"))
+
+    def test_cached_pipeline_not_affected_by_earlier_batches(self):
+        """测试重复文档被丢弃后，代表文档删除时重新运行能得到该文档（不会命中缓存的空结果）"""
+        original, revision, _ = self._documents()
+        patches = [
+            patch.dict(ingestion_pipeline.DOCUMENT_CONFIG, {"ingestion_batch_size": 1, "chunking_workers": 1}),
+            patch.dict(ingestion_pipeline.SUMMARY_CONFIG, {"mode": "extractive"}),
+            patch.dict(ingestion_pipeline.DEDUP_CONFIG, {"report_path": None, "chunk_level": False}),
+            patch.dict("src.data_ingestion.cache.INGESTION_CACHE_CONFIG",
+                       {"path": os.path.join(self.temp_dir, "cache.db")}),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        def run(docs):
+            copies = [Document(text=doc.text, metadata=dict(doc.metadata), id_=doc.id_) for doc in docs]
+            return ingestion_pipeline.run_ingestion_pipeline_with_smart_chunking(copies, checkpoint_dir="")
+
+        nodes = run([original, revision])
+        self.assertEqual({node.ref_doc_id for node in nodes}, {original.id_})
+        nodes = run([revision])
+        self.assertEqual({node.ref_doc_id for node in nodes}, {revision.id_})
+
+
+class TestIncrementalDeduplication(unittest.TestCase):
+    """测试增量摄入时新文件与已摄入文件比较"""
+
+    def setUp(self):
+        from src.indices import index
+        self.index = index
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.manifest_path = os.path.join(self.temp_dir, "manifest.json")
+        self.input_files = []
+        self.stored = {"nodes": None}
+
+        def save_nodes(nodes, store_name):
+            self.stored["nodes"] = list(nodes)
+            return True
+
+        def fake_pipeline(documents, document_deduplicator):
+            nodes = [TextNode(text=doc.text, id_=f"{doc.id_}_0",
+                              relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc.id_)})
+                     for doc in document_deduplicator(list(documents))]
+            return ingestion_pipeline.drop_superseded_documents(nodes, document_deduplicator)
+
+        patches = [
+            patch.dict(ingestion_pipeline.DEDUP_CONFIG, {"report_path": None}),
+            patch.object(index, "list_input_files", lambda: list(self.input_files)),
+            patch.object(index, "load_nodes_from_disk", lambda store_name: self.stored["nodes"]),
+            patch.object(index, "save_nodes_to_disk", save_nodes),
+            patch.object(index, "remove_vector_indices", lambda doc_ids: len(doc_ids)),
+            patch.object(index, "run_ingestion_pipeline_with_smart_chunking", fake_pipeline),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _write(self, name, text, mtime):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.utime(path, (mtime, mtime))
+        self.input_files.append(path)
+        return path
+
+    def test_new_revision_replaces_ingested_copy(self):
+        """测试新版本与已摄入的旧版本比较：旧版本被删除，新版本删除后旧版本重新摄入"""
+        old_path = self._write("XC-200_v1.md", DATASHEET, 1000)
+        self._write("install.md", "安装指南：先固定导轨，再连接电源线和通信线，上电前检查接线是否牢固，"
+                                  "确认拨码开关设置正确，最后通过配置软件写入站号和波特率。", 1000)
+        first = self.index.sync_incremental_ingestion(manifest_path=self.manifest_path)
+        self.assertEqual(len(first.nodes), 2)
+        old_doc_ids = set(first.added_doc_ids) - {node.ref_doc_id for node in first.nodes
+                                                  if "安装" in node.text}
+
+        new_path = self._write("XC-200_v2.md", DATASHEET.replace("低于5瓦", "低于4.5瓦"), 2000)
+        second = self.index.sync_incremental_ingestion(manifest_path=self.manifest_path)
+        self.assertEqual(len(second.nodes), 2)
+        self.assertTrue(any("4.5瓦" in node.text for node in second.nodes))
+        self.assertEqual(second.removed_doc_ids, old_doc_ids)
+        manifest = self.index.IngestionManifest.load(self.manifest_path)
+        self.assertEqual(manifest.get_duplicate_of(old_path), [new_path])
+        self.assertEqual(manifest.get_node_ids(old_path), [])
+
+        # 没有变化时不重复处理
+        self.assertFalse(self.index.sync_incremental_ingestion(manifest_path=self.manifest_path).added_doc_ids)
+
+        self.input_files.remove(new_path)
+        os.remove(new_path)
+        third = self.index.sync_incremental_ingestion(manifest_path=self.manifest_path)
+        self.assertEqual(third.added_doc_ids, old_doc_ids)
+        self.assertTrue(any("低于5瓦" in node.text for node in third.nodes))
+
+
+if __name__ == "__main__":
+    unittest.main()
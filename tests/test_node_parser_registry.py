@@ -0,0 +1,48 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+
+from src.node_parser.node_parser_tool import NodeParserRegistry, get_parser_for_document
+from src.node_parser import CustomMarkdownNodeParser, WordNodeParser, SemanticNodeParser
+
+
+class TestNodeParserRegistry(unittest.TestCase):
+    """测试解析器注册表"""
+
+    def tearDown(self):
+        NodeParserRegistry._extension_types.pop(".txt", None)
+        NodeParserRegistry._builders.pop("text", None)
+        NodeParserRegistry.clear_cache()
+
+    def test_parser_is_reused(self):
+        """测试同类型文档复用同一个解析器实例"""
+        doc_a = Document(text="a", metadata={"file_name": "类型_a.md"})
+        doc_b = Document(text="b", metadata={"file_name": "类型_b.MDX"})
+        parser = get_parser_for_document(doc_a)
+        self.assertIsInstance(parser, CustomMarkdownNodeParser)
+        self.assertIs(get_parser_for_document(doc_b), parser)
+        self.assertIsInstance(get_parser_for_document(Document(text="c", metadata={"file_name": "c.docx"})),
+                              WordNodeParser)
+        self.assertIsInstance(get_parser_for_document(Document(text="d")), SemanticNodeParser)
+
+    def test_register_parser(self):
+        """测试注册新格式的解析器"""
+        NodeParserRegistry.register_parser(
+            "text",
+            lambda config: SentenceSplitter(chunk_size=config["chunk_size"]),
+            extensions=[".txt"],
+        )
+        parser = get_parser_for_document(Document(text="e", metadata={"file_name": "e.txt"}))
+        self.assertIsInstance(parser, SentenceSplitter)
+        self.assertNotIsInstance(parser, SemanticNodeParser)
+
+
+if __name__ == "__main__":
+    unittest.main()
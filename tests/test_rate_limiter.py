@@ -0,0 +1,42 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import unittest
+
+from src.utils.rate_limiter import TokenBucket, estimate_tokens, is_retryable_error
+
+
+class TestRateLimiter(unittest.TestCase):
+    """测试限流与重试判断"""
+
+    def test_token_bucket_reserve(self):
+        """测试额度用完后按欠额计算等待时间"""
+        bucket = TokenBucket(per_minute=60)
+        self.assertEqual(bucket.reserve(60), 0)
+        # 每秒补充1个，再预占2个约需等待2秒
+        self.assertAlmostEqual(bucket.reserve(2), 2.0, delta=0.1)
+
+    def test_retryable_errors(self):
+        """测试429/5xx/超时可重试，4xx不可重试"""
+        class StatusError(Exception):
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+        self.assertTrue(is_retryable_error(StatusError(429)))
+        self.assertTrue(is_retryable_error(StatusError(503)))
+        self.assertTrue(is_retryable_error(asyncio.TimeoutError()))
+        self.assertFalse(is_retryable_error(StatusError(400)))
+        self.assertFalse(is_retryable_error(ValueError("x")))
+
+    def test_estimate_tokens(self):
+        """测试中文按字符计数"""
+        self.assertEqual(estimate_tokens("你好世界"), 4)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import types
+import unittest
+from unittest.mock import patch
+
+from src.data_ingestion import ingestion_pipeline
+from src.data_ingestion.reader import iter_documents, iter_batches
+
+
+class TestLazyReader(unittest.TestCase):
+    """测试惰性文档读取"""
+
+    def setUp(self):
+        """创建临时数据目录"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        for i in range(5):
+            with open(os.path.join(self.tmp_dir.name, f"类型_文档{i}.md"), "w", encoding="utf-8") as f:
+                f.write(f"# 标题{i}\n\n这是第{i}个测试文档。")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iter_documents_is_lazy(self):
+        """测试iter_documents返回生成器且逐个产出文档"""
+        docs = iter_documents(input_dir=self.tmp_dir.name)
+        self.assertIsInstance(docs, types.GeneratorType)
+        file_names = [doc.metadata["file_name"] for doc in docs]
+        self.assertEqual(len(file_names), 5)
+        self.assertEqual(file_names, sorted(file_names))
+
+    def test_parallel_matches_serial_order(self):
+        """测试并行读取的输出顺序与串行一致，且损坏文件不影响其他文件"""
+        with open(os.path.join(self.tmp_dir.name, "类型_损坏.docx"), "wb") as f:
+            f.write(b"not a zip file")
+
+        serial = [doc.text for doc in iter_documents(input_dir=self.tmp_dir.name, num_workers=1)
+                  if doc.metadata["file_name"].endswith(".md")]
+        parallel = [doc.text for doc in iter_documents(input_dir=self.tmp_dir.name, num_workers=2)]
+        self.assertEqual(parallel, serial)
+
+    def test_iter_batches(self):
+        """测试按批次切分文档流"""
+        batches = list(iter_batches(iter_documents(input_dir=self.tmp_dir.name), batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+
+    def test_pipeline_reads_configured_directory(self):
+        """测试管道入口未提供文档时按配置的目录和递归设置读取"""
+        sub_dir = os.path.join(self.tmp_dir.name, "子目录")
+        os.makedirs(sub_dir)
+        with open(os.path.join(sub_dir, "类型_子文档.md"), "w", encoding="utf-8") as f:
+            f.write("# 子目录文档")
+
+        for recursive, expected in [(False, 5), (True, 6)]:
+            with patch.dict(ingestion_pipeline.DOCUMENT_CONFIG,
+                            {"input_dir": self.tmp_dir.name, "recursive": recursive, "num_workers": 1}):
+                docs = list(ingestion_pipeline._resolve_documents(None))
+            self.assertEqual(len(docs), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
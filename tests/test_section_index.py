@@ -0,0 +1,116 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from llama_index.core import Document
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.storage.docstore import SimpleDocumentStore
+
+from src.indices import index as index_module
+from src.indices.section_index import SECTION_INDEX_FILE, SectionIndex, section_path
+from src.node_parser import CustomMarkdownNodeParser
+from src.query_engine.enhanced_query_engine import SectionExpansionPostprocessor
+
+
+TEXT = """# 安装
+概述
+## 接线
+接线说明
+## 接线
+第二个接线章节
+### 输入/输出
+端子定义
+# 维护
+结束"""
+
+
+class TestSectionIndex(unittest.TestCase):
+    """测试章节锚点索引"""
+
+    def setUp(self):
+        parser = CustomMarkdownNodeParser(chunk_size=1024, chunk_overlap=20, separator=" ")
+        self.doc = Document(text=TEXT, metadata={"file_name": "手册_a.md"})
+        self.nodes = parser.get_nodes_from_documents([self.doc])
+        self.index = SectionIndex.from_nodes(self.nodes)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _ids(self, *positions):
+        return [self.nodes[i].node_id for i in positions]
+
+    def test_section_path(self):
+        """测试由标题元数据得到章节路径"""
+        self.assertEqual(section_path({"Header 2": "接线", "Header 1": "安装"}), "/安装/接线/")
+        self.assertIsNone(section_path({"file_name": "a.md"}))
+
+    def test_lookup_by_anchor_and_path(self):
+        """测试按锚点和章节路径查找节点"""
+        doc_id = self.doc.doc_id
+        self.assertEqual(self.index.get_section(doc_id, "接线"), self._ids(1))
+        self.assertEqual(self.index.get_section(doc_id, "接线-1"), self._ids(2))
+        # 同名章节路径相同，路径包含所有子章节
+        self.assertEqual(self.index.get_path(doc_id, "/安装/接线/"), self._ids(1, 2, 3))
+        self.assertEqual(self.index.get_path(doc_id, "/安装/"), self._ids(0, 1, 2, 3))
+        self.assertEqual(self.index.get_path(doc_id, "/安装/接线/输入/输出/"), self._ids(3))
+        self.assertEqual(self.index.get_section("missing", "接线"), [])
+
+    def test_expand(self):
+        """测试把命中节点扩展到整个章节"""
+        self.assertEqual(self.index.expand(self.nodes[2].node_id), self._ids(2))
+        self.assertEqual(self.index.expand(self.nodes[0].node_id, include_subsections=True), self._ids(0, 1, 2, 3))
+        self.assertEqual(self.index.locate(self.nodes[4].node_id), (self.doc.doc_id, "维护", "/维护/"))
+        self.assertEqual(self.index.expand("unknown"), [])
+
+    def test_save_and_load(self):
+        """测试持久化往返"""
+        path = os.path.join(self.temp_dir, "section_index.json")
+        self.index.save(path)
+        loaded = SectionIndex.load(path)
+        self.assertEqual(loaded.documents, self.index.documents)
+        self.assertEqual(len(loaded), len(self.nodes))
+        self.assertIsNone(SectionIndex.load(os.path.join(self.temp_dir, "missing.json")))
+
+    def test_persisted_with_docstore(self):
+        """测试保存文档存储时一并保存章节索引"""
+        with patch.object(index_module, "DOC_STORE_DIR", self.temp_dir), \
+                patch.object(index_module, "VECTOR_CACHE_DIR", os.path.join(self.temp_dir, "vectors")):
+            self.assertTrue(index_module.save_nodes_to_disk(self.nodes, "nodes"))
+            loaded = index_module.load_section_index("nodes")
+        self.assertEqual(loaded.get_section(self.doc.doc_id, "维护"), self._ids(4))
+
+    def test_query_engine_uses_persisted_index(self):
+        """测试构建查询引擎时加载已保存的章节索引，而不是重新建立"""
+        with patch.object(index_module, "DOC_STORE_DIR", self.temp_dir), \
+                patch.object(index_module, "VECTOR_CACHE_DIR", os.path.join(self.temp_dir, "vectors")), \
+                patch.object(index_module, "VectorStoreIndex"), \
+                patch.object(index_module, "create_enhanced_query_engine") as create_engine, \
+                patch.object(SectionIndex, "from_nodes", side_effect=AssertionError("不应重建章节索引")):
+            self.index.save(os.path.join(self.temp_dir, "nodes", SECTION_INDEX_FILE))
+            index_module.build_query_engine(self.nodes[:2], store_name="nodes")
+        section_index = create_engine.call_args.kwargs["section_index"]
+        # 只传入了部分节点，但章节扩展可以用到整个文档的章节
+        self.assertEqual(section_index.get_path(self.doc.doc_id, "/安装/"), self._ids(0, 1, 2, 3))
+
+    def test_expansion_postprocessor(self):
+        """测试检索后处理补充章节节点"""
+        docstore = SimpleDocumentStore()
+        docstore.add_documents(self.nodes)
+        expander = SectionExpansionPostprocessor(section_index=self.index, docstore=docstore,
+                                                 max_nodes_per_hit=2, include_subsections=True)
+        hits = [NodeWithScore(node=self.nodes[0], score=0.9), NodeWithScore(node=self.nodes[2], score=0.5)]
+        expanded = expander.postprocess_nodes(hits)
+        self.assertEqual([node.node.node_id for node in expanded], self._ids(0, 1, 3, 2))
+        self.assertEqual([node.score for node in expanded], [0.9, 0.9, 0.9, 0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+
+from llama_index.core import Document
+
+from src.node_parser import SemanticNodeParser
+from src.node_parser.semantic_parser import count_tokens, split_cjk_sentences
+
+
+class TestSemanticParser(unittest.TestCase):
+    """测试中文感知的语义切分"""
+
+    def test_split_sentences(self):
+        """测试按中英文句末标点和换行切分，拼接后等于原文"""
+        text = "控制器支持Modbus。温度范围宽！支持升级吗？安装时注意通风；\n\n第二段 “引用句。” Next one. 最后一句"
+        sentences = split_cjk_sentences(text)
+        self.assertEqual("".join(sentences), text)
+        self.assertEqual(sentences, [
+            "控制器支持Modbus。", "温度范围宽！", "支持升级吗？", "安装时注意通风；\n\n",
+            "第二段 “引用句。” ", "Next one. ", "最后一句",
+        ])
+        self.assertEqual(split_cjk_sentences(""), [])
+
+    def test_count_tokens_cached(self):
+        """测试token计数按文本缓存"""
+        count_tokens.cache_clear()
+        count_tokens("重复出现的句子。")
+        count_tokens("重复出现的句子。")
+        info = count_tokens.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_chunks_fill_chunk_size(self):
+        """测试块以句子为单位填充到接近 chunk_size"""
+        sentences = ["控制器支持多种通信协议，包括Modbus和CAN总线。", "工作温度范围为-40到85摄氏度！",
+                     "安装时请注意通风；", "设备的功耗低于5瓦，适用于工业现场。"]
+        paragraphs = ["".join(sentences[(i + j) % 4] for j in range(12)) for i in range(40)]
+        doc = Document(text="\n\n".join(paragraphs), metadata={"file_name": "类型_a.txt"})
+        parser = SemanticNodeParser(chunk_size=256, chunk_overlap=32)
+        nodes = parser.get_nodes_from_documents([doc])
+        sizes = [count_tokens(node.text) for node in nodes]
+        self.assertTrue(all(size <= 256 for size in sizes))
+        # 除最后一块外都接近上限
+        self.assertGreater(min(sizes[:-1]), 256 * 0.85)
+        self.assertTrue(all(node.metadata["parser_type"] == "semantic" for node in nodes))
+
+    def test_long_sentence_without_punctuation(self):
+        """测试没有标点的超长句子仍能切分到 chunk_size 以内"""
+        doc = Document(text="测" * 3000, metadata={"file_name": "类型_b.txt"})
+        nodes = SemanticNodeParser(chunk_size=200, chunk_overlap=20).get_nodes_from_documents([doc])
+        self.assertGreater(len(nodes), 1)
+        self.assertTrue(all(count_tokens(node.text) <= 200 for node in nodes))
+
+
+if __name__ == "__main__":
+    unittest.main()
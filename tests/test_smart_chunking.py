@@ -0,0 +1,103 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from llama_index.core import Document
+
+from src.data_ingestion.ingestion_pipeline import ChunkingPool, chunk_documents
+
+
+class HangingPool:
+    """在当前进程中执行的进程池替身，包含文本“卡住”的任务永远不会完成"""
+
+    max_workers = 2
+
+    def __init__(self):
+        self.submitted = []
+        self.restarts = 0
+
+    def submit(self, fn, docs):
+        self.submitted.append(len(docs))
+        future = Future()
+        if not any(doc.text == "卡住" for doc in docs):
+            future.set_result(fn(docs))
+        return future
+
+    def restart(self):
+        self.restarts += 1
+
+
+class TestSmartChunking(unittest.TestCase):
+    """测试按文档类型分组的批量切分"""
+
+    def setUp(self):
+        self.docs = [
+            Document(text="这是Word文档。" * 600, metadata={"file_name": "类型_a.docx"}),
+            Document(text="# 标题\n\n" + "Markdown内容。" * 50, metadata={"file_name": "类型_b.md"}),
+            Document(text="这是Word文档二。" * 600, metadata={"file_name": "类型_c.docx"}),
+        ]
+
+    def test_preserves_document_order(self):
+        """测试分组切分后节点仍按原文档顺序排列"""
+        chunks = chunk_documents(self.docs, batch_size=8)
+        doc_order = []
+        for chunk in chunks:
+            if chunk.ref_doc_id not in doc_order:
+                doc_order.append(chunk.ref_doc_id)
+        self.assertEqual(doc_order, [doc.id_ for doc in self.docs])
+
+    def test_failed_document_is_kept(self):
+        """测试切分失败的文档保留原文档，不影响同批其他文档"""
+        from src.node_parser.word_parser import WordNodeParser
+        original = WordNodeParser.get_nodes_from_documents
+
+        def flaky(parser, documents, *args, **kwargs):
+            if any(doc.id_ == self.docs[2].id_ for doc in documents):
+                raise ValueError("模拟切分失败")
+            return original(parser, documents, *args, **kwargs)
+
+        with patch.object(WordNodeParser, "get_nodes_from_documents", flaky):
+            chunks = chunk_documents(self.docs, batch_size=8)
+
+        self.assertIs(chunks[-1], self.docs[2])
+        self.assertTrue(any(chunk.ref_doc_id == self.docs[0].id_ for chunk in chunks))
+
+    def test_timeout_isolates_hanging_document(self):
+        """测试批次超时后重建进程池并逐个切分，只有卡住的文档保留原文档"""
+        hanging = Document(text="卡住", metadata={"file_name": "卡住.docx"})
+        docs = [self.docs[0], hanging, self.docs[2]]
+        pool = HangingPool()
+        chunks = chunk_documents(docs, executor=pool, batch_size=8, timeout=0.05)
+
+        self.assertIn(hanging, chunks)
+        self.assertEqual(pool.submitted, [3, 1, 1, 1])
+        self.assertEqual(pool.restarts, 2)
+        self.assertTrue(any(chunk.ref_doc_id == self.docs[2].id_ for chunk in chunks))
+
+    def test_pool_restart_terminates_hung_worker(self):
+        """测试重建进程池时终止仍在运行的子进程"""
+        pool = ChunkingPool(1)
+        try:
+            pool.submit(time.sleep, 60)
+            deadline = time.monotonic() + 30
+            while not pool._executor._processes and time.monotonic() < deadline:
+                time.sleep(0.05)
+            processes = list(pool._executor._processes.values())
+            pool.restart()
+            for process in processes:
+                process.join(timeout=10)
+                self.assertFalse(process.is_alive())
+            self.assertEqual(pool.submit(abs, -1).result(timeout=60), 1)
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from unittest.mock import patch
+
+from llama_index.core import Document
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.ingestion import IngestionPipeline
+
+from src.indices.streaming_pipeline import StreamingIngestionPipeline
+
+
+class TestStreamingIngestionPipeline(unittest.TestCase):
+    """测试流式摄入管道"""
+
+    def setUp(self):
+        self.docs = [
+            Document(text=f"# 标题{i}\n\n" + "这是测试内容。" * 200, metadata={"file_name": f"类型_{i}.md"})
+            for i in range(6)
+        ]
+
+    @patch("src.indices.streaming_pipeline.create_pipeline",
+           lambda: IngestionPipeline(transformations=[]))
+    def test_run_with_small_queues(self):
+        """测试小队列下各阶段仍能完成，且所有节点都带有嵌入向量"""
+        pipeline = StreamingIngestionPipeline(
+            queue_size=1,
+            transform_batch_size=2,
+            embed_batch_size=4,
+            embed_model=MockEmbedding(embed_dim=8),
+            persist_indices=False,
+            report_interval=0,
+        )
+        nodes = pipeline.run(iter(self.docs))
+
+        self.assertTrue(nodes)
+        self.assertTrue(all(node.embedding is not None for node in nodes))
+        self.assertEqual(set(node.ref_doc_id for node in nodes), set(doc.id_ for doc in self.docs))
+        self.assertEqual(len(pipeline.indices), len(self.docs))
+
+        report = pipeline.report()
+        self.assertEqual(report["stages"]["read"]["items"], len(self.docs))
+        self.assertEqual(report["stages"]["embed"]["items"], len(nodes))
+        self.assertLessEqual(report["queues"]["read"]["max_depth"], 1)
+        self.assertIn(report["bottleneck"], StreamingIngestionPipeline.STAGES)
+
+
+if __name__ == "__main__":
+    unittest.main()
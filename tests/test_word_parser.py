@@ -0,0 +1,178 @@
+import sys
+import os
+
+# 添加项目根目录到路径
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+import zipfile
+
+from llama_index.core import Document
+
+from src.data_ingestion.reader import CustomDocxReader
+from src.node_parser import WordNodeParser
+from src.node_parser.word_parser import iter_docx_blocks, iter_text_blocks
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+STYLES = f"""<?xml version="1.0" encoding="UTF-8"?>
+<w:styles {NS}>
+  <w:style w:type="paragraph" w:styleId="1"><w:name w:val="heading 1"/></w:style>
+  <w:style w:type="paragraph" w:styleId="2"><w:name w:val="heading 2"/></w:style>
+  <w:style w:type="paragraph" w:styleId="a3"><w:name w:val="Normal"/></w:style>
+</w:styles>"""
+
+
+def paragraph(text, style=None, outline=None):
+    ppr = ""
+    if style or outline is not None:
+        ppr = "<w:pPr>"
+        ppr += f'<w:pStyle w:val="{style}"/>' if style else ""
+        ppr += f'<w:outlineLvl w:val="{outline}"/>' if outline is not None else ""
+        ppr += "</w:pPr>"
+    return f"<w:p>{ppr}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def table(rows):
+    cells = "".join("<w:tr>" + "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+                    for row in rows)
+    return f"<w:tbl>{cells}</w:tbl>"
+
+
+def write_docx(path, body):
+    with zipfile.ZipFile(path, "w") as docx:
+        docx.writestr("word/styles.xml", STYLES)
+        docx.writestr("word/document.xml", f'<?xml version="1.0" encoding="UTF-8"?>'
+                                           f'<w:document {NS}><w:body>{body}<w:sectPr/></w:body></w:document>')
+
+
+class TestDocxStreaming(unittest.TestCase):
+    """测试增量解析docx"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "手册_控制器.docx")
+        nested = ('<w:tc><w:p><w:r><w:t>外层</w:t></w:r></w:p>'
+                  f'<w:tbl><w:tr><w:tc>{paragraph("内层")}</w:tc></w:tr></w:tbl></w:tc>')
+        write_docx(self.path, "".join([
+            paragraph("概述", style="1"),
+            '<w:p><w:r><w:t>控制器</w:t></w:r><w:r><w:tab/><w:t>用于</w:t></w:r>'
+            '<w:hyperlink><w:r><w:t>工业现场</w:t></w:r></w:hyperlink><w:del><w:r><w:delText>删除</w:delText></w:r></w:del></w:p>',
+            paragraph("参数", style="2"),
+            table([["参数", "取值"], ["电压", "24V|DC"]]),
+            f"<w:tbl><w:tr>{nested}<w:tc>{paragraph('右侧')}</w:tc></w:tr></w:tbl>",
+            paragraph("附录", outline=0),
+            paragraph(""),
+        ]))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iter_docx_blocks(self):
+        """测试按文档顺序产出标题、段落和表格"""
+        self.assertEqual(list(iter_docx_blocks(self.path)), [
+            ("heading", 1, "概述"),
+            ("paragraph", 0, "控制器\t用于工业现场"),
+            ("heading", 2, "参数"),
+            ("table", 0, "| 参数 | 取值 |\n| --- | --- |\n| 电压 | 24V\\|DC |"),
+            ("table", 0, "| 外层 内层 | 右侧 |\n| --- | --- |"),
+            ("heading", 1, "附录"),
+        ])
+
+    def test_text_box_not_duplicated(self):
+        """测试文本框中的段落单独产出一次，不并入外层段落，也不重复读取 Fallback 中的副本"""
+        text_box = f"<w:txbxContent>{paragraph('文本框内容')}</w:txbxContent>"
+        write_docx(self.path, "".join([
+            '<w:p><w:r><w:t>正文</w:t></w:r><w:r>'
+            '<mc:AlternateContent xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006">'
+            f'<mc:Choice Requires="wps"><w:drawing>{text_box}</w:drawing></mc:Choice>'
+            f'<mc:Fallback><w:pict>{text_box}</w:pict></mc:Fallback>'
+            '</mc:AlternateContent></w:r><w:r><w:t>继续</w:t></w:r></w:p>',
+            paragraph("结尾"),
+        ]))
+        self.assertEqual(list(iter_docx_blocks(self.path)), [
+            ("paragraph", 0, "文本框内容"),
+            ("paragraph", 0, "正文继续"),
+            ("paragraph", 0, "结尾"),
+        ])
+
+    def test_reader_outputs_markdown(self):
+        """测试读取器输出Markdown结构的文本"""
+        docs = CustomDocxReader().load_data(self.path, extra_info={"file_path": self.path})
+        self.assertEqual(len(docs), 1)
+        self.assertTrue(docs[0].text.startswith("# 概述\n\n控制器\t用于工业现场\n\n## 参数\n\n| 参数 | 取值 |"))
+        self.assertEqual(docs[0].metadata["file_name"], "手册_控制器.docx")
+        self.assertEqual(docs[0].metadata["file_path"], self.path)
+
+    def test_corrupt_file_raises(self):
+        """测试损坏的文件抛出异常，由读取流程跳过"""
+        with open(self.path, "wb") as f:
+            f.write(b"not a zip file")
+        with self.assertRaises(zipfile.BadZipFile):
+            CustomDocxReader().load_data(self.path)
+
+
+class TestWordNodeParser(unittest.TestCase):
+    """测试按标题、段落、表格对齐的Word切分"""
+
+    def test_iter_text_blocks(self):
+        """测试结构化文本的逐行扫描"""
+        text = "# 标题\n段落一\n第二行\n\n| a | b |\n| --- | --- |\n段落二\n## 小节"
+        self.assertEqual(list(iter_text_blocks(text)), [
+            ("heading", 1, "标题"),
+            ("paragraph", 0, "段落一\n第二行"),
+            ("table", 0, "| a | b |\n| --- | --- |"),
+            ("paragraph", 0, "段落二"),
+            ("heading", 2, "小节"),
+        ])
+
+    def test_chunks_follow_headings(self):
+        """测试每个标题开始新块，节点带有标题路径元数据"""
+        text = "# 概述\n\n简介段落。\n\n## 参数\n\n## 电气参数\n\n| 参数 | 取值 |\n| --- | --- |\n| 电压 | 24V |\n\n# 安装\n\n安装说明。"
+        nodes = WordNodeParser(chunk_size=200).get_nodes_from_documents(
+            [Document(text=text, metadata={"file_name": "a.docx"})])
+        self.assertEqual([node.text for node in nodes], [
+            "# 概述\n\n简介段落。",
+            "## 参数\n\n## 电气参数\n\n| 参数 | 取值 |\n| --- | --- |\n| 电压 | 24V |",
+            "# 安装\n\n安装说明。",
+        ])
+        self.assertEqual(nodes[1].metadata["Header 2"], "电气参数")
+        self.assertEqual(nodes[1].metadata["header_path"], "/概述/")
+        self.assertEqual(nodes[1].metadata["section_link"], "电气参数")
+        self.assertTrue(all(node.metadata["parser_type"] == "word" for node in nodes))
+        self.assertEqual(nodes[2].start_char_idx, text.index("# 安装"))
+
+    def test_paragraphs_packed_until_chunk_size(self):
+        """测试多个段落合并到块大小，不在段落中间断开"""
+        paragraphs = [f"第{i}段" + "内容" * 20 + "。" for i in range(20)]
+        parser = WordNodeParser(chunk_size=120, chunk_overlap=0)
+        nodes = parser.get_nodes_from_documents([Document(text="\n\n".join(paragraphs))])
+        self.assertGreater(len(nodes), 1)
+        self.assertLess(len(nodes), len(paragraphs))
+        self.assertEqual([p for node in nodes for p in node.text.split("\n\n")], paragraphs)
+        self.assertTrue(all(parser._token_size(node.text) <= 120 for node in nodes))
+
+    def test_oversized_table_repeats_header(self):
+        """测试超长表格按行拆分，每块重复表头"""
+        rows = "\n".join(f"| 参数{i} | 取值{i}的详细说明文字 |" for i in range(60))
+        text = "# 参数表\n\n| 参数 | 取值 |\n| --- | --- |\n" + rows
+        parser = WordNodeParser(chunk_size=150, chunk_overlap=0)
+        nodes = parser.get_nodes_from_documents([Document(text=text)])
+        self.assertGreater(len(nodes), 2)
+        for node in nodes:
+            self.assertIn("| 参数 | 取值 |\n| --- | --- |\n| 参数", node.text)
+            self.assertEqual(node.metadata["Header 1"], "参数表")
+        self.assertEqual(sum(node.text.count("的详细说明文字") for node in nodes), 60)
+
+    def test_plain_text_falls_back_to_sentences(self):
+        """测试没有结构的长文本按句子拆分"""
+        parser = WordNodeParser(chunk_size=1200, chunk_overlap=150)
+        nodes = parser.get_nodes_from_documents([Document(text="这是一个测试文档。" * 500)])
+        self.assertGreater(len(nodes), 1)
+        self.assertTrue(all(node.text.endswith("。") for node in nodes))
+        self.assertEqual(nodes[0].metadata["header_path"], "/")
+
+
+if __name__ == "__main__":
+    unittest.main()